@@ -0,0 +1,82 @@
+""" content-addressed storage for the outputs of expensive, deterministic steps
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Text
+
+# bump to invalidate everything stored by older versions of the generators
+CACHE_VERSION = "1"
+
+
+def _update(digest: Any, item: Any) -> None:
+    if item is None:
+        digest.update(b"\0none")
+    elif isinstance(item, bytes):
+        digest.update(b"\0bytes%d\0" % len(item))
+        digest.update(item)
+    elif isinstance(item, str):
+        _update(digest, item.encode("utf-8"))
+    elif isinstance(item, Path):
+        _update(digest, item.name)
+        _update(digest, item.read_bytes() if item.is_file() else None)
+    elif isinstance(item, (list, tuple)):
+        digest.update(b"\0list%d\0" % len(item))
+        for sub_item in item:
+            _update(digest, sub_item)
+    else:
+        _update(digest, json.dumps(item, sort_keys=True))
+
+
+def hash_inputs(*inputs: Any) -> Text:
+    """ a stable hex digest of some text, bytes, files and JSON-able values
+    """
+    digest = hashlib.sha256(f"expectorate-cache-{CACHE_VERSION}".encode("utf-8"))
+    _update(digest, inputs)
+    return digest.hexdigest()
+
+
+@dataclass
+class StageCache:
+    """ files stored by the stage that made them, and the hash of its inputs
+    """
+
+    root: Path
+    log: Optional[logging.Logger] = None
+
+    def path(self, stage: Text, key: Text, suffix: Text = "") -> Path:
+        return self.root / stage / f"{key}{suffix}"
+
+    def fetch(self, stage: Text, key: Text, dest: Path) -> bool:
+        """ copy a cached artifact to `dest`, if there is one
+        """
+        cached = self.path(stage, key, dest.suffix)
+        if not cached.is_file():
+            if self.log:
+                self.log.debug("[cache] %s miss %s", stage, key[:12])
+            return False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(cached, dest)
+        if self.log:
+            self.log.info("[cache] %s hit %s", stage, key[:12])
+        return True
+
+    def store(self, stage: Text, key: Text, src: Path) -> Path:
+        """ atomically copy an artifact into the cache
+        """
+        cached = self.path(stage, key, src.suffix)
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cached.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, cached)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return cached
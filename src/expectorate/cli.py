@@ -1,4 +1,5 @@
 import logging
+from contextlib import ExitStack
 from pathlib import Path
 from typing import Text
 
@@ -6,26 +7,76 @@ import click
 
 from ._version import __version__
 from .context import Context, ExpectorateContext
-from .lsp.cli import lsp
+from .corpus.cli import corpus
+from .lsp.cli import lsp, lsp_matrix
+from .proxy.cli import proxy
+from .validate.cli import validate
 
 
 @click.group()
 @click.version_option(__version__)
 @click.option("--workdir", "-w", default=Path.cwd() / "work", type=Path)
 @click.option("--output", "-o", default=Path.cwd() / "output", type=Path)
+@click.option(
+    "--cache-dir",
+    envvar="EXPECTORATE_CACHE_DIR",
+    default=Path.home() / ".cache" / "expectorate",
+    type=Path,
+)
 @click.option("--log-level", default="INFO")
 @click.option("--debug/--no-debug", "-d", default=False)
+@click.option(
+    "--profile/--no-profile",
+    default=False,
+    help="write the time and memory of each stage and subprocess to --output",
+)
 @click.pass_context
-def cli(ctx: Context, workdir: Path, output: Path, log_level: Text, debug: bool):
+def cli(
+    ctx: Context,
+    workdir: Path,
+    output: Path,
+    cache_dir: Path,
+    log_level: Text,
+    debug: bool,
+    profile: bool,
+):
     """ expectorate
     """
     ctx.ensure_object(ExpectorateContext)
 
     ctx.obj.workdir = workdir
     ctx.obj.output = output
+    ctx.obj.cache_dir = cache_dir
     log = logging.getLogger(__name__)
     log.setLevel("DEBUG" if debug else log_level)
     ctx.obj.log = log
 
+    if profile:
+        start_profile(ctx, output, log)
+
+
+def start_profile(ctx: Context, output: Path, log: logging.Logger) -> None:
+    """ profile the subcommand, writing a report when its context closes
+    """
+    from . import profile
+
+    profiler = profile.Profiler()
+    profile.activate(profiler)
+
+    def write_profile():
+        profile.activate(None)
+        for path in profiler.write(output):
+            log.info("profile written to %s", path)
+
+    stack = ExitStack()
+    stack.enter_context(profiler)
+    stack.callback(write_profile)
+    stack.enter_context(profiler.span(ctx.invoked_subcommand or "cli", "command"))
+    ctx.call_on_close(stack.close)
+
 
 cli.add_command(lsp)
+cli.add_command(lsp_matrix)
+cli.add_command(validate)
+cli.add_command(corpus)
+cli.add_command(proxy)
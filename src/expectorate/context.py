@@ -10,6 +10,7 @@ import click
 class ExpectorateContext:
     workdir: Optional[Path] = None
     output: Optional[Path] = None
+    cache_dir: Optional[Path] = None
     log: Optional[logging.Logger] = None
 
 
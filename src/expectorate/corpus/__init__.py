@@ -0,0 +1,2 @@
+""" generate corpora of valid LSP messages from the schema made by `expectorate lsp`
+"""
@@ -0,0 +1,93 @@
+import json
+from pathlib import Path
+from typing import Optional, Text, Tuple
+
+import click
+
+from ..context import Context
+from ..lsp import constants
+
+
+@click.command()
+@click.pass_context
+@click.option(
+    "--schema",
+    type=Path,
+    help="a synthetic schema, instead of the one made by `lsp` in --output",
+)
+@click.option("--lsp-spec-version", default=constants.LSP_SPEC_VERSION)
+@click.option(
+    "--count",
+    "-n",
+    default=100,
+    type=click.IntRange(min=1),
+    help="number of messages of each kind for each method",
+)
+@click.option("--seed", default=0, help="the same seed always makes the same corpus")
+@click.option(
+    "--method",
+    "-m",
+    "methods",
+    multiple=True,
+    help="only generate messages for these methods",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=1),
+    help="number of processes generating messages",
+)
+@click.option(
+    "--corpus",
+    "corpus_path",
+    type=Path,
+    help="where to write the messages, default: lsp.<version>.corpus in --output",
+)
+@click.option("--report", type=Path, help="write a JSON report here")
+def corpus(
+    ctx: Context,
+    schema: Optional[Path],
+    lsp_spec_version: Text,
+    count: int,
+    seed: int,
+    methods: Tuple[Text, ...],
+    jobs: int,
+    corpus_path: Optional[Path],
+    report: Optional[Path],
+):
+    """ generate valid requests, responses and notifications for load testing
+
+        messages are written with `Content-Length` framing, and can be checked
+        with `expectorate validate`
+    """
+    try:
+        import hypothesis  # noqa: F401
+        import hypothesis_jsonschema  # noqa: F401
+    except ImportError as err:
+        raise click.ClickException(
+            f"generating a corpus needs {err.name}: pip install expectorate[corpus]"
+        )
+
+    from .generate import generate_corpus
+
+    output = ctx.obj.output
+    if schema is None:
+        assert output, "Need an output directory"
+        schema = output / f"lsp.{lsp_spec_version}.synthetic.schema.json"
+    if corpus_path is None:
+        assert output, "Need an output directory"
+        corpus_path = output / f"lsp.{lsp_spec_version}.corpus"
+
+    try:
+        result = generate_corpus(schema, corpus_path, count, seed, jobs, methods)
+    except KeyError as err:
+        raise click.BadParameter(err.args[0], param_hint="--method")
+
+    click.echo(
+        f"{corpus_path}: {result.messages} messages for {len(result.methods)} "
+        f"methods in {result.seconds:.2f}s ({result.rate:.0f} messages/s)"
+    )
+    if report is not None:
+        report.parent.mkdir(parents=True, exist_ok=True)
+        report.write_text(json.dumps(result.to_json(), indent=2, sort_keys=True))
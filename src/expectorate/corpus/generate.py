@@ -0,0 +1,196 @@
+""" writing a replayable stream of valid messages for every method of a schema
+"""
+import hashlib
+import json
+import random
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
+
+from ..validate.framing import write_frame
+
+FEATURE = re.compile(r"^_(?!Any)(\w+)Feature$")
+
+# messages of a method made by one job, so big methods are spread across jobs
+SHARD_SIZE = 10_000
+
+_BUILDER: Any = None
+
+
+@dataclass(frozen=True)
+class CorpusMethod:
+    """ the message definitions of one method
+    """
+
+    method: Text
+    request: Optional[Text] = None
+    response: Optional[Text] = None
+    notification: Optional[Text] = None
+
+
+@dataclass
+class CorpusReport:
+    messages: int = 0
+    seconds: float = 0.0
+    methods: Dict[Text, Dict[Text, int]] = field(default_factory=dict)
+
+    @property
+    def rate(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0.0
+
+    def to_json(self) -> Dict[Text, Any]:
+        return {**asdict(self), "messages_per_second": self.rate}
+
+
+def corpus_methods(definitions: Dict[Text, Any]) -> List[CorpusMethod]:
+    """ the methods of the `_<Title>Feature` definitions, by method name
+
+        a method with a notification definition is only sent as a notification
+    """
+    methods = []
+    for name in definitions:
+        match = FEATURE.match(name)
+        if not match:
+            continue
+        kinds = {
+            kind: f"_{match.group(1)}{kind.title()}"
+            for kind in ["request", "response", "notification"]
+        }
+        kinds = {kind: name for kind, name in kinds.items() if name in definitions}
+        message = definitions.get(kinds.get("notification") or kinds.get("request", ""))
+        method = (message or {}).get("properties", {}).get("method", {})
+        names = method.get("enum") or [method.get("const")]
+        if not names[0]:
+            continue
+        if "notification" in kinds:
+            methods.append(CorpusMethod(names[0], notification=kinds["notification"]))
+        else:
+            methods.append(
+                CorpusMethod(names[0], kinds.get("request"), kinds.get("response"))
+            )
+    return sorted(methods, key=lambda m: m.method)
+
+
+def shard_seed(seed: int, method: Text, shard: int) -> int:
+    """ a seed per shard of a method, so messages don't depend on other methods
+    """
+    digest = hashlib.sha256(f"{seed}:{method}:{shard}".encode("utf-8")).hexdigest()
+    return int(digest[:16], 16)
+
+
+def _init_worker(schema_path: Text) -> None:
+    global _BUILDER
+    from .strategies import StrategyBuilder
+
+    _BUILDER = StrategyBuilder(json.loads(Path(schema_path).read_text()))
+
+
+def write_shard(
+    job: Tuple[int, CorpusMethod, int],
+    part_dir: Path,
+    count: int,
+    seed: int,
+    shard_size: int = SHARD_SIZE,
+    builder: Any = None,
+) -> Dict[Text, Any]:
+    """ write up to `shard_size` messages of each kind of one method to a part file
+
+        requests get ids unique across the corpus, and their responses reuse them
+    """
+    from .strategies import draw_examples
+
+    index, target, shard = job
+    builder = builder or _BUILDER
+    assert builder is not None, "worker not initialized"
+    rng = random.Random(shard_seed(seed, target.method, shard))
+    numbers = range(shard * shard_size, min(count, (shard + 1) * shard_size))
+    kinds = {
+        kind: draw_examples(builder.definition(name), len(numbers), rng.getrandbits(64))
+        for kind, name in asdict(target).items()
+        if kind != "method" and name is not None
+    }
+    counts = {kind: 0 for kind in kinds}
+    path = part_dir / f"{index:06d}-{shard:06d}.part"
+    with path.open("wb") as stream:
+        for j, i in enumerate(numbers):
+            for kind, examples in kinds.items():
+                message = examples[j]
+                if "jsonrpc" in message:
+                    message["jsonrpc"] = "2.0"
+                if "id" in message:
+                    message["id"] = index * count + i + 1
+                write_frame(stream, message)
+                counts[kind] += 1
+    return {"method": target.method, "path": str(path), "counts": counts}
+
+
+def generate_corpus(
+    schema_path: Path,
+    out: Path,
+    count: int = 100,
+    seed: int = 0,
+    jobs: int = 1,
+    methods: Optional[Sequence[Text]] = None,
+    shard_size: int = SHARD_SIZE,
+) -> CorpusReport:
+    """ write `count` valid messages of each kind of each method to `out`
+
+        methods (and shards of big methods) are generated in parallel, but
+        always concatenated in the same order, so a `seed` (and `shard_size`)
+        gives the same bytes whatever the number of `jobs`
+    """
+    from .strategies import StrategyBuilder
+
+    start = time.perf_counter()
+    schema = json.loads(schema_path.read_text())
+    targets = corpus_methods(schema["definitions"])
+    if methods:
+        unknown = sorted(set(methods) - {t.method for t in targets})
+        if unknown:
+            raise KeyError(f"no messages for {', '.join(unknown)}")
+        targets = [t for t in targets if t.method in methods]
+    shards = [
+        (index, target, shard)
+        for index, target in enumerate(targets)
+        for shard in range(-(-count // shard_size))
+    ]
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    part_dir = out.parent / f".{out.name}.parts"
+    shutil.rmtree(part_dir, ignore_errors=True)
+    part_dir.mkdir()
+    write = partial(
+        write_shard, part_dir=part_dir, count=count, seed=seed, shard_size=shard_size
+    )
+
+    try:
+        if jobs <= 1 or len(shards) <= 1:
+            builder = StrategyBuilder(schema)
+            parts = [write(job, builder=builder) for job in shards]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(jobs, len(shards)),
+                initializer=_init_worker,
+                initargs=(str(schema_path),),
+            ) as pool:
+                parts = list(pool.map(write, shards))
+
+        report = CorpusReport()
+        with out.open("wb") as stream:
+            for part in parts:
+                with open(part["path"], "rb") as part_stream:
+                    shutil.copyfileobj(part_stream, stream)
+                counts = report.methods.setdefault(part["method"], {})
+                for kind, n in part["counts"].items():
+                    counts[kind] = counts.get(kind, 0) + n
+                report.messages += sum(part["counts"].values())
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    report.seconds = time.perf_counter() - start
+    return report
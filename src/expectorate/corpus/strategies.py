@@ -0,0 +1,154 @@
+""" hypothesis strategies for the definitions of a synthetic schema
+
+    `hypothesis_jsonschema.from_schema` re-resolves every subschema each time
+    it draws, which is far too slow for big corpora. Instead, the common
+    keywords are compiled once per definition, with `$ref` as a cached, deferred
+    strategy, and only the rest are handed to `from_schema`.
+"""
+import copy
+from typing import Any, Dict, List, Text
+
+import hypothesis
+from hypothesis import HealthCheck, Phase, given, settings, strategies as st
+
+from ..lsp.constants import ANNOTATIONS, DEFINITIONS
+
+# `format` is left to `from_schema`: the validators ignore it, but servers may not
+IGNORED = ANNOTATIONS - {"format"}
+
+COMPILED = IGNORED | {
+    "$ref",
+    "type",
+    "enum",
+    "const",
+    "anyOf",
+    "properties",
+    "required",
+    "additionalProperties",
+    "items",
+    "minItems",
+    "maxItems",
+}
+
+# JSON can't encode NaN or infinities, and some servers choke on huge integers
+INTEGERS = st.integers(min_value=-(2 ** 31), max_value=2 ** 31 - 1)
+PRIMITIVES: Dict[Text, st.SearchStrategy] = {
+    "null": st.none(),
+    "boolean": st.booleans(),
+    "integer": INTEGERS,
+    "number": INTEGERS | st.floats(allow_nan=False, allow_infinity=False),
+    "string": st.text(),
+}
+ANYTHING = st.recursive(
+    st.one_of(*PRIMITIVES.values()),
+    lambda children: st.lists(children) | st.dictionaries(st.text(), children),
+    max_leaves=5,
+)
+
+
+class StrategyBuilder:
+    """ builds (and caches) a strategy for each definition of a schema
+    """
+
+    def __init__(self, schema: Dict[Text, Any]):
+        self.schema = schema
+        self.definitions: Dict[Text, Any] = schema.get("definitions", {})
+        self.strategies: Dict[Text, st.SearchStrategy] = {}
+
+    def definition(self, name: Text) -> st.SearchStrategy:
+        strategy = self.strategies.get(name)
+        if strategy is None:
+            if name not in self.definitions:
+                raise KeyError(name)
+            strategy = self.strategies[name] = st.deferred(
+                lambda: self.build(self.definitions[name])
+            )
+        return strategy
+
+    def build(self, schema: Any) -> st.SearchStrategy:
+        """ a strategy for values which match `schema`
+        """
+        if schema is True or schema == {}:
+            return ANYTHING
+        if schema is False:
+            return st.nothing()
+        if set(schema) - COMPILED:
+            from hypothesis_jsonschema import from_schema
+
+            return from_schema({**schema, "definitions": self.definitions})
+        if "$ref" in schema:
+            return self.definition(schema["$ref"][len(DEFINITIONS) :])
+        if "const" in schema:
+            return st.just(schema["const"])
+        if "enum" in schema:
+            return st.sampled_from(schema["enum"])
+        if "anyOf" in schema:
+            rest = {k: v for k, v in schema.items() if k != "anyOf"}
+            if set(rest) - IGNORED:
+                return self.build({"allOf": [rest, {"anyOf": schema["anyOf"]}]})
+            return st.one_of([self.build(option) for option in schema["anyOf"]])
+
+        types = schema.get("type", list(PRIMITIVES) + ["array", "object"])
+        if isinstance(types, list):
+            return st.one_of([self.build({**schema, "type": t}) for t in types])
+        if types == "object":
+            return self.build_object(schema)
+        if types == "array":
+            return st.lists(
+                self.build(schema.get("items", True)),
+                min_size=schema.get("minItems", 0),
+                max_size=schema.get("maxItems"),
+            )
+        return PRIMITIVES[types]
+
+    def build_object(self, schema: Dict[Text, Any]) -> st.SearchStrategy:
+        properties = schema.get("properties", {})
+        required = set(schema.get("required", []))
+        missing = required - set(properties)
+        fixed = st.fixed_dictionaries(
+            {
+                **{key: self.build(properties.get(key, True)) for key in missing},
+                **{k: self.build(v) for k, v in properties.items() if k in required},
+            },
+            optional={
+                k: self.build(v) for k, v in properties.items() if k not in required
+            },
+        )
+        additional = schema.get("additionalProperties", True)
+        if additional is False:
+            return fixed
+        extra = st.dictionaries(
+            st.text().filter(lambda key: key not in properties),
+            self.build(additional),
+            max_size=3,
+        )
+        return st.tuples(extra, fixed).map(lambda both: {**both[0], **both[1]})
+
+
+def draw_examples(strategy: st.SearchStrategy, count: int, seed: int) -> List[Any]:
+    """ `count` examples, always the same for a `seed`, drawn by `@given`
+
+        without shrinking, or a database. a strategy with fewer distinct
+        examples than that repeats (copies of) them
+    """
+    drawn: List[Any] = []
+
+    @hypothesis.seed(seed)
+    @settings(
+        max_examples=count,
+        phases=[Phase.generate],
+        database=None,
+        deadline=None,
+        suppress_health_check=list(HealthCheck),
+    )
+    @given(strategy)
+    def collect(example: Any) -> None:
+        drawn.append(example)
+
+    collect()
+    if not drawn:
+        raise ValueError(f"couldn't draw an example from {strategy!r}")
+    return [
+        drawn[i] if i < len(drawn) else copy.deepcopy(drawn[i % len(drawn)])
+        for i in range(count)
+    ]
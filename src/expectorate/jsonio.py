@@ -0,0 +1,153 @@
+""" reading and writing big JSON documents without holding all their text
+
+    `load_json` decodes the outer containers of a document piece by piece, so
+    only one (e.g. definition) value is ever held as text alongside the parsed
+    objects, and `dump_json` writes the encoder's chunks as they are made
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import IO, Any, Dict, List, Text, Tuple
+
+CHUNK_SIZE = 1 << 16
+
+# the outer containers decoded piece by piece, e.g. a schema and its definitions
+STREAM_DEPTH = 2
+
+WHITESPACE = " \t\n\r"
+
+DELIMITER = re.compile(r"[\s,\]}]")
+
+
+class JsonStream:
+    """ a cursor over the text of a JSON document, read a chunk at a time
+    """
+
+    def __init__(self, stream: IO[Text], chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        # `json` only shares equal keys within one decode, so share them (and
+        # string values, like types and refs) across the whole document
+        self.strings: Dict[Text, Text] = {}
+        self.decoder = json.JSONDecoder(object_pairs_hook=self.shared)
+
+    def shared(self, pairs: List[Tuple[Text, Any]]) -> Dict[Text, Any]:
+        strings = self.strings
+        return {
+            strings.setdefault(key, key): (
+                strings.setdefault(value, value) if type(value) is str else value
+            )
+            for key, value in pairs
+        }
+
+    def fill(self) -> bool:
+        """ read another chunk (growing with the buffer), dropping consumed text
+        """
+        if self.eof:
+            return False
+        chunk = self.stream.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return bool(chunk)
+
+    def peek(self) -> Text:
+        """ the next non-whitespace character, or "" at the end
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos : self.pos + 1]
+
+    def expect(self, char: Text) -> None:
+        found = self.peek()
+        if found != char:
+            self.error(f"expected {char!r}, found {found or 'the end'!r}")
+        self.pos += 1
+
+    def error(self, message: Text) -> None:
+        raise json.JSONDecodeError(message, self.buffer, self.pos)
+
+    def value(self, depth: int = 0) -> Any:
+        """ the next value, decoding objects and arrays above `depth` in pieces
+        """
+        start = self.peek()
+        if depth > 0 and start == "{":
+            return self.object(depth - 1)
+        if depth > 0 and start == "[":
+            return self.array(depth - 1)
+        if start not in '"{[':
+            # a number (or literal) isn't over until something follows it
+            while not DELIMITER.search(self.buffer, self.pos) and self.fill():
+                pass
+        while True:
+            try:
+                value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+    def object(self, depth: int) -> Dict[Text, Any]:
+        self.expect("{")
+        result: Dict[Text, Any] = {}
+        if self.peek() == "}":
+            self.pos += 1
+            return result
+        while True:
+            if self.peek() != '"':
+                self.error("expected a property name")
+            key = self.value()
+            self.expect(":")
+            result[self.strings.setdefault(key, key)] = self.value(depth)
+            if self.peek() == "}":
+                self.pos += 1
+                return result
+            self.expect(",")
+
+    def array(self, depth: int) -> List[Any]:
+        self.expect("[")
+        result: List[Any] = []
+        if self.peek() == "]":
+            self.pos += 1
+            return result
+        while True:
+            result.append(self.value(depth))
+            if self.peek() == "]":
+                self.pos += 1
+                return result
+            self.expect(",")
+
+
+def load_json(
+    path: Path, depth: int = STREAM_DEPTH, chunk_size: int = CHUNK_SIZE
+) -> Any:
+    """ parse a JSON file incrementally, like `json.loads(path.read_text())`
+    """
+    with path.open(encoding="utf-8") as fd:
+        reader = JsonStream(fd, chunk_size)
+        value = reader.value(depth)
+        if reader.peek():
+            reader.error("extra data")
+    return value
+
+
+def dump_json(obj: Any, path: Path) -> None:
+    """ write sorted, indented JSON, like `json.dumps(..., indent=2, sort_keys=True)`
+
+        chunks are written as they are encoded, to a temporary file which then
+        replaces `path`, so a file can be rewritten from its own parsed content
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as fd:
+            json.dump(obj, fd, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
@@ -1,12 +1,13 @@
+import json
 import sys
-from typing import Text
+import time
+from typing import Text, Tuple
 
 import click
 
 from ..context import Context
 from . import constants
 from .conventions import CONVENTIONS
-from .generate import SpecGenerator
 
 
 @click.command()
@@ -16,6 +17,59 @@ from .generate import SpecGenerator
 @click.option("--lsp-committish", default=constants.LSP_COMMIT)
 @click.option("--vlspn-repo", default=constants.VLSPN_REPO)
 @click.option("--vlspn-committish", default=constants.VLSPN_COMMIT)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help="reuse outputs of unchanged stages from --cache-dir",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=1),
+    help="number of independent stages to run at once",
+)
+@click.option(
+    "--node-worker/--no-node-worker",
+    default=True,
+    help="run node tools in one persistent process, rather than one per call",
+)
+@click.option(
+    "--slice/--no-slice",
+    "slice_schemas",
+    default=False,
+    help="also write a minimal schema per message definition, and a manifest",
+)
+@click.option(
+    "--dedupe/--no-dedupe",
+    "dedupe_schemas",
+    default=False,
+    help="merge identical definitions in the written schemas, and write a mapping",
+)
+@click.option(
+    "--incremental/--no-incremental",
+    default=True,
+    help="only regenerate features that changed since the last run in --output",
+)
+@click.option(
+    "--synthetic-builder",
+    default="typescript",
+    type=click.Choice(constants.SYNTHETIC_BUILDERS),
+    help=(
+        "compile rendered typescript, or (experimental, opt-in) assemble the "
+        "synthetic schema in python, skipping prettier and a TSSG compile"
+    ),
+)
+@click.option(
+    "--check-synthetic/--no-check-synthetic",
+    default=False,
+    help="build the synthetic schema with both builders, and fail if they differ",
+)
+@click.option(
+    "--watch/--no-watch",
+    default=False,
+    help="keep running, and rebuild when the spec, protocol or conventions change",
+)
 def lsp(
     ctx: Context,
     lsp_spec_version: Text,
@@ -23,12 +77,23 @@ def lsp(
     lsp_committish: Text,
     vlspn_repo: Text,
     vlspn_committish: Text,
+    cache: bool,
+    jobs: int,
+    node_worker: bool,
+    slice_schemas: bool,
+    dedupe_schemas: bool,
+    incremental: bool,
+    synthetic_builder: Text,
+    check_synthetic: bool,
+    watch: bool,
 ):
     """ generate a JSON schema from:
         - Language Server Protocol (lsp) specification
         - vscode-languageserver-node reference implementation
     """
 
+    from .generate import SpecGenerator
+
     lsp_spec = (
         CONVENTIONS.get(lsp_spec_version) or CONVENTIONS[constants.LSP_SPEC_VERSION]
     )
@@ -47,5 +112,107 @@ def lsp(
         lsp_committish=lsp_committish,
         vlspn_repo=vlspn_repo,
         vlspn_committish=vlspn_committish,
+        cache_dir=ctx.obj.cache_dir,
+        use_cache=cache,
+        jobs=jobs,
+        use_node_worker=node_worker,
+        slice_schemas=slice_schemas,
+        dedupe_schemas=dedupe_schemas,
+        incremental=incremental,
+        synthetic_builder=synthetic_builder,
+        check_synthetic=check_synthetic,
     )
+    if watch:
+        from .watch import SpecWatcher
+
+        sys.exit(SpecWatcher(gen).run())
     sys.exit(gen.generate())
+
+
+@click.command("lsp-matrix")
+@click.pass_context
+@click.option(
+    "--target",
+    "-t",
+    "targets",
+    multiple=True,
+    help="VERSION[:LSP_COMMITTISH[:VLSPN_COMMITTISH]], default: every spec version",
+)
+@click.option("--lsp-repo", default=constants.LSP_REPO)
+@click.option("--vlspn-repo", default=constants.VLSPN_REPO)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=1),
+    help="number of targets to generate at once",
+)
+@click.option("--cache/--no-cache", default=True)
+@click.option("--node-worker/--no-node-worker", default=True)
+@click.option("--slice/--no-slice", "slice_schemas", default=False)
+@click.option("--dedupe/--no-dedupe", "dedupe_schemas", default=False)
+@click.option(
+    "--synthetic-builder",
+    default="typescript",
+    type=click.Choice(constants.SYNTHETIC_BUILDERS),
+    help="as for `lsp`: python is experimental, and opt-in",
+)
+def lsp_matrix(
+    ctx: Context,
+    targets: Tuple[Text, ...],
+    lsp_repo: Text,
+    vlspn_repo: Text,
+    jobs: int,
+    cache: bool,
+    node_worker: bool,
+    slice_schemas: bool,
+    dedupe_schemas: bool,
+    synthetic_builder: Text,
+):
+    """ generate schemas for several spec versions and commits, in parallel
+
+        each target writes to its own directory of --output
+    """
+    from .matrix import MatrixTarget, run_matrix
+
+    assert ctx.obj.workdir, "Need a working directory"
+    assert ctx.obj.output, "Need an output directory"
+    assert ctx.obj.log, "Need a log"
+
+    try:
+        parsed = [MatrixTarget.parse(target) for target in targets] or [
+            MatrixTarget(version) for version in CONVENTIONS
+        ]
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--target")
+
+    start = time.perf_counter()
+    results = run_matrix(
+        parsed,
+        workdir=ctx.obj.workdir,
+        output=ctx.obj.output,
+        log=ctx.obj.log,
+        jobs=jobs,
+        options=dict(
+            lsp_repo=lsp_repo,
+            vlspn_repo=vlspn_repo,
+            cache_dir=ctx.obj.cache_dir,
+            use_cache=cache,
+            use_node_worker=node_worker,
+            slice_schemas=slice_schemas,
+            dedupe_schemas=dedupe_schemas,
+            synthetic_builder=synthetic_builder,
+        ),
+    )
+    summary = {"seconds": time.perf_counter() - start, "targets": results}
+
+    for result in results:
+        status = "ok" if result["returncode"] == 0 else result.get("error", "failed")
+        click.echo(f"""{result["label"]}: {status} in {result["seconds"]:.1f}s""")
+    click.echo(f"""{len(results)} targets in {summary["seconds"]:.1f}s""")
+
+    ctx.obj.output.mkdir(parents=True, exist_ok=True)
+    (ctx.obj.output / "matrix.json").write_text(
+        json.dumps(summary, indent=2, sort_keys=True)
+    )
+    sys.exit(max(result["returncode"] for result in results))
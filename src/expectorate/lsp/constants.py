@@ -8,3 +8,28 @@ VLSPN_REPO = "https://github.com/microsoft/vscode-languageserver-node.git"
 PRETTIER_VERSION = "2.0.2"
 TSSG_VERSION = "0.65.0"
 TSSG = "ts-json-schema-generator"
+
+# python assembles the synthetic schema from the naive schema, typescript
+# renders a template, formats it and compiles it with TSSG
+SYNTHETIC_BUILDERS = ["python", "typescript"]
+
+# where a `$ref` finds a definition of a schema
+DEFINITIONS = "#/definitions/"
+
+# keywords which never affect validity, as checked by both the compiled and the
+# jsonschema validators: what identical definitions may differ by
+ANNOTATIONS = frozenset(
+    [
+        "$schema",
+        "$id",
+        "$comment",
+        "title",
+        "description",
+        "default",
+        "examples",
+        "definitions",
+        "format",
+        "readOnly",
+        "writeOnly",
+    ]
+)
@@ -1,7 +1,37 @@
 """ typographical conventions for working with LSP markdown specs
 """
 from dataclasses import dataclass
-from typing import Text
+from typing import Text, Tuple
+
+from .rules import Rule, RuleSet, compile_rules
+
+# the type named by a `params` bullet, e.g. "`InitializeParams` defined as follows"
+PARAMS_RULES = (Rule("code span", r"`(.*?)`", r"\1"),)
+
+# the typescript type of a `result` bullet, e.g. "[`Location`](#location) \| `null`"
+RESULT_RULES = (
+    Rule("follows", r"defined as follows:"),
+    Rule("link", r"\[`?(.*?)`?\]\(#.+\)", r"\1"),
+    Rule("code span", r"`"),
+    Rule("selected", r"the selected"),
+    Rule("escaped union", r"\\\|", "|"),
+    Rule("where", r" where ", truncate=True),
+    Rule("describing", r" describing ", truncate=True),
+    Rule("as defined", r" as defined ", truncate=True),
+    Rule("sentence", r"\. ", truncate=True),
+    Rule("if", r" if ", truncate=True),
+    Rule("full stop", r"\.\s*$"),
+)
+
+# splits a result into its alternatives: unlike the old literal split on "\|",
+# which never matched once the escapes were removed, this yields one `oneOf`
+# entry per alternative
+UNION_RULES = (Rule("union", r"\s*\|\s*"),)
+
+# qualifies the type names of a result, e.g. `proto.Hover`
+NAMESPACE_RULES = (Rule("type name", r"\b([A-Z])", r"proto.\1"),)
+
+Rules = Tuple[Rule, ...]
 
 
 @dataclass
@@ -10,6 +40,15 @@ class SpecConvention:
     preamble_separator: Text
     epilogue_separator: Text
     feature_separator: Text
+    params_rules: Rules = PARAMS_RULES
+    result_rules: Rules = RESULT_RULES
+    union_rules: Rules = UNION_RULES
+    namespace_rules: Rules = NAMESPACE_RULES
+
+    def rules(self, kind: Text) -> RuleSet:
+        """ the compiled `params`, `result`, `union` or `namespace` rules
+        """
+        return compile_rules(getattr(self, f"{kind}_rules"))
 
 
 @dataclass
@@ -18,6 +57,12 @@ class Version314(SpecConvention):
     preamble_separator: Text = "#### $ Notifications and Requests"
     epilogue_separator: Text = "### Implementation considerations"
     feature_separator: Text = "#### <a href"
+    # all rules see the original text, so this must come before "code span"
+    result_rules: Rules = (
+        *RESULT_RULES[:2],
+        Rule("document links", r"An array of `?DocumentLink`?", "DocumentLink[]"),
+        *RESULT_RULES[2:],
+    )
 
 
 @dataclass
@@ -29,6 +74,12 @@ class Version315(Version314):
     preamble_separator: Text = "#### Server lifetime"
 
 
+def method_title(method: Text) -> Text:
+    """ the TitleCase name used for a method's definitions, e.g. `_{title}Request`
+    """
+    return "".join([b[0].upper() + b[1:] for b in method.split("/") if b != "$"])
+
+
 CONVENTIONS = {
     "3.14": Version314(),
     "3.15": Version315(),
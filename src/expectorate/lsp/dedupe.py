@@ -0,0 +1,218 @@
+""" merging structurally identical definitions, and subschemas, of a schema
+
+    two subschemas are the same if they are equal once annotations (like
+    `description`) are dropped, unordered lists (like `required`) are sorted
+    and every `$ref` points at the definition it was merged into. merged
+    definitions are kept, as a bare `$ref`, so they can still be found by name
+"""
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Text, Tuple
+
+from .constants import ANNOTATIONS, DEFINITIONS
+
+# keywords whose values are lists, in no particular order
+UNORDERED = {"required", "enum", "type"}
+
+# keywords whose values are maps of names to subschemas
+NAMED = {"properties", "patternProperties", "dependencies"}
+
+# keywords of a subschema worth sharing, rather than repeating inline
+STRUCTURED = {"properties", "enum", "anyOf", "oneOf", "allOf"}
+
+SHARED_PREFIX = "_Shared"
+
+
+def schema_slots(node: Any) -> Iterator[Tuple[Any, Any]]:
+    """ the (container, key) of every subschema directly inside a schema
+    """
+    if not isinstance(node, dict):
+        return
+    for key in ["additionalProperties", "additionalItems", "items", "not"]:
+        if isinstance(node.get(key), dict):
+            yield node, key
+    for key in sorted(NAMED):
+        if isinstance(node.get(key), dict):
+            for name, value in node[key].items():
+                if isinstance(value, dict):
+                    yield node[key], name
+    for key in ["items", "anyOf", "oneOf", "allOf"]:
+        if isinstance(node.get(key), list):
+            for index, value in enumerate(node[key]):
+                if isinstance(value, dict):
+                    yield node[key], index
+
+
+def canonical(node: Any, resolve: Callable[[Text], Text]) -> Any:
+    """ a schema without annotations, with sorted lists and merged `$ref`s
+    """
+    if isinstance(node, list):
+        return [canonical(item, resolve) for item in node]
+    if not isinstance(node, dict):
+        return node
+    result: Dict[Text, Any] = {}
+    for key, value in node.items():
+        if key in ANNOTATIONS:
+            continue
+        if key == "$ref" and isinstance(value, str) and value.startswith(DEFINITIONS):
+            value = DEFINITIONS + resolve(value[len(DEFINITIONS) :])
+        elif key in NAMED and isinstance(value, dict):
+            # a property may well be called `description`
+            value = {name: canonical(sub, resolve) for name, sub in value.items()}
+        elif key not in {"enum", "const"}:
+            # ...which are data, not schema
+            value = canonical(value, resolve)
+        if key in UNORDERED and isinstance(value, list):
+            value = sorted(value, key=lambda item: json.dumps(item, sort_keys=True))
+        result[key] = value
+    return result
+
+
+def digest(node: Any, resolve: Callable[[Text], Text]) -> Text:
+    text = json.dumps(canonical(node, resolve), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_structured(node: Any) -> bool:
+    return isinstance(node, dict) and bool(STRUCTURED & set(node))
+
+
+@dataclass
+class Deduplicator:
+    """ merges the duplicate definitions and subschemas of one schema
+    """
+
+    schema: Dict[Text, Any]
+    merged: Dict[Text, Text] = field(default_factory=dict)
+    shared: Dict[Text, int] = field(default_factory=dict)
+
+    def resolve(self, name: Text) -> Text:
+        while name in self.merged:
+            name = self.merged[name]
+        return name
+
+    def merge_definitions(self, definitions: Dict[Text, Any]) -> None:
+        """ point each set of identical definitions at one of them, until none are
+        """
+        while True:
+            groups: Dict[Text, List[Text]] = {}
+            for name, definition in definitions.items():
+                if name not in self.merged:
+                    groups.setdefault(digest(definition, self.resolve), []).append(name)
+            duplicates = [names for names in groups.values() if len(names) > 1]
+            if not duplicates:
+                return
+            for names in duplicates:
+                # public names (and then short ones) are the best to keep
+                keep = min(names, key=lambda n: (n.startswith("_"), len(n), n))
+                for name in names:
+                    if name != keep:
+                        self.merged[name] = keep
+
+    def count_subschemas(self, definitions: Dict[Text, Any]) -> Counter:
+        """ how often each structured subschema appears, counting the contents
+            of a repeated one only once
+        """
+        counts: Counter = Counter()
+        seen = set()
+
+        def visit(node: Any) -> None:
+            for container, key in schema_slots(node):
+                sub = container[key]
+                if not is_structured(sub):
+                    visit(sub)
+                    continue
+                sub_digest = digest(sub, self.resolve)
+                counts[sub_digest] += 1
+                if sub_digest not in seen:
+                    seen.add(sub_digest)
+                    visit(sub)
+
+        for name, definition in definitions.items():
+            if name not in self.merged:
+                visit(definition)
+        return counts
+
+    @staticmethod
+    def worth_sharing(sub: Dict[Text, Any], count: int) -> bool:
+        """ whether a new definition, and a `$ref` for each use, are smaller
+        """
+        ref = len(json.dumps({"$ref": f"{DEFINITIONS}{SHARED_PREFIX}_{'0' * 12}"}))
+        return (count - 1) * len(json.dumps(sub)) > count * ref
+
+    def share_subschemas(self, definitions: Dict[Text, Any]) -> None:
+        """ replace inline subschemas that are definitions, or are repeated, with
+            `$ref`s
+        """
+        named = {
+            digest(definition, self.resolve): name
+            for name, definition in definitions.items()
+            if name not in self.merged and is_structured(definition)
+        }
+        counts = self.count_subschemas(definitions)
+        hoisted: Dict[Text, Any] = {}
+
+        def visit(node: Any) -> None:
+            for container, key in schema_slots(node):
+                sub = container[key]
+                # digested before any of its contents are replaced
+                sub_digest = digest(sub, self.resolve) if is_structured(sub) else None
+                name = named.get(sub_digest) if sub_digest else None
+                if (
+                    sub_digest
+                    and name is None
+                    and self.worth_sharing(sub, counts[sub_digest])
+                ):
+                    name = named[sub_digest] = f"{SHARED_PREFIX}_{sub_digest[:12]}"
+                    hoisted[name] = sub
+                    self.shared[name] = counts[sub_digest]
+                    visit(sub)
+                if name is None:
+                    visit(sub)
+                else:
+                    container[key] = {"$ref": f"{DEFINITIONS}{name}"}
+
+        for name, definition in list(definitions.items()):
+            if name not in self.merged:
+                visit(definition)
+        definitions.update(sorted(hoisted.items()))
+
+    def dedupe(self) -> Dict[Text, Any]:
+        """ a copy of the schema, with every shape defined once
+        """
+        schema = json.loads(json.dumps(self.schema))
+        definitions: Dict[Text, Any] = schema.get("definitions", {})
+        self.merge_definitions(definitions)
+        self.share_subschemas(definitions)
+        for name in self.merged:
+            definitions[name] = {"$ref": f"{DEFINITIONS}{self.resolve(name)}"}
+
+        def rewrite(node: Any) -> None:
+            if isinstance(node, dict):
+                ref = node.get("$ref")
+                if isinstance(ref, str) and ref.startswith(DEFINITIONS):
+                    node["$ref"] = DEFINITIONS + self.resolve(ref[len(DEFINITIONS) :])
+                for key, value in node.items():
+                    if key not in {"enum", "const"}:
+                        rewrite(value)
+            elif isinstance(node, list):
+                for item in node:
+                    rewrite(item)
+
+        rewrite(schema)
+        return schema
+
+    def mapping(self) -> Dict[Text, Any]:
+        return {
+            "merged": {name: self.resolve(name) for name in sorted(self.merged)},
+            "shared": dict(sorted(self.shared.items())),
+        }
+
+
+def dedupe_schema(schema: Dict[Text, Any]) -> Tuple[Dict[Text, Any], Dict[Text, Any]]:
+    """ a schema with duplicates merged, and the names they were merged into
+    """
+    deduplicator = Deduplicator(schema)
+    return deduplicator.dedupe(), deduplicator.mapping()
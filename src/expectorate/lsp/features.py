@@ -0,0 +1,144 @@
+""" a compact, indexed table of the features (requests and notifications) of a spec
+"""
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Text
+
+import pyemojify
+
+# every bullet a feature section is mined for, found in a single pass
+BULLETS = re.compile(
+    r"""\* (?:method: '(?P<method>.*)'"""
+    r"""|params: (?P<params>.*)"""
+    r"""|(?i:result): (?P<result>.*)"""
+    r"""|(?i:error): (?P<error>.*))"""
+)
+
+# the emoji of requests, which (unlike notifications) expect a response
+REQUEST_ARROWS = ["↩", "↪"]
+
+
+class FeatureRecord:
+    """ one feature section of the spec, and everything learned about it
+
+        the markdown itself isn't kept: `section` is its index in the spec
+    """
+
+    __slots__ = [
+        "section",
+        "method",
+        "title",
+        "type",
+        "raw_params",
+        "raw_result",
+        "raw_error",
+        "params",
+        "params_schema",
+        "result",
+        "result_schema",
+        "ns_title",
+        "ns_result",
+    ]
+
+    section: Optional[int]
+    method: Optional[Text]
+    title: Text
+    type: Optional[Text]
+    raw_params: Optional[Text]
+    raw_result: Optional[Text]
+    raw_error: Optional[Text]
+    params: Optional[Text]
+    params_schema: Optional[Dict[Text, Any]]
+    result: Optional[Text]
+    result_schema: Optional[Dict[Text, Any]]
+    ns_title: Optional[Text]
+    ns_result: Optional[Text]
+
+    def __init__(self, md: Text, section: Optional[int] = None):
+        self.section = section
+        found: Dict[Text, Text] = {}
+        for match in BULLETS.finditer(md):
+            for key, value in match.groupdict().items():
+                if value is not None and key not in found:
+                    found[key] = value
+
+        self.method = found.get("method")
+        self.raw_params = found.get("params")
+        self.raw_result = found.get("result")
+        self.raw_error = found.get("error")
+
+        heading = md.split(">", 2)[1].split("<", 1)[0].strip() if ">" in md else ""
+        title, paren, kind = heading.partition("(")
+        self.title = title.strip()
+        self.type = (
+            pyemojify.emojify(kind.split("(")[0]).replace(")", "").strip()
+            if paren
+            else None
+        )
+
+        self.params = None
+        self.params_schema = None
+        self.result = None
+        self.result_schema = None
+        self.ns_title = None
+        self.ns_result = None
+
+    @property
+    def is_notification(self) -> bool:
+        return bool(self.type) and not any(
+            a in (self.type or "") for a in REQUEST_ARROWS
+        )
+
+    def __repr__(self) -> Text:
+        return f"<FeatureRecord {self.type} {self.method}>"
+
+
+class FeatureView:
+    """ some columns of a table, only formatted as text when logged
+    """
+
+    def __init__(self, records: Iterable[FeatureRecord], columns: Iterable[Text]):
+        self.records = list(records)
+        self.columns = ["type", "method", *columns]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __str__(self) -> Text:
+        rows = [self.columns] + [
+            [str(getattr(record, col)) for col in self.columns]
+            for record in self.records
+        ]
+        widths = [
+            min(40, max(len(row[i]) for row in rows)) for i in range(len(rows[0]))
+        ]
+        return "\n".join(
+            "  ".join(cell[:width].ljust(width) for cell, width in zip(row, widths))
+            for row in rows
+        )
+
+
+class FeatureTable:
+    """ features sorted by type and method
+    """
+
+    def __init__(self, records: Iterable[FeatureRecord]):
+        self.records = sorted(
+            records, key=lambda r: (r.type is None, r.type or "", r.method or ""),
+        )
+
+    def __iter__(self) -> Iterator[FeatureRecord]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def where(self, predicate: Callable[[FeatureRecord], Any]) -> List[FeatureRecord]:
+        return [record for record in self.records if predicate(record)]
+
+    def view(
+        self, *columns: Text, records: Optional[Iterable[FeatureRecord]] = None
+    ) -> FeatureView:
+        return FeatureView(self.records if records is None else records, columns)
+
+    def __str__(self) -> Text:
+        return str(self.view("title", "params", "result", "ns_title"))
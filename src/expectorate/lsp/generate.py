@@ -1,23 +1,123 @@
 import json
 import logging
-import re
-import subprocess
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Text
+from typing import Any, ClassVar, Dict, List, Optional, Sequence, Text
 
 import jinja2
 import jsonschema
-import pandas
-import pyemojify
 
-from ..utils import ensure_js_package, ensure_repo
+from ..cache import StageCache, hash_inputs
+from ..jsonio import dump_json, load_json
+from ..profile import profiled
+from ..stages import Stage, StageScheduler
+from ..utils import (
+    check_call,
+    ensure_js_packages,
+    ensure_repo,
+    link_tree,
+    locked,
+    stream_output,
+)
 from . import constants
-from .conventions import CONVENTIONS, SpecConvention
+from .conventions import CONVENTIONS, SpecConvention, method_title
+from .dedupe import canonical, dedupe_schema
+from .features import FeatureRecord, FeatureTable, FeatureView
+from .incremental import (
+    FeatureState,
+    diff_hashes,
+    feature_hash,
+    merge_features,
+    referenced_definitions,
+)
+from .pyclasses import ClassCompiler
+from .pycompile import UnsupportedSchema, compile_schema
+from .rules import dead_rules
+from .sections import SectionIndex
+from .slicing import reachable_definitions, slice_schema
+from .synthetic import assemble_synthetic_schema
+from .worker import WORKER_JS, NodeWorker
+
+PROTOCOL_SCHEMA_TS = "protocol-schema.ts"
+TEMPLATE = Path(__file__).parent / "templates" / "protocol-schema.ts.j2"
+SYNTHETIC_PY = Path(__file__).parent / "synthetic.py"
+PYCOMPILE_PY = Path(__file__).parent / "pycompile.py"
+PYCLASSES_PY = Path(__file__).parent / "pyclasses.py"
+
+# the typescript packages the protocol sources import, each in its own folder
+# of the vlspn checkout, and maybe installed in `node_modules`
+PROTOCOL_PACKAGES = {
+    "vscode-jsonrpc": "jsonrpc",
+    "vscode-languageserver-types": "types",
+}
+
+# the files prettier reads its options from, in any folder above a file
+PRETTIER_CONFIGS = [
+    ".editorconfig",
+    ".prettierrc",
+    ".prettierrc.cjs",
+    ".prettierrc.js",
+    ".prettierrc.json",
+    ".prettierrc.json5",
+    ".prettierrc.toml",
+    ".prettierrc.yaml",
+    ".prettierrc.yml",
+    "package.json",
+    "prettier.config.cjs",
+    "prettier.config.js",
+]
 
 
 @dataclass
 class SpecGenerator:
+    STAGES: ClassVar[List[Stage]] = [
+        Stage("ensure_lsp_repo", (), ("lsp_dir",)),
+        Stage("ensure_vlspn_repo", (), ("vlspn_dir",)),
+        Stage("parse_spec", ("lsp_dir",), ("spec_index",)),
+        Stage("ensure_js_deps", ("vlspn_dir",), ("js_deps",)),
+        Stage("build_naive_schema", ("vlspn_dir", "js_deps"), ("naive_schema",)),
+        Stage("extract_spec_features", ("spec_index",), ("spec_features",)),
+        # data munging: each step annotates the same feature records, so they
+        # are chained, but can overlap with the naive schema build
+        Stage("init_features", ("spec_features",), ("features",)),
+        Stage("annotate_results", ("features",), ("features.result",)),
+        Stage("check_results", ("features.result",), ("features.checked",)),
+        Stage("annotate_method_titles", ("features.checked",), ("features.ns_title",)),
+        Stage(
+            "annotate_result_titles", ("features.ns_title",), ("features.ns_result",)
+        ),
+        Stage(
+            "annotate_params",
+            ("features.ns_result", "naive_schema"),
+            ("features.params",),
+        ),
+        Stage(
+            "annotate_result_schema", ("features.params",), ("features.result_schema",)
+        ),
+        Stage("hash_features", ("features.result_schema",), ("feature_hashes",)),
+        Stage(
+            "write_protocol_schema_ts",
+            ("feature_hashes", "js_deps"),
+            ("protocol_schema_ts",),
+        ),
+        Stage("build_synthetic_schema", ("protocol_schema_ts",), ("synthetic_schema",)),
+        # post-test
+        Stage("validate_synthetic_schema", ("synthetic_schema",), ("valid",)),
+        Stage("annotate_params_schema", ("valid",), ("features.params_schema",)),
+        Stage(
+            "reannotate_result_schema",
+            ("features.params_schema",),
+            ("features.final",),
+        ),
+        Stage("validate_final_schema", ("features.final",), ("features.valid",)),
+        Stage("write_feature_state", ("features.valid",), ("feature_state",)),
+        Stage("merge_duplicate_definitions", ("feature_state",), ("deduped",)),
+        Stage("slice_synthetic_schema", ("deduped",), ("slices",)),
+        Stage("compile_validators", ("deduped",), ("validators",)),
+        Stage("compile_classes", ("deduped",), ("classes",)),
+    ]
+
     workdir: Path
     output: Path
     log: logging.Logger
@@ -25,7 +125,9 @@ class SpecGenerator:
     lsp_dir: Optional[Path] = None
     vlspn_dir: Optional[Path] = None
 
-    lsp_spec: SpecConvention = CONVENTIONS[constants.LSP_SPEC_VERSION]
+    lsp_spec: SpecConvention = field(
+        default_factory=lambda: CONVENTIONS[constants.LSP_SPEC_VERSION]
+    )
 
     lsp_repo: Text = constants.LSP_REPO
     lsp_committish: Text = constants.LSP_COMMIT
@@ -36,66 +138,210 @@ class SpecGenerator:
     prettier_version: Text = constants.PRETTIER_VERSION
     tssg_version: Text = constants.TSSG_VERSION
 
-    raw_spec: Optional[Text] = None
+    cache_dir: Optional[Path] = None
+    use_cache: bool = True
+    jobs: int = 1
+
+    # only regenerate features whose section (or types) changed since last time
+    incremental: bool = True
+
+    slice_schemas: bool = False
+
+    # merge identical definitions in the written schemas, once nothing else needs
+    # the originals
+    dedupe_schemas: bool = False
+
+    # python skips prettier and a TSSG compile, but is experimental and opt-in:
+    # the fake TSSG of the tests follows it, so only `check_synthetic` with a
+    # real TSSG shows whether they agree
+    synthetic_builder: Text = "typescript"
+    # build the synthetic schema with both builders, and fail if they differ
+    check_synthetic: bool = False
+
+    # generated files go here, rather than into the (shared) vlspn checkout
+    scratch_dir: Optional[Path] = None
+
+    use_node_worker: bool = True
+    node_worker: Optional[NodeWorker] = None
+
+    spec_index: Optional[SectionIndex] = None
 
-    spec_features: Optional[List[Text]] = None
+    spec_features: Optional[Sequence[Text]] = None
 
     naive_schema: Optional[Dict[Text, Any]] = None
     synthetic_schema: Optional[Dict[Text, Any]] = None
 
-    df: Optional[pandas.DataFrame] = None
+    features: Optional[FeatureTable] = None
+
+    feature_hashes: Optional[Dict[Text, Text]] = None
+    previous_state: Optional[FeatureState] = None
+    stale_features: Optional[List[FeatureRecord]] = None
+
+    # how often each spec convention rule fired, by kind of rule
+    rule_hits: Dict[Text, "Counter[Text]"] = field(default_factory=dict)
 
     def vlspn_bin(self, cmd: Text) -> List[Text]:
         assert self.vlspn_dir is not None
         return ["node", str(self.vlspn_dir / "node_modules" / ".bin" / cmd)]
 
-    def generate(self) -> int:
-        self.ensure_repos()
-        self.parse_spec()
-        self.ensure_js_deps()
-        self.build_naive_schema()
-        self.extract_spec_features()
-        # do data munging
-        self.init_df()
-        self.annotate_params()
-        self.annotate_results()
-        self.annotate_result_schema()
-        self.check_results()
-        self.annotate_method_titles()
-        self.annotate_result_titles()
-        self.write_protocol_schema_ts()
-        self.build_synthetic_schema()
+    @property
+    def cache(self) -> Optional[StageCache]:
+        if not self.use_cache or self.cache_dir is None:
+            return None
+        return StageCache(self.cache_dir / "stages", log=self.log)
 
-        # post-test
-        self.validate_synthetic_schema()
-        self.annotate_params_schema()
-        self.reannotate_result_schema()
-        self.validate_final_schema()
+    @property
+    def protocol_schema_ts_path(self) -> Path:
+        assert self.vlspn_dir is not None
+        root = self.vlspn_dir if self.scratch_dir is None else self.scratch_dir
+        return root / "protocol" / "src" / PROTOCOL_SCHEMA_TS
+
+    @property
+    def protocol_sources(self) -> List[Path]:
+        """ the hand-written typescript sources, the packages they import and the
+            project config, which together determine the naive schema
+        """
+        assert self.vlspn_dir is not None
+        protocol = self.vlspn_dir / "protocol"
+        sources = [p for p in protocol.glob("*.json") if p.is_file()]
+        sources += [
+            p for p in (protocol / "src").rglob("*.ts") if p.name != PROTOCOL_SCHEMA_TS
+        ]
+        for package, folder in PROTOCOL_PACKAGES.items():
+            sources += (self.vlspn_dir / folder / "src").rglob("*.ts")
+            for root in [protocol, self.vlspn_dir]:
+                installed = root / "node_modules" / package / "package.json"
+                if installed.is_file():
+                    sources.append(installed)
+        return sorted(sources)
+
+    @property
+    def jsonrpc_sources(self) -> List[Path]:
+        """ the jsonrpc sources, and installed package, which define the messages
+            every synthetic definition extends
+        """
+        assert self.vlspn_dir is not None
+        folder = self.vlspn_dir / PROTOCOL_PACKAGES["vscode-jsonrpc"]
+        return [
+            p
+            for p in self.protocol_sources
+            if folder in p.parents or "vscode-jsonrpc" in p.parts
+        ]
+
+    @property
+    def prettier_configs(self) -> List[Path]:
+        """ the config files prettier finds for the rendered typescript
+        """
+        assert self.vlspn_dir is not None
+        protocol = self.vlspn_dir / "protocol"
+        folders = [protocol / "src", protocol, self.vlspn_dir]
+        return [
+            folder / name
+            for folder in folders
+            for name in PRETTIER_CONFIGS
+            if (folder / name).is_file()
+        ]
 
+    @property
+    def scheduler(self) -> StageScheduler:
+        return StageScheduler(self.STAGES, jobs=self.jobs, log=self.log)
+
+    def run_stage(self, stage: Stage) -> None:
+        with profiled(stage.name, "stage"):
+            getattr(self, stage.name)()
+
+    def run_tssg(
+        self, path: Path, dest: Path, type: Optional[Text] = None
+    ) -> Dict[Text, Any]:
+        """ compile some typescript to JSON schema, exposing all definitions
+
+            the schema is streamed straight to `dest`, parsed back from there
+            piece by piece, and rewritten sorted, so its whole text is never
+            held in memory
+        """
+        assert self.vlspn_dir is not None
+        if self.node_worker is not None:
+            self.node_worker.tssg(self.vlspn_dir, path, type=type, out=dest)
+        else:
+            args = [*self.vlspn_bin(constants.TSSG), "--path", str(path)]
+            args += ["--expose", "all"]
+            if type is not None:
+                args += ["--type", type]
+            stream_output(args, dest, cwd=self.vlspn_dir / "protocol")
+        schema: Dict[Text, Any] = load_json(dest)
+        dump_json(schema, dest)
+        return schema
+
+    def run_prettier(self, path: Path) -> None:
+        assert self.vlspn_dir is not None
+        if self.node_worker is not None:
+            self.node_worker.prettier(self.vlspn_dir, path)
+        else:
+            check_call([*self.vlspn_bin("prettier"), "--write", path])
+
+    def generate(self) -> int:
+        owns_worker = self.use_node_worker and self.node_worker is None
+        if owns_worker:
+            self.node_worker = NodeWorker(log=self.log)
+        try:
+            self.scheduler.run(self.run_stage)
+        finally:
+            self.close_spec_index()
+            if owns_worker and self.node_worker is not None:
+                self.node_worker.close()
+                self.node_worker = None
         return 0
 
-    def ensure_repos(self):
-        if not self.workdir.exists():
-            self.workdir.mkdir(parents=True)
+    @property
+    def mirror_dir(self) -> Optional[Path]:
+        return None if self.cache_dir is None else self.cache_dir / "git"
 
-        self.lsp_dir = ensure_repo(self.workdir, self.lsp_repo, self.lsp_committish)
+    def ensure_lsp_repo(self):
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.lsp_dir = ensure_repo(
+            self.workdir, self.lsp_repo, self.lsp_committish, self.mirror_dir
+        )
+
+    def ensure_vlspn_repo(self):
+        self.workdir.mkdir(parents=True, exist_ok=True)
         self.vlspn_dir = ensure_repo(
-            self.workdir, self.vlspn_repo, self.vlspn_committish
+            self.workdir, self.vlspn_repo, self.vlspn_committish, self.mirror_dir
+        )
+
+    @property
+    def spec_md_path(self) -> Path:
+        assert self.lsp_dir is not None
+        return (
+            self.lsp_dir
+            / "_specifications"
+            / f"""specification-{self.lsp_spec.version.replace('.', '-')}.md"""
         )
 
     def parse_spec(self):
         if self.lsp_dir is not None:
-            spec_md = (
-                self.lsp_dir
-                / "_specifications"
-                / f"""specification-{self.lsp_spec.version.replace('.', '-')}.md"""
-            )
-            self.raw_spec = spec_md.read_text()
+            self.close_spec_index()
+            self.spec_index = SectionIndex.open(self.spec_md_path)
+
+    def close_spec_index(self) -> None:
+        """ unmap the spec, once no more stages will read its sections
+        """
+        if self.spec_index is not None:
+            self.spec_index.close()
+            self.spec_index = None
 
     def ensure_js_deps(self):
         if self.vlspn_dir is not None:
-            ensure_js_package(self.vlspn_dir, constants.TSSG, self.tssg_version)
-            ensure_js_package(self.vlspn_dir, "prettier", self.prettier_version)
+            cache = self.cache
+            with locked(self.vlspn_dir.parent / f"{self.vlspn_dir.name}.lock"):
+                ensure_js_packages(
+                    self.vlspn_dir,
+                    {
+                        constants.TSSG: self.tssg_version,
+                        "prettier": self.prettier_version,
+                    },
+                    cache_dir=None if cache is None else cache.root / "node_modules",
+                    log=self.log,
+                )
 
     @property
     def naive_schema_path(self) -> Path:
@@ -104,147 +350,85 @@ class SpecGenerator:
     def build_naive_schema(self):
         assert self.vlspn_dir is not None
         proto = self.vlspn_dir / "protocol"
-        self.naive_schema = json.loads(
-            subprocess.check_output(
-                [
-                    *self.vlspn_bin(constants.TSSG),
-                    "--path",
-                    proto / "src" / "protocol.ts",
-                    "--expose",
-                    "all",
-                ],
-                cwd=proto,
-            ).decode("utf-8")
+        cache = self.cache
+        key = hash_inputs(
+            "naive",
+            constants.TSSG,
+            self.tssg_version,
+            self.node_runner,
+            self.protocol_sources,
         )
-        if not self.output.exists():
-            self.output.mkdir(parents=True)
-        self.naive_schema_path.write_text(
-            json.dumps(self.naive_schema, indent=2, sort_keys=True)
+        if cache and cache.fetch("naive", key, self.naive_schema_path):
+            self.naive_schema = load_json(self.naive_schema_path)
+            return
+        self.output.mkdir(parents=True, exist_ok=True)
+        self.naive_schema = self.run_tssg(
+            proto / "src" / "protocol.ts", self.naive_schema_path
         )
+        if cache:
+            cache.store("naive", key, self.naive_schema_path)
 
     def extract_spec_features(self):
-        assert self.raw_spec
+        assert self.spec_index is not None
+        self.spec_features = self.spec_index.scan(self.lsp_spec)
 
-        after_notifications = self.raw_spec.split(self.lsp_spec.preamble_separator)[1]
-
-        before_implementations = after_notifications.split(
-            self.lsp_spec.epilogue_separator
-        )[0]
-
-        self.spec_features = before_implementations.split(
-            self.lsp_spec.feature_separator
-        )[1:]
-
-    def init_df(self):
+    def init_features(self):
         assert self.spec_features
 
-        df = pandas.DataFrame(self.spec_features, columns=["_md"])
-        md = df["_md"]
-
-        def _find_method(md: Text):
-            try:
-                return re.findall(r"""\* method: '(.*)'""", md)[0]
-            except IndexError:
-                return None
+        records = [FeatureRecord(md, i) for i, md in enumerate(self.spec_features)]
 
-        df["method"] = md.apply(_find_method)
-
-        not_methods = df[pandas.isna(df["method"])]
-        if len(not_methods) > 0:
+        not_methods = [record for record in records if record.method is None]
+        if not_methods:
             self.log.warning("dropping %s non-methods:", len(not_methods))
-            self.log.warning(not_methods)
-            df = df[pandas.notna(df["method"])]
+            self.log.warning(FeatureView(not_methods, ["title"]))
 
-        df["_raw_params"] = md.apply(
-            lambda md: (re.findall(r"""\* params: (.*)""", md) or [None])[0]
-        )
-        df["title"] = md.apply(
-            lambda md: md.split(">")[1].split("<")[0].strip().split("(")[0].strip()
-        )
-
-        def _find_type(md: Text):
-            try:
-                return (
-                    pyemojify.emojify(
-                        md.split(">")[1].split("<")[0].strip().split("(")[1]
-                    )
-                    .replace(")", "")
-                    .strip()
-                )
-            except IndexError:
-                return None
-
-        df["type"] = md.apply(_find_type)
-        df["_raw_result"] = md.apply(
-            lambda md: (
-                re.findall(r"""\* result: (.*)""", md, flags=re.M | re.I) or [None]
-            )[0]
-        )
-        df["_raw_error"] = md.apply(
-            lambda md: (
-                re.findall(r"""\* error: (.*)""", md, flags=re.M | re.I) or [None]
-            )[0]
-        )
-        self.df = df.sort_values(["type", "method"]).set_index(["type", "method"])
+        self.features = FeatureTable(r for r in records if r.method is not None)
 
     def annotate_params(self):
-        assert self.df is not None
+        assert self.features is not None
+        assert self.naive_schema is not None
+        definitions = self.naive_schema["definitions"]
+
+        params = self.apply_rules("params", "extract", "raw_params")
+        for row in self.features:
+            rp = row.raw_params
+            row.params = None if rp is None else params[rp]
+            if row.params in definitions:
+                row.params_schema = definitions[row.params]
+            elif rp in ["void", "none"]:
+                row.params_schema = {"type": "null"}
+            elif rp in ["'any'"]:
+                row.params_schema = {}
+            else:
+                row.params_schema = None
 
-        def parse_params(rp, p, schema):
-            if p in schema["definitions"]:
-                return schema["definitions"][p]
-            if rp in ["void", "none"]:
-                return {"type": "null"}
-            if rp in ["'any'"]:
-                return {}
-            return None
-
-        self.df["params"] = self.df["_raw_params"].apply(
-            lambda rp: None if rp is None else (re.findall(r"`(.*?)`", rp) or [None])[0]
-        )
-
-        self.df["params_schema"] = [
-            parse_params(row["_raw_params"], row["params"], self.naive_schema)
-            for row in self.df[["_raw_params", "params"]].to_dict(orient="records")
-        ]
         self.log.debug("with annotated params:")
-        self.log.debug(self.df)
+        self.log.debug(self.features.view("params", "params_schema"))
 
     def annotate_results(self):
-        assert self.df is not None
-
-        def parse_results(rr):
-            if rr in [None]:
-                return rr
-            r = (
-                rr.replace("defined as follows:", "")
-                .replace("`", "")
-                .replace("the selected", "")
-                .replace(r"\|", "|")
-                .replace("An array of DocumentLink", "DocumentLink[]")
-            )
-            r = re.sub(r"\[(.*?)\]\(#.+\)", "\\1", r).strip()
-            for splitter in [" where ", " describing ", " as defined ", ". ", " if "]:
-                r = r.split(splitter)[0].strip()
-            if r.endswith("."):
-                r = r[:-1]
-            return r
-
-        self.df["result"] = self.df["_raw_result"].apply(lambda rr: parse_results(rr))
+        assert self.features is not None
+
+        results = self.apply_rules("result", "rewrite", "raw_result")
+        for row in self.features:
+            rr = row.raw_result
+            row.result = None if rr is None else results[rr].strip()
+
         self.log.debug("with annotated results:")
-        self.log.debug(self.df)
+        self.log.debug(self.features.view("raw_result", "result"))
 
     def annotate_result_schema(self):
-        assert self.df is not None
+        assert self.features is not None
+        assert self.naive_schema is not None
+        definitions = self.naive_schema["definitions"]
 
-        def result_to_schema(r, schema):  # pragma: no cover
+        def result_to_schema(r, alternatives):
             if not r:
                 return r
             opts = []
             if r in ["void", "void."]:
                 return {"type": "null"}
 
-            for sr in [sr.strip() for sr in r.split(r"\|")]:
+            for sr in alternatives[r]:
                 is_arr = False
                 if sr.endswith("[]"):
                     is_arr = True
@@ -253,8 +437,8 @@ class SpecGenerator:
                     sr = {"type": "null"}
                 elif sr.startswith("void"):
                     sr = {"type": "null"}
-                elif sr in schema["definitions"]:
-                    sr = {"$ref": f"#/definitions/{sr}"}
+                elif sr in definitions:
+                    sr = {"$ref": f"{constants.DEFINITIONS}{sr}"}
                     if is_arr:
                         sr = {"type": "array", "items": sr}
                 opts += [sr]
@@ -264,62 +448,163 @@ class SpecGenerator:
                 return None
             return {"oneOf": opts}
 
-        self.df["result_schema"] = self.df["result"].apply(
-            lambda rr: result_to_schema(rr, self.naive_schema)
-        )
+        alternatives = self.apply_rules("union", "split", "result")
+        for row in self.features:
+            row.result_schema = result_to_schema(row.result, alternatives)
+
         self.log.debug("with annotated result_schema:")
-        self.log.debug(self.df[["result"]])
+        self.log.debug(self.features.view("result"))
+
+    def apply_rules(self, kind: Text, how: Text, column: Text) -> Dict[Text, Any]:
+        """ apply a spec convention's rules to each distinct text of a column
+        """
+        assert self.features is not None
+        rules = self.lsp_spec.rules(kind)
+        hits: "Counter[Text]" = Counter()
+        texts = (getattr(row, column) for row in self.features)
+        results = rules.batch(texts, hits, how)
+        self.rule_hits[kind] = hits
+        self.log.debug("%s rule hits: %s", kind, dict(hits))
+        dead = dead_rules(rules.rules, hits)
+        if dead:
+            self.log.info("%s rules that never fired: %s", kind, dead)
+        return results
 
     def check_results(self):
-        assert self.df is not None
-        check = self.df[self.df["result"].apply(lambda x: x is None)][
-            ~self.df["_raw_result"].isnull()
-        ][["_raw_result", "result"]]
-        assert check.shape[0] == 0, "unparsed results"
+        assert self.features is not None
+        check = self.features.where(
+            lambda row: row.result is None and row.raw_result is not None
+        )
+        assert not check, "unparsed results"
 
     def annotate_method_titles(self):
-        assert self.df is not None
+        assert self.features is not None
 
-        def method_title(m):
-            name = "".join([b[0].upper() + b[1:] for b in m.split("/") if b != "$"])
-            return name
-
-        self.df["ns_title"] = list(self.df.reset_index()["method"].apply(method_title))
+        for row in self.features:
+            assert row.method is not None, row
+            row.ns_title = method_title(row.method)
 
         self.log.debug("With method titles:")
-        self.log.debug(self.df[["ns_title"]])
-
-    def ns_result(self, r: Text) -> Text:
-        if r is None:
-            return None
-        try:
-            r = re.sub(r"\b([A-Z])", "proto.\\1", r)
-        except Exception as err:  # pragma: no cover
-            self.log.error("Error applying namespace title: %s %s", r, err)
-        return r
+        self.log.debug(self.features.view("ns_title"))
 
     def annotate_result_titles(self):
-        assert self.df is not None
-        self.df["ns_result"] = self.df["result"].apply(self.ns_result)
+        assert self.features is not None
+        ns_results = self.apply_rules("namespace", "rewrite", "result")
+        for row in self.features:
+            row.ns_result = None if row.result is None else ns_results[row.result]
         self.log.debug("With result titles:")
-        self.log.debug(self.df[["ns_title"]])
+        self.log.debug(self.features.view("ns_result"))
 
-    def write_protocol_schema_ts(self):
-        assert self.df is not None
-        assert self.vlspn_dir is not None
-        tmpl = jinja2.Template(
-            (Path(__file__).parent / "templates" / "protocol-schema.ts.j2").read_text()
+    @property
+    def feature_state_path(self) -> Path:
+        return self.output / f"lsp.{self.lsp_spec.version}.features.json"
+
+    @property
+    def changes_path(self) -> Path:
+        return self.output / f"lsp.{self.lsp_spec.version}.changes.json"
+
+    @property
+    def uses_typescript(self) -> bool:
+        return self.synthetic_builder == "typescript" or self.check_synthetic
+
+    @property
+    def node_runner(self) -> Optional[Path]:
+        """ the script that runs the node tools, unless they run as their own CLIs
+        """
+        return WORKER_JS if self.use_node_worker else None
+
+    @property
+    def feature_state_key(self) -> Text:
+        return hash_inputs(
+            "features",
+            # including its rules, which change results without changing sections
+            repr(self.lsp_spec),
+            self.synthetic_builder,
+            SYNTHETIC_PY,
+            TEMPLATE,
+            constants.TSSG,
+            self.tssg_version,
+            self.prettier_version,
+            self.node_runner,
+            # the jsonrpc messages the synthetic definitions extend: changes to
+            # protocol types are found by the hash of each feature
+            self.jsonrpc_sources,
         )
 
-        out = self.vlspn_dir / "protocol" / "src" / "protocol-schema.ts"
+    def hash_features(self):
+        """ find the features which can't be reused from the last run
+        """
+        assert self.features is not None
+        assert self.naive_schema is not None
+        assert self.spec_index is not None
+        naive = self.naive_schema["definitions"]
+
+        self.feature_hashes = {}
+        for row in self.features:
+            assert row.method is not None and row.section is not None, row
+            self.feature_hashes[row.method] = feature_hash(
+                self.spec_index.raw(row.section),
+                referenced_definitions(naive, row.params, row.result),
+            )
+
+        if self.use_cache and self.incremental:
+            self.previous_state = FeatureState.load(
+                self.feature_state_path, self.feature_state_key
+            )
+        previous = self.previous_state
+        self.stale_features = [
+            row
+            for row in self.features
+            if previous is None
+            or not previous.reusable(
+                row.method, self.feature_hashes.get(row.method or "")
+            )
+        ]
+        self.log.debug(
+            "%s of %s features to regenerate:",
+            len(self.stale_features),
+            len(self.features),
+        )
+        self.log.debug(self.features.view(records=self.stale_features))
 
-        out.write_text(
-            tmpl.render(
-                rows=self.df.reset_index().to_dict(orient="records"),
-                ns_result=self.ns_result,
+    def write_protocol_schema_ts(self):
+        assert self.features is not None
+        assert self.vlspn_dir is not None
+        if not self.uses_typescript:
+            return
+        tmpl = jinja2.Template(TEMPLATE.read_text())
+
+        if self.scratch_dir is not None:
+            link_tree(
+                self.vlspn_dir,
+                self.scratch_dir,
+                expand=["protocol", "protocol/src"],
+                exclude=[f"protocol/src/{PROTOCOL_SCHEMA_TS}"],
             )
+
+        out = self.protocol_schema_ts_path
+
+        rows = self.features.records
+        if self.stale_features is not None:
+            rows = self.stale_features
+        if not rows:
+            return
+
+        rendered = tmpl.render(rows=rows)
+        cache = self.cache
+        key = hash_inputs(
+            "prettier",
+            self.prettier_version,
+            self.node_runner,
+            self.prettier_configs,
+            rendered,
         )
-        subprocess.check_call([*self.vlspn_bin("prettier"), "--write", out])
+        if cache and cache.fetch("prettier", key, out):
+            return
+        out.write_text(rendered)
+        self.run_prettier(out)
+        if cache:
+            cache.store("prettier", key, out)
 
     @property
     def synthetic_schema_path(self) -> Path:
@@ -327,72 +612,375 @@ class SpecGenerator:
 
     def build_synthetic_schema(self):
         assert self.vlspn_dir is not None
-        proto = self.vlspn_dir / "protocol"
-        self.synthetic_schema = json.loads(
-            subprocess.check_output(
-                [
-                    *self.vlspn_bin(constants.TSSG),
-                    "--path",
-                    proto / "src" / "protocol-schema.ts",
-                    "--expose",
-                    "all",
-                    "--type",
-                    "_AnyFeature",
-                ],
-                cwd=proto,
-            ).decode("utf-8")
+        assert self.features is not None
+        stale = self.features.records
+        if self.stale_features is not None:
+            stale = self.stale_features
+
+        generated: Dict[Text, Any] = {"definitions": {}}
+        if stale:
+            generated = self.build_stale_features(stale)
+
+        previous = self.previous_state
+        if previous is None or len(stale) == len(self.features):
+            self.synthetic_schema = generated
+            return
+
+        header = {k: v for k, v in generated.items() if k != "definitions"}
+        stale_methods = {row.method for row in stale}
+        self.synthetic_schema = merge_features(
+            header or previous.header,
+            [
+                self.feature_definitions(generated, row)
+                if row.method in stale_methods
+                else previous.definitions(row.method)
+                for row in self.features
+            ],
+            [f"_{row.ns_title}Feature" for row in self.features],
+        )
+        dump_json(self.synthetic_schema, self.synthetic_schema_path)
+
+    def build_stale_features(self, stale: List[FeatureRecord]) -> Dict[Text, Any]:
+        """ the schema of some features, with the chosen builder
+
+            with `check_synthetic`, both builders run, whichever was chosen
+        """
+        typescript = python = None
+        if self.uses_typescript:
+            typescript = self.run_synthetic_tssg()
+        if self.synthetic_builder == "python" or self.check_synthetic:
+            assert self.naive_schema is not None
+            python = assemble_synthetic_schema(self.naive_schema, stale)
+        if self.check_synthetic:
+            assert python is not None and typescript is not None
+            self.compare_synthetic_schemas(python, typescript)
+        if python is None or self.synthetic_builder == "typescript":
+            assert typescript is not None
+            return typescript
+        dump_json(python, self.synthetic_schema_path)
+        return python
+
+    def compare_synthetic_schemas(
+        self, python: Dict[Text, Any], typescript: Dict[Text, Any]
+    ) -> None:
+        """ fail if the python and typescript builders disagree on what is valid
+
+            annotations, like the `description`s TSSG copies from JSDoc, and the
+            order of unordered lists don't count
+        """
+        ours, theirs = python["definitions"], typescript["definitions"]
+        differ = sorted(
+            name
+            for name in set(ours) | set(theirs)
+            if canonical(ours.get(name), str) != canonical(theirs.get(name), str)
         )
-        self.synthetic_schema_path.write_text(
-            json.dumps(self.synthetic_schema, indent=2, sort_keys=True)
+        for name in differ:
+            self.log.error("python: %s", json.dumps(ours.get(name), sort_keys=True))
+            self.log.error(
+                "typescript: %s", json.dumps(theirs.get(name), sort_keys=True)
+            )
+        if differ:
+            raise ValueError(
+                f"synthetic schemas differ in {len(differ)} definitions: {differ}"
+            )
+        self.log.info("python and typescript built the same %s definitions", len(ours))
+
+    def run_synthetic_tssg(self) -> Dict[Text, Any]:
+        """ the schema of (some of) the features, from the rendered typescript
+        """
+        cache = self.cache
+        key = hash_inputs(
+            "synthetic",
+            constants.TSSG,
+            self.tssg_version,
+            self.node_runner,
+            self.protocol_schema_ts_path,
+            self.protocol_sources,
+        )
+        if cache and cache.fetch("synthetic", key, self.synthetic_schema_path):
+            return load_json(self.synthetic_schema_path)
+        schema = self.run_tssg(
+            self.protocol_schema_ts_path, self.synthetic_schema_path, type="_AnyFeature"
         )
+        if cache:
+            cache.store("synthetic", key, self.synthetic_schema_path)
+        return schema
+
+    @staticmethod
+    def feature_definitions(
+        schema: Dict[Text, Any], row: FeatureRecord
+    ) -> Dict[Text, Any]:
+        """ the definitions a feature of a synthetic schema needs
+        """
+        definitions = schema["definitions"]
+        names = reachable_definitions(definitions, [f"_{row.ns_title}Feature"])
+        return {name: definitions[name] for name in sorted(names)}
 
     def validate_synthetic_schema(self):
         jsonschema.validators.Draft7Validator(self.synthetic_schema)
 
     def annotate_params_schema(self):
-        assert self.df is not None
+        assert self.features is not None
         assert self.synthetic_schema is not None
+        definitions = self.synthetic_schema["definitions"]
 
-        self.df["params_schema"] = self.df["ns_title"].apply(
-            lambda x: None
-            if x is None
-            else self.synthetic_schema["definitions"][f"_{x}Request"]["properties"][
-                "params"
-            ]
-            if f"_{x}Request" in self.synthetic_schema["definitions"]
-            else None
-        )
+        for row in self.features:
+            request = definitions.get(f"_{row.ns_title}Request")
+            row.params_schema = (
+                None if request is None else request["properties"]["params"]
+            )
         self.log.debug("final params schema:")
-        self.log.debug(self.df[["params", "params_schema"]])
+        self.log.debug(self.features.view("params", "params_schema"))
 
     def reannotate_result_schema(self):
-        assert self.df is not None
+        assert self.features is not None
         assert self.synthetic_schema is not None
+        definitions = self.synthetic_schema["definitions"]
 
-        self.df["result_schema"] = self.df["ns_title"].apply(
-            lambda x: self.synthetic_schema["definitions"][f"_{x}Response"][
-                "properties"
-            ]["result"]
-            if f"_{x}Response" in self.synthetic_schema["definitions"]
-            else None
-        )
+        for row in self.features:
+            response = definitions.get(f"_{row.ns_title}Response")
+            row.result_schema = (
+                None if response is None else response["properties"]["result"]
+            )
         self.log.debug("final result schema:")
-        self.log.debug(self.df[["result", "result_schema"]])
+        self.log.debug(self.features.view("result", "result_schema"))
 
     def validate_final_schema(self):
-        assert self.df is not None
-        missing_params = self.df[self.df["params_schema"].isnull()][
-            ["_raw_params", "params", "params_schema"]
-        ]
-        missing_results = self.df[self.df["result"].isnull()][
-            ~self.df["_raw_result"].isnull()
-        ][["_raw_result", "result", "result_schema"]]
+        assert self.features is not None
+        missing_params = self.features.where(lambda row: row.params_schema is None)
+        missing_results = self.features.where(
+            lambda row: row.result is None and row.raw_result is not None
+        )
 
-        if len(missing_params):  # pragma: no cover
+        if missing_params:  # pragma: no cover
             self.log.error("missing params:")
-            self.log.error(missing_params)
-        if len(missing_results):  # pragma: no cover
+            self.log.error(
+                self.features.view(
+                    "raw_params", "params", "params_schema", records=missing_params
+                )
+            )
+        if missing_results:  # pragma: no cover
             self.log.error("missing results:")
-            self.log.error(missing_results)
+            self.log.error(
+                self.features.view(
+                    "raw_result", "result", "result_schema", records=missing_results
+                )
+            )
+
+        assert not missing_params and not missing_results
+
+    def message_definitions(self) -> Dict[Text, Dict[Text, Text]]:
+        """ the synthetic definition of each kind of message of each method
+        """
+        assert self.features is not None
+        assert self.synthetic_schema is not None
+        definitions = self.synthetic_schema["definitions"]
+        methods: Dict[Text, Dict[Text, Text]] = {}
+        for row in self.features:
+            assert row.method is not None, row
+            kinds = {
+                kind: f"_{row.ns_title}{kind.title()}"
+                for kind in ["request", "notification", "response"]
+            }
+            if kinds["response"] in definitions:
+                kinds["error"] = "_ErrorResponse"
+            methods[row.method] = {
+                kind: name for kind, name in kinds.items() if name in definitions
+            }
+        return methods
+
+    @property
+    def dedupe_path(self) -> Path:
+        return self.output / f"lsp.{self.lsp_spec.version}.dedupe.json"
+
+    def merge_duplicate_definitions(self):
+        """ rewrite the schemas with each shape defined once, and record what merged
+        """
+        if not self.dedupe_schemas:
+            return
+        assert self.synthetic_schema is not None
+        mapping: Dict[Text, Any] = {"version": self.lsp_spec.version}
+        for label, schema, path in [
+            ("naive", self.naive_schema, self.naive_schema_path),
+            ("synthetic", self.synthetic_schema, self.synthetic_schema_path),
+        ]:
+            if schema is None:
+                continue
+            deduped, merged = dedupe_schema(schema)
+            dump_json(deduped, path)
+            mapping[label] = {
+                "file": path.name,
+                "definitions": [
+                    len(schema["definitions"]),
+                    len(deduped["definitions"]),
+                ],
+                **merged,
+            }
+            self.log.info(
+                "%s: merged %s definitions, and shared %s subschemas",
+                path.name,
+                len(merged["merged"]),
+                len(merged["shared"]),
+            )
+            if label == "synthetic":
+                self.synthetic_schema = deduped
+        self.dedupe_path.write_text(json.dumps(mapping, indent=2, sort_keys=True))
 
-        assert not len(missing_params) and not len(missing_results)
+    @property
+    def methods_dir(self) -> Path:
+        return self.output / f"lsp.{self.lsp_spec.version}.methods"
+
+    def slice_synthetic_schema(self):
+        """ write a schema per message definition, with only what it references
+        """
+        if not self.slice_schemas:
+            return
+        assert self.features is not None
+        assert self.synthetic_schema is not None
+        definitions = self.synthetic_schema["definitions"]
+
+        self.methods_dir.mkdir(parents=True, exist_ok=True)
+        methods: Dict[Text, Dict[Text, Text]] = {}
+        files: Dict[Text, Dict[Text, Any]] = {}
+
+        for method, kinds in self.message_definitions().items():
+            for kind, name in kinds.items():
+                filename = f"{name}.schema.json"
+                methods.setdefault(method, {})[kind] = filename
+                if filename in files:
+                    continue
+                sliced = slice_schema(self.synthetic_schema, name)
+                text = json.dumps(sliced, indent=2, sort_keys=True)
+                (self.methods_dir / filename).write_text(text)
+                files[filename] = {
+                    "definition": name,
+                    "definitions": len(sliced["definitions"]),
+                    "bytes": len(text.encode("utf-8")),
+                }
+
+        for stale in self.methods_dir.glob("*.schema.json"):
+            if stale.name not in files:
+                stale.unlink()
+
+        manifest = {
+            "version": self.lsp_spec.version,
+            "schema": self.synthetic_schema_path.name,
+            "methods": methods,
+            "files": files,
+        }
+        (self.methods_dir / "manifest.json").write_text(
+            json.dumps(manifest, indent=2, sort_keys=True)
+        )
+        self.log.info(
+            "sliced %s definitions of %s into %s files",
+            sum(f["definitions"] for f in files.values()),
+            len(definitions),
+            len(files),
+        )
+
+    @property
+    def validators_path(self) -> Path:
+        return self.output / f"lsp.{self.lsp_spec.version}.validators.py"
+
+    def compile_validators(self):
+        """ write the synthetic schema as a python module of validation functions
+        """
+        assert self.synthetic_schema is not None
+        methods = self.message_definitions()
+        cache = self.cache
+        key = hash_inputs(
+            "validators",
+            self.synthetic_schema,
+            methods,
+            self.synthetic_schema_path.name,
+            PYCOMPILE_PY,
+        )
+        if cache and cache.fetch("validators", key, self.validators_path):
+            return
+        try:
+            source = compile_schema(
+                self.synthetic_schema, methods, source=self.synthetic_schema_path.name
+            )
+        except UnsupportedSchema as err:  # pragma: no cover
+            self.log.warning("not compiling validators: %s", err)
+            return
+        self.validators_path.write_text(source)
+        if cache:
+            cache.store("validators", key, self.validators_path)
+        self.log.info(
+            "compiled %s definitions into %s",
+            len(self.synthetic_schema["definitions"]),
+            self.validators_path,
+        )
+
+    @property
+    def classes_path(self) -> Path:
+        return self.output / f"lsp.{self.lsp_spec.version}.messages.py"
+
+    def compile_classes(self):
+        """ write the synthetic schema as a python module of message classes
+        """
+        assert self.synthetic_schema is not None
+        methods = self.message_definitions()
+        cache = self.cache
+        key = hash_inputs(
+            "classes",
+            self.synthetic_schema,
+            methods,
+            self.synthetic_schema_path.name,
+            PYCOMPILE_PY,
+            PYCLASSES_PY,
+        )
+        if cache and cache.fetch("classes", key, self.classes_path):
+            return
+        compiler = ClassCompiler(self.synthetic_schema)
+        try:
+            source = compiler.module(methods, source=self.synthetic_schema_path.name)
+        except UnsupportedSchema as err:  # pragma: no cover
+            self.log.warning("not compiling message classes: %s", err)
+            return
+        self.classes_path.write_text(source)
+        if cache:
+            cache.store("classes", key, self.classes_path)
+        self.log.info(
+            "compiled %s of %s definitions into classes in %s",
+            len(compiler.class_names),
+            len(self.synthetic_schema["definitions"]),
+            self.classes_path,
+        )
+
+    def write_feature_state(self):
+        """ record what each feature was made from, and what changed since last time
+        """
+        assert self.features is not None
+        assert self.synthetic_schema is not None
+        assert self.feature_hashes is not None
+
+        old = FeatureState.read(self.feature_state_path)
+        state = FeatureState(
+            self.feature_state_key,
+            {k: v for k, v in self.synthetic_schema.items() if k != "definitions"},
+            {
+                row.method: {
+                    "hash": self.feature_hashes[row.method],
+                    "definitions": self.feature_definitions(self.synthetic_schema, row),
+                }
+                for row in self.features
+                if row.method is not None
+            },
+        )
+        changes = {
+            "version": self.lsp_spec.version,
+            **diff_hashes({} if old is None else old.hashes, state.hashes),
+            "regenerated": sorted(
+                row.method
+                for row in self.stale_features or []
+                if row.method is not None
+            ),
+        }
+        state.dump(self.feature_state_path)
+        self.changes_path.write_text(json.dumps(changes, indent=2, sort_keys=True))
+        self.log.info(
+            "%s changed, %s added, %s removed, %s regenerated",
+            *[len(changes[k]) for k in ["changed", "added", "removed", "regenerated"]],
+        )
@@ -0,0 +1,114 @@
+""" reusing the schema of features whose spec section and types haven't changed
+"""
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Text
+
+from ..cache import hash_inputs
+from ..jsonio import dump_json, load_json
+from .constants import DEFINITIONS
+from .slicing import reachable_definitions
+
+STATE_VERSION = 1
+
+TYPE_NAME = re.compile(r"\b[A-Z]\w*")
+
+
+def referenced_definitions(
+    definitions: Dict[Text, Any], *type_exprs: Optional[Text]
+) -> Dict[Text, Any]:
+    """ the definitions named in some typescript type expressions, and their refs
+    """
+    names = {
+        name
+        for expr in type_exprs
+        if expr
+        for name in TYPE_NAME.findall(expr)
+        if name in definitions
+    }
+    return {
+        name: definitions[name]
+        for name in sorted(reachable_definitions(definitions, names))
+    }
+
+
+def feature_hash(section: bytes, definitions: Dict[Text, Any]) -> Text:
+    """ changes whenever a feature's markdown, or any type it uses, changes
+    """
+    return hash_inputs("feature", section, definitions)
+
+
+@dataclass
+class FeatureState:
+    """ the hash and synthetic definitions of each feature of a previous run
+    """
+
+    key: Text
+    header: Dict[Text, Any] = field(default_factory=dict)
+    features: Dict[Text, Dict[Text, Any]] = field(default_factory=dict)
+
+    @classmethod
+    def read(cls, path: Path) -> Optional["FeatureState"]:
+        if not path.is_file():
+            return None
+        state = load_json(path)
+        if state.get("state_version") != STATE_VERSION:
+            return None
+        return cls(state["key"], state["header"], state["features"])
+
+    @classmethod
+    def load(cls, path: Path, key: Text) -> Optional["FeatureState"]:
+        """ the state at `path`, unless it is missing or made with another `key`
+        """
+        state = cls.read(path)
+        return state if state is not None and state.key == key else None
+
+    @property
+    def hashes(self) -> Dict[Text, Text]:
+        return {method: info["hash"] for method, info in self.features.items()}
+
+    def dump(self, path: Path) -> None:
+        state = {
+            "state_version": STATE_VERSION,
+            "key": self.key,
+            "header": self.header,
+            "features": self.features,
+        }
+        dump_json(state, path)
+
+    def reusable(self, method: Optional[Text], digest: Optional[Text]) -> bool:
+        return (
+            digest is not None
+            and self.features.get(method or "", {}).get("hash") == digest
+        )
+
+    def definitions(self, method: Optional[Text]) -> Dict[Text, Any]:
+        return self.features[method or ""]["definitions"]
+
+
+def diff_hashes(old: Dict[Text, Text], new: Dict[Text, Text]) -> Dict[Text, Any]:
+    """ which methods were added, removed or changed between two runs
+    """
+    return {
+        "added": sorted(set(new) - set(old)),
+        "removed": sorted(set(old) - set(new)),
+        "changed": sorted(m for m in set(old) & set(new) if old[m] != new[m]),
+        "unchanged": sorted(m for m in set(old) & set(new) if old[m] == new[m]),
+    }
+
+
+def merge_features(
+    header: Dict[Text, Any],
+    feature_definitions: Iterable[Dict[Text, Any]],
+    feature_names: List[Text],
+) -> Dict[Text, Any]:
+    """ a synthetic schema, from the definitions of each of its features
+    """
+    definitions: Dict[Text, Any] = {}
+    for some_definitions in feature_definitions:
+        definitions.update(some_definitions)
+    definitions["_AnyFeature"] = {
+        "anyOf": [{"$ref": f"{DEFINITIONS}{name}"} for name in feature_names]
+    }
+    return {**header, "definitions": definitions}
@@ -0,0 +1,153 @@
+/**
+ * a long-lived helper that keeps ts-json-schema-generator and prettier loaded
+ *
+ * reads newline-delimited JSON-RPC requests from stdin, and writes one
+ * response line per request to stdout. Modules are resolved from the `root`
+ * (a vscode-languageserver-node checkout) of each request, so one worker can
+ * serve several checkouts. The last TypeScript program built for each root is
+ * kept, and handed to the next compile, so unchanged source files are reused.
+ * Every response also carries `cpu`, the user + system seconds the worker
+ * has used so far, as the parent can't see them until the worker exits.
+ */
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+const { createRequire } = require('module');
+
+const TSSG = 'ts-json-schema-generator';
+
+// keep stdout for responses
+console.log = console.error;
+console.info = console.error;
+console.warn = console.error;
+
+const requirers = new Map();
+const programs = new Map();
+
+function requireFrom(root, name) {
+  if (!requirers.has(root)) {
+    requirers.set(root, createRequire(path.join(root, 'package.json')));
+  }
+  return requirers.get(root)(name);
+}
+
+function tryRequireFrom(root, name) {
+  try {
+    return requireFrom(root, name);
+  } catch (err) {
+    return null;
+  }
+}
+
+function tssgConfig(tssg, params) {
+  return {
+    ...(tssg.DEFAULT_CONFIG || {}),
+    path: params.path,
+    type: params.type || undefined,
+    expose: params.expose || 'all',
+    topRef: true,
+    jsDoc: 'extended',
+    sortProps: true,
+    strictTuples: false,
+    skipTypeCheck: false,
+    extraTags: [],
+  };
+}
+
+function buildProgram(ts, tssg, root, config) {
+  const previous = programs.get(root);
+  let program;
+  if (previous) {
+    program = ts.createProgram(
+      [config.path],
+      previous.getCompilerOptions(),
+      undefined,
+      previous
+    );
+    const diagnostics = ts.getPreEmitDiagnostics(program);
+    if (diagnostics.length) {
+      throw new Error(
+        ts.formatDiagnostics(diagnostics, {
+          getCanonicalFileName: (f) => f,
+          getCurrentDirectory: () => root,
+          getNewLine: () => '\n',
+        })
+      );
+    }
+  } else {
+    program = tssg.createProgram(config);
+  }
+  programs.set(root, program);
+  return program;
+}
+
+function writeSchema(schema, params) {
+  if (!params.out) {
+    return schema;
+  }
+  fs.writeFileSync(params.out, JSON.stringify(schema, null, 2));
+  return null;
+}
+
+const METHODS = {
+  tssg(params) {
+    const tssg = requireFrom(params.root, TSSG);
+    const config = tssgConfig(tssg, params);
+    const ts = tryRequireFrom(params.root, 'typescript');
+    if (ts && tssg.createProgram && tssg.createParser && tssg.SchemaGenerator) {
+      const program = buildProgram(ts, tssg, params.root, config);
+      const generator = new tssg.SchemaGenerator(
+        program,
+        tssg.createParser(program, config),
+        tssg.createFormatter(config),
+        config
+      );
+      return writeSchema(generator.createSchema(config.type), params);
+    }
+    return writeSchema(
+      tssg.createGenerator(config).createSchema(config.type),
+      params
+    );
+  },
+
+  prettier(params) {
+    const prettier = requireFrom(params.root, 'prettier');
+    const options =
+      (prettier.resolveConfig && prettier.resolveConfig.sync(params.path)) || {};
+    const source = fs.readFileSync(params.path, 'utf-8');
+    fs.writeFileSync(
+      params.path,
+      prettier.format(source, { ...options, filepath: params.path })
+    );
+    return null;
+  },
+
+  shutdown() {
+    setImmediate(() => process.exit(0));
+    return null;
+  },
+};
+
+function respond(message) {
+  const { user, system } = process.cpuUsage();
+  const cpu = (user + system) / 1e6;
+  process.stdout.write(JSON.stringify({ ...message, cpu }) + '\n');
+}
+
+readline.createInterface({ input: process.stdin }).on('line', (line) => {
+  let request = {};
+  try {
+    request = JSON.parse(line);
+    const method = METHODS[request.method];
+    if (!method) {
+      throw new Error(`unknown method: ${request.method}`);
+    }
+    respond({ jsonrpc: '2.0', id: request.id, result: method(request.params) });
+  } catch (err) {
+    respond({
+      jsonrpc: '2.0',
+      id: request.id === undefined ? null : request.id,
+      error: { code: -32000, message: err.message, data: err.stack },
+    });
+  }
+});
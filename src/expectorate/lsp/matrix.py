@@ -0,0 +1,99 @@
+""" generating schemas for several spec versions and commits at once
+"""
+import logging
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Text
+
+from . import constants
+from .conventions import CONVENTIONS
+
+
+@dataclass(frozen=True)
+class MatrixTarget:
+    version: Text
+    lsp_committish: Text = constants.LSP_COMMIT
+    vlspn_committish: Text = constants.VLSPN_COMMIT
+
+    @classmethod
+    def parse(cls, spec: Text) -> "MatrixTarget":
+        """ `VERSION[:LSP_COMMITTISH[:VLSPN_COMMITTISH]]`, empty parts are defaults
+        """
+        version, *commits = spec.split(":")
+        if version not in CONVENTIONS:
+            raise ValueError(f"no conventions for spec version {version}")
+        if len(commits) > 2:
+            raise ValueError(f"too many parts in target {spec}")
+        lsp, vlspn = [*commits, "", ""][:2]
+        return cls(
+            version, lsp or constants.LSP_COMMIT, vlspn or constants.VLSPN_COMMIT
+        )
+
+    @property
+    def label(self) -> Text:
+        return re.sub(
+            r"[^\w.\-]+",
+            "-",
+            f"{self.version}_{self.lsp_committish}_{self.vlspn_committish}",
+        )
+
+
+def generate_target(
+    target: MatrixTarget,
+    workdir: Path,
+    output: Path,
+    log_level: int,
+    options: Dict[Text, Any],
+) -> Dict[Text, Any]:
+    """ run one target, in its own scratch tree and output directory
+    """
+    from .generate import SpecGenerator
+
+    log = logging.getLogger(f"{__name__}.{target.label}")
+    log.setLevel(log_level)
+    gen = SpecGenerator(
+        log=log,
+        workdir=workdir,
+        output=output / target.label,
+        scratch_dir=workdir / "scratch" / target.label,
+        lsp_spec=CONVENTIONS[target.version],
+        lsp_committish=target.lsp_committish,
+        vlspn_committish=target.vlspn_committish,
+        **options,
+    )
+    start = time.perf_counter()
+    result: Dict[Text, Any] = {**asdict(target), "label": target.label}
+    try:
+        result["returncode"] = gen.generate()
+    except Exception as err:
+        log.exception("%s failed", target.label)
+        result.update(returncode=1, error=f"{type(err).__name__}: {err}")
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_matrix(
+    targets: List[MatrixTarget],
+    workdir: Path,
+    output: Path,
+    log: logging.Logger,
+    jobs: int = 1,
+    options: Optional[Dict[Text, Any]] = None,
+) -> List[Dict[Text, Any]]:
+    """ generate every target, `jobs` at a time, sharing clones and node_modules
+    """
+    run = partial(
+        generate_target,
+        workdir=workdir,
+        output=output,
+        log_level=log.getEffectiveLevel(),
+        options=options or {},
+    )
+    if jobs <= 1 or len(targets) <= 1:
+        return [run(target) for target in targets]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(targets))) as pool:
+        return list(pool.map(run, targets))
@@ -0,0 +1,507 @@
+""" generating a python module of compact message classes from a JSON schema
+
+    each closed object definition becomes a class with `__slots__`, whose
+    `from_json` checks an instance in the same pass that decodes it, and whose
+    `to_json` gives back the plain JSON. everything else (strings, enums,
+    open objects, etc.) stays as plain JSON, checked by the same inlined code
+    as `pycompile`
+"""
+import ast
+import builtins
+import keyword
+import re
+from typing import Any, Dict, List, Optional, Sequence, Set, Text
+
+from .constants import ANNOTATIONS
+from .pycompile import PRELUDE, SchemaCompiler
+
+# keywords a definition may use, and still become a class
+CLASS_KEYWORDS = ANNOTATIONS | {
+    "type",
+    "properties",
+    "required",
+    "additionalProperties",
+}
+
+# keywords of an array whose items can be decoded
+ARRAY_KEYWORDS = ANNOTATIONS | {"type", "items", "minItems", "maxItems"}
+
+# the python type of each JSON type, and of each decoded JSON value
+JSON_TYPES = {
+    "string": "str",
+    "integer": "int",
+    "number": "float",
+    "boolean": "bool",
+    "null": "None",
+    "object": "Dict[str, Any]",
+    "array": "List[Any]",
+}
+VALUE_TYPES = {
+    str: "str",
+    int: "int",
+    float: "float",
+    bool: "bool",
+    type(None): "None",
+    dict: "Dict[str, Any]",
+    list: "List[Any]",
+}
+
+CLASS_PRELUDE = '''
+from typing import Any, Dict, List, Optional, Union
+
+
+class _Missing:
+    """ an optional property that wasn't given
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+
+MISSING = _Missing()
+
+
+class JsonObject:
+    """ a decoded object definition
+    """
+
+    __slots__ = ()
+
+    # the (JSON property, attribute) of each field
+    _fields = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, attr) == getattr(other, attr) for _, attr in self._fields
+        )
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join(
+                "{}={!r}".format(attr, getattr(self, attr))
+                for _, attr in self._fields
+                if getattr(self, attr) is not MISSING
+            ),
+        )
+
+
+def _dump(value):
+    if isinstance(value, JsonObject):
+        return value.to_json()
+    if isinstance(value, list):
+        return [_dump(item) for item in value]
+    return value
+'''
+
+API = '''
+
+def from_json(data, name="_AnyFeature"):
+    """ decode `data` as a definition, raising a `ValidationError` if it doesn't match
+    """
+    return DECODERS[name](data)
+
+
+def to_json(value):
+    """ the plain JSON of a decoded value
+    """
+    return _dump(value)
+'''
+
+
+def defined_names(body: List[ast.stmt]) -> Set[Text]:
+    """ the names that some (module or class) statements define
+    """
+    names: Set[Text] = set()
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            names.update(t.id for t in node.targets if isinstance(t, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((a.asname or a.name).split(".")[0] for a in node.names)
+    return names
+
+
+MODULE = ast.parse(PRELUDE + CLASS_PRELUDE + API)
+(JSON_OBJECT,) = [
+    node
+    for node in MODULE.body
+    if isinstance(node, ast.ClassDef) and node.name == "JsonObject"
+]
+
+# names the module (or python) defines, which classes would hide...
+GLOBALS = (
+    defined_names(MODULE.body)
+    | {"CLASSES", "DECODERS", "METHODS"}
+    # ...as would the arguments (and locals) of generated code
+    | {"data", "path", "cls", "self", "key", "error"}
+    | set(dir(builtins))
+)
+# names attributes must avoid: only ever used as `self.<attr>`, they can't hide
+# anything else, so `id` and `type` stay as they are
+RESERVED = (
+    set(keyword.kwlist)
+    | defined_names(JSON_OBJECT.body)
+    | {"__module__", "__qualname__", "from_json", "to_json", "self"}
+    | set(dir(object))
+)
+
+# names made by `SchemaCompiler.fresh`, for constants, helpers and locals
+FRESH = re.compile(r"(_C|_matches|_check|_decode|[ikv])\d+")
+
+
+def python_name(name: Text, taken: Set[Text]) -> Text:
+    """ a unique identifier like `name`
+    """
+    identifier = re.sub(r"[^0-9a-zA-Z_]", "_", name)
+    if not identifier or identifier[0].isdigit():
+        identifier = f"_{identifier}"
+    if keyword.iskeyword(identifier):
+        identifier += "_"
+    while identifier in taken or FRESH.fullmatch(identifier):
+        identifier += "_"
+    taken.add(identifier)
+    return identifier
+
+
+class ClassCompiler(SchemaCompiler):
+    """ generates the source of a module with a class (or decoder) per definition
+    """
+
+    def __init__(self, schema: Dict[Text, Any]):
+        super().__init__(schema)
+        taken = set(GLOBALS) | set(self.function_names.values())
+        self.class_names: Dict[Text, Text] = {
+            name: python_name(name, taken)
+            for name, definition in self.definitions.items()
+            if self.is_class(definition)
+        }
+        self.decoder_names: Dict[Text, Text] = {}
+        for name, function in self.function_names.items():
+            decoder = f"decode{function[len('validate'):]}"
+            while decoder in taken:
+                decoder += "_"
+            taken.add(decoder)
+            self.decoder_names[name] = decoder
+        self._decodes: Dict[Text, bool] = {}
+
+    @staticmethod
+    def is_class(schema: Any) -> bool:
+        """ whether a definition is a closed object, with known properties
+        """
+        return (
+            isinstance(schema, dict)
+            and schema.get("type") == "object"
+            and "properties" in schema
+            and schema.get("additionalProperties") is False
+            and not set(schema) - CLASS_KEYWORDS
+        )
+
+    def decodes(self, schema: Any) -> bool:
+        """ whether a schema can hold any classes, in a way they can be found
+        """
+        if not isinstance(schema, dict):
+            return False
+        if "$ref" in schema:
+            name = self.definition_name(schema["$ref"])
+            if name in self.class_names:
+                return True
+            if name not in self._decodes:
+                # assume not, while looking, for recursive definitions
+                self._decodes[name] = False
+                self._decodes[name] = self.decodes(self.definitions[name])
+            return self._decodes[name]
+        keys = set(schema) - ANNOTATIONS
+        for combinator in ["anyOf", "oneOf"]:
+            if keys == {combinator}:
+                return any(map(self.decodes, schema[combinator]))
+        if schema.get("type") == "array" and not keys - ARRAY_KEYWORDS:
+            return self.decodes(schema.get("items"))
+        return False
+
+    def definition_name(self, ref: Text) -> Text:
+        function = self.ref(ref)
+        return next(n for n, f in self.function_names.items() if f == function)
+
+    def annotation(self, schema: Any, seen: Sequence[Text] = ()) -> List[Text]:
+        """ the python types of what a schema decodes to, any of which it may be
+        """
+        if not self.decodes(schema):
+            return self.json_annotation(schema)
+        if "$ref" in schema:
+            name = self.definition_name(schema["$ref"])
+            if name in self.class_names:
+                return [self.class_names[name]]
+            if name in seen:
+                return ["Any"]
+            return self.annotation(self.definitions[name], (*seen, name))
+        if "items" in schema:
+            return [f"List[{union(self.annotation(schema['items'], seen))}]"]
+        (combinator,) = set(schema) - ANNOTATIONS
+        return [t for s in schema[combinator] for t in self.annotation(s, seen)]
+
+    def json_annotation(self, schema: Any, seen: Sequence[Text] = ()) -> List[Text]:
+        """ the python types of the plain JSON a schema allows
+        """
+        if not isinstance(schema, dict):
+            return ["Any"]
+        if "$ref" in schema:
+            name = self.definition_name(schema["$ref"])
+            if name in seen:
+                return ["Any"]
+            return self.json_annotation(self.definitions[name], (*seen, name))
+        for combinator in ["anyOf", "oneOf"]:
+            if combinator in schema:
+                return [
+                    t for s in schema[combinator] for t in self.json_annotation(s, seen)
+                ]
+        if "const" in schema:
+            return [VALUE_TYPES.get(type(schema["const"]), "Any")]
+        if isinstance(schema.get("enum"), list):
+            return [VALUE_TYPES.get(type(value), "Any") for value in schema["enum"]]
+        types = schema.get("type")
+        if types == "array" and isinstance(schema.get("items"), dict):
+            return [f"List[{union(self.json_annotation(schema['items'], seen))}]"]
+        if isinstance(types, list):
+            return [JSON_TYPES.get(t, "Any") for t in types]
+        return [JSON_TYPES.get(types, "Any")]
+
+    def decoder(self, schema: Dict[Text, Any]) -> Text:
+        """ a function of `(data, path)` that decodes a schema for which `decodes`
+        """
+        if "$ref" in schema:
+            name = self.definition_name(schema["$ref"])
+            if name in self.class_names:
+                return f"{self.class_names[name]}.from_json"
+            return self.decoder_names[name]
+
+        function = self.fresh("_decode")
+        keys = set(schema) - ANNOTATIONS
+        if "items" in keys:
+            items = self.decoder(schema["items"])
+            i, item = self.fresh("i"), self.fresh("v")
+            body = [
+                *self.compile(
+                    {k: v for k, v in schema.items() if k != "items"}, "data", "path", 1
+                ),
+                f"    return [{items}({item}, path + ({i},))"
+                f" for {i}, {item} in enumerate(data)]",
+            ]
+        else:
+            (combinator,) = keys
+            alternatives = schema[combinator]
+            body = []
+            if combinator == "oneOf":
+                # only one may match, but any that does is the one
+                body += self.compile({"oneOf": alternatives}, "data", "path", 1)
+            for alternative in alternatives:
+                if self.decodes(alternative):
+                    body += [
+                        "    try:",
+                        f"        return {self.decoder(alternative)}(data, path)",
+                        "    except ValidationError:",
+                        "        pass",
+                    ]
+                else:
+                    body += [
+                        f"    if {self.predicate(alternative).format(v='data')}:",
+                        "        return data",
+                    ]
+            body += [
+                self.fail("", "data", " is not valid under any of the schemas", "path")
+            ]
+        self.helpers.append("\n".join([f"def {function}(data, path=()):", *body]))
+        return function
+
+    def value(self, schema: Any, v: Text, path: Text, depth: int) -> List[Text]:
+        """ lines that check `v`, leaving its decoded value in `v`
+        """
+        if self.decodes(schema):
+            return self.call("    " * depth, self.decoder(schema), v, path, v)
+        return self.compile(schema, v, path, depth)
+
+    def klass(self, name: Text, schema: Dict[Text, Any]) -> Text:
+        """ the source of a class, with `__slots__` for each property
+        """
+        class_name = self.class_names[name]
+        properties: Dict[Text, Any] = schema["properties"]
+        required = [key for key in schema.get("required", []) if key in properties]
+        optional = [key for key in properties if key not in required]
+        taken = set(RESERVED)
+        attrs = {key: python_name(key, taken) for key in [*required, *optional]}
+        types = {key: union(self.annotation(properties[key])) for key in required}
+        for key in optional:
+            types[key] = union([*self.annotation(properties[key]), "_Missing"])
+        known = self.constant(f"frozenset({sorted(properties)!r})")
+
+        lines = [
+            f"class {class_name}(JsonObject):",
+            f'    """ definition {name}',
+            '    """',
+            "",
+            f"    __slots__ = {tuple(attrs.values())!r}",
+            f"    _fields = {tuple(attrs.items())!r}",
+            "",
+            *[f"    {attr}: {types[key]}" for key, attr in attrs.items()],
+            *([""] if attrs else []),
+            "    def __init__(",
+            "        self,",
+            *[f"        {attrs[key]}: {types[key]}," for key in required],
+            *[f"        {attrs[key]}: {types[key]} = MISSING," for key in optional],
+            "    ):",
+            *[f"        self.{attr} = {attr}" for attr in attrs.values()],
+            *([] if attrs else ["        pass"]),
+            "",
+            "    @classmethod",
+            "    def from_json(cls, data, path=()):",
+            "        if not isinstance(data, dict):",
+            self.fail("        ", "data", " is not of type 'object'", "path"),
+        ]
+        for key in required:
+            lines += [
+                f"        if {key!r} not in data:",
+                self.fail("        ", None, f"{key!r} is a required property", "path"),
+            ]
+        lines += [
+            f"        if not {known}.issuperset(data):",
+            "            for key in data:",
+            f"                if key not in {known}:",
+            self.fail("                ", "key", " is not an allowed property", "path"),
+            "        self = cls.__new__(cls)",
+        ]
+        for key in required:
+            v = self.fresh("v")
+            lines += [
+                f"        {v} = data[{key!r}]",
+                *self.value(properties[key], v, f"path + ({key!r},)", 2),
+                f"        self.{attrs[key]} = {v}",
+            ]
+        for key in optional:
+            v = self.fresh("v")
+            lines += [
+                f"        if {key!r} in data:",
+                f"            {v} = data[{key!r}]",
+                *self.value(properties[key], v, f"path + ({key!r},)", 3),
+                f"            self.{attrs[key]} = {v}",
+                "        else:",
+                f"            self.{attrs[key]} = MISSING",
+            ]
+        lines += [
+            "        return self",
+            "",
+            "    def to_json(self):",
+            "        data = {}",
+        ]
+        for key in [*required, *optional]:
+            attr = attrs[key]
+            dump = f"_dump(self.{attr})" if self.decodes(properties[key]) else None
+            if key in required:
+                lines += [f"        data[{key!r}] = {dump or f'self.{attr}'}"]
+            else:
+                lines += [
+                    f"        if self.{attr} is not MISSING:",
+                    f"            data[{key!r}] = {dump or f'self.{attr}'}",
+                ]
+        lines += ["        return data"]
+        return "\n".join(lines)
+
+    def decode_function(self, name: Text, schema: Any) -> Text:
+        """ the source of a function decoding a definition that isn't a class
+        """
+        if self.decodes(schema):
+            body = [f"    return {self.decoder(schema)}(data, path)"]
+        else:
+            body = [f"    {self.function_names[name]}(data, path)", "    return data"]
+        return "\n".join(
+            [
+                f"def {self.decoder_names[name]}(data, path=()):",
+                f'    """ definition {name}',
+                '    """',
+                *body,
+            ]
+        )
+
+    def module(
+        self, methods: Optional[Dict[Text, Dict[Text, Text]]] = None, source: Text = ""
+    ) -> Text:
+        """ the source of a module with a class (or decoder) per definition
+        """
+        decoders: Dict[Text, Text] = {}
+        classes: List[Text] = []
+        for name, schema in self.definitions.items():
+            if name in self.class_names:
+                classes.append(self.klass(name, schema))
+                decoders[name] = f"{self.class_names[name]}.from_json"
+            else:
+                classes.append(self.decode_function(name, schema))
+                decoders[name] = self.decoder_names[name]
+        # after classes, so any helpers (and constants) they add are included
+        functions = [
+            self.function(self.function_names[name], schema, f"definition {name}")
+            for name, schema in self.definitions.items()
+        ]
+        lines = [
+            f'""" message classes for {source or "a JSON schema"}',
+            "",
+            "    generated by expectorate: don't edit",
+            '"""',
+            # annotations name classes before they are defined
+            "from __future__ import annotations",
+            PRELUDE,
+            CLASS_PRELUDE,
+            "",
+            *self.constants,
+            *[f"\n\n{helper}" for helper in self.helpers],
+            *[f"\n\n{function}" for function in functions],
+            *[f"\n\n{klass}" for klass in classes],
+            "\n",
+            "CLASSES = {",
+            *[f"    {name!r}: {klass}," for name, klass in self.class_names.items()],
+            "}",
+            "",
+            "DECODERS = {",
+            *[f"    {name!r}: {decoder}," for name, decoder in decoders.items()],
+            "}",
+            "",
+            "METHODS = {",
+        ]
+        for method, kinds in sorted((methods or {}).items()):
+            lines += [f"    {method!r}: {{"]
+            lines += [
+                f"        {kind!r}: {decoders[name]},"
+                for kind, name in sorted(kinds.items())
+                if name in decoders
+            ]
+            lines += ["    },"]
+        lines += ["}", API]
+        return "\n".join(lines)
+
+
+def union(options: List[Text]) -> Text:
+    """ the python type of any of some types
+    """
+    unique = list(dict.fromkeys(options))
+    if "Any" in unique:
+        return "Any"
+    if len(unique) == 1:
+        return unique[0]
+    if len(unique) == 2 and "None" in unique:
+        unique.remove("None")
+        return f"Optional[{unique[0]}]"
+    return f"Union[{', '.join(unique)}]"
+
+
+def compile_classes(
+    schema: Dict[Text, Any],
+    methods: Optional[Dict[Text, Dict[Text, Text]]] = None,
+    source: Text = "",
+) -> Text:
+    """ the source of a message class module for every definition of `schema`
+    """
+    return ClassCompiler(schema).module(methods, source)
@@ -0,0 +1,567 @@
+""" compiling a JSON schema into a plain python module of validation functions
+
+    in the style of fastjsonschema: each definition becomes a function of
+    inlined `isinstance` checks and loops, so validating a message doesn't
+    interpret the schema at all
+"""
+import importlib.util
+import re
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Set, Text
+
+from .constants import ANNOTATIONS, DEFINITIONS
+
+SUPPORTED = ANNOTATIONS | {
+    "$ref",
+    "type",
+    "enum",
+    "const",
+    "properties",
+    "required",
+    "additionalProperties",
+    "minProperties",
+    "maxProperties",
+    "items",
+    "additionalItems",
+    "minItems",
+    "maxItems",
+    "minLength",
+    "maxLength",
+    "pattern",
+    "minimum",
+    "maximum",
+    "exclusiveMinimum",
+    "exclusiveMaximum",
+    "multipleOf",
+    "anyOf",
+    "oneOf",
+    "allOf",
+    "not",
+}
+
+TYPE_CHECKS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+    "number": "_is_number({v})",
+    "integer": "_is_integer({v})",
+}
+
+NUMERIC_TYPES = {"integer", "number"}
+
+# how `items` bounds are checked against all of an array's numbers at once
+BOUNDS = {
+    "minimum": "min({v}) >=",
+    "maximum": "max({v}) <=",
+    "exclusiveMinimum": "min({v}) >",
+    "exclusiveMaximum": "max({v}) <",
+}
+
+PRELUDE = '''
+import re
+
+
+class ValidationError(ValueError):
+    """ an instance didn't match its definition
+    """
+
+    def __init__(self, message, path=()):
+        super().__init__(message)
+        self.message = message
+        self.path = tuple(path)
+
+    def __str__(self):
+        return "{} at /{}".format(self.message, "/".join(map(str, self.path)))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_integer(value):
+    if isinstance(value, float):
+        return value.is_integer()
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+_INTS = frozenset([int])
+_NUMBERS = frozenset([int, float])
+
+
+def _ints(values):
+    """ whether all values are ints (not bools), without a python loop
+    """
+    return bool(values) and _INTS.issuperset(map(type, values))
+
+
+def _numbers(values):
+    return _NUMBERS.issuperset(map(type, values))
+
+
+def _equal(one, two):
+    """ JSON equality, where `true` isn't `1`
+    """
+    if isinstance(one, bool) or isinstance(two, bool):
+        return type(one) is type(two) and one == two
+    if isinstance(one, dict) and isinstance(two, dict):
+        return one.keys() == two.keys() and all(_equal(one[k], two[k]) for k in one)
+    if isinstance(one, list) and isinstance(two, list):
+        return len(one) == len(two) and all(map(_equal, one, two))
+    return one == two
+'''
+
+API = '''
+
+def validate(data, name="_AnyFeature"):
+    """ raise a `ValidationError` if `data` doesn't match a definition
+    """
+    DEFINITIONS[name](data)
+
+
+def is_valid(data, name="_AnyFeature"):
+    try:
+        DEFINITIONS[name](data)
+    except ValidationError:
+        return False
+    return True
+'''
+
+
+class UnsupportedSchema(ValueError):
+    """ a schema used a keyword (or `$ref`) that can't be compiled
+    """
+
+
+class SchemaCompiler:
+    """ generates the source of a validator module for all definitions of a schema
+    """
+
+    def __init__(self, schema: Dict[Text, Any]):
+        self.schema = schema
+        self.definitions: Dict[Text, Any] = schema.get("definitions", {})
+        self.function_names: Dict[Text, Text] = {}
+        taken: Set[Text] = set()
+        for name in self.definitions:
+            function = f"""validate_{re.sub(r"[^0-9a-zA-Z_]", "_", name)}"""
+            while function in taken:
+                function += "_"
+            taken.add(function)
+            self.function_names[name] = function
+        self.constants: List[Text] = []
+        self.helpers: List[Text] = []
+        self.matchers: Dict[Text, Text] = {}
+        self._count = 0
+
+    def fresh(self, prefix: Text) -> Text:
+        self._count += 1
+        return f"{prefix}{self._count}"
+
+    def constant(self, value_source: Text) -> Text:
+        name = self.fresh("_C")
+        self.constants.append(f"{name} = {value_source}")
+        return name
+
+    def ref(self, ref: Text) -> Text:
+        name = ref[len(DEFINITIONS) :] if ref.startswith(DEFINITIONS) else None
+        if name is None or name not in self.definitions:
+            raise UnsupportedSchema(f"can't compile $ref {ref}")
+        return self.function_names[name]
+
+    def module(
+        self, methods: Optional[Dict[Text, Dict[Text, Text]]] = None, source: Text = ""
+    ) -> Text:
+        """ the source of a module with a function per definition
+        """
+        functions = [
+            self.function(self.function_names[name], schema, f"definition {name}")
+            for name, schema in self.definitions.items()
+        ]
+        lines = [
+            f'""" validators for {source or "a JSON schema"}',
+            "",
+            "    generated by expectorate: don't edit",
+            '"""',
+            PRELUDE,
+            "",
+            *self.constants,
+            *[f"\n\n{helper}" for helper in self.helpers],
+            *[f"\n\n{function}" for function in functions],
+            "\n",
+            "DEFINITIONS = {",
+            *[
+                f"    {name!r}: {function},"
+                for name, function in self.function_names.items()
+            ],
+            "}",
+            "",
+            "METHODS = {",
+        ]
+        for method, kinds in sorted((methods or {}).items()):
+            lines += [f"    {method!r}: {{"]
+            lines += [
+                f"        {kind!r}: {self.function_names[name]},"
+                for kind, name in sorted(kinds.items())
+                if name in self.function_names
+            ]
+            lines += ["    },"]
+        lines += ["}", API]
+        return "\n".join(lines)
+
+    def function(self, function: Text, schema: Any, doc: Text) -> Text:
+        body = self.compile(schema, "data", "path", 1)
+        return "\n".join(
+            [
+                f"def {function}(data, path=()):",
+                f'    """ {doc}',
+                '    """',
+                *(body or ["    pass"]),
+            ]
+        )
+
+    def predicate(self, schema: Any) -> Text:
+        """ an expression that is true if `data` matches, for `anyOf` et al.
+        """
+        if schema is True or schema == {}:
+            return "True"
+        if schema is False:
+            return "False"
+        if set(schema) - ANNOTATIONS == {"type"}:
+            return self.type_check(schema["type"], "{v}")
+        if set(schema) - ANNOTATIONS == {"$ref"}:
+            function = self.ref(schema["$ref"])
+            if function in self.matchers:
+                return f"{self.matchers[function]}({{v}})"
+            helper = self.matchers[function] = self.fresh("_matches")
+        else:
+            function = self.fresh("_check")
+            self.helpers.append(self.function(function, schema, "a subschema"))
+            helper = self.fresh("_matches")
+        self.helpers.append(
+            "\n".join(
+                [
+                    f"def {helper}(data):",
+                    "    try:",
+                    f"        {function}(data)",
+                    "    except ValidationError:",
+                    "        return False",
+                    "    return True",
+                ]
+            )
+        )
+        return f"{helper}({{v}})"
+
+    def type_check(self, types: Any, v: Text) -> Text:
+        types = [types] if isinstance(types, str) else types
+        for t in types:
+            if t not in TYPE_CHECKS:
+                raise UnsupportedSchema(f"unknown type {t}")
+        checks = [TYPE_CHECKS[t] for t in types]
+        if "number" in types and "integer" in types:
+            checks.remove(TYPE_CHECKS["integer"])
+        return " or ".join(check.replace("{v}", v) for check in checks) or "False"
+
+    @staticmethod
+    def fail(pad: Text, v: Optional[Text], message: Text, path: Text) -> Text:
+        """ a line raising an error (only formatted when raised) at `path`
+        """
+        text = repr(message) if v is None else f"repr({v}) + {message!r}"
+        return f"{pad}    raise ValidationError({text}, {path})"
+
+    @staticmethod
+    def call(
+        pad: Text, function: Text, v: Text, path: Text, result: Optional[Text] = None
+    ) -> List[Text]:
+        """ lines calling a function of `(data, path=())` on `v`, which only make
+            the tuple of `path` if it raises
+        """
+        assign = "" if result is None else f"{result} = "
+        if path == "path":
+            return [f"{pad}{assign}{function}({v}, path)"]
+        return [
+            f"{pad}try:",
+            f"{pad}    {assign}{function}({v})",
+            f"{pad}except ValidationError as error:",
+            f"{pad}    error.path = {path} + error.path",
+            f"{pad}    raise",
+        ]
+
+    def compile(self, schema: Any, v: Text, path: Text, depth: int) -> List[Text]:
+        """ lines (indented to `depth`) that raise if `v` doesn't match `schema`
+        """
+        pad = "    " * depth
+
+        if schema is True:
+            return []
+        if schema is False:
+            return [f"{pad}if True:", self.fail(pad, v, " is not allowed", path)]
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(f"not a schema: {schema!r}")
+        unknown = set(schema) - SUPPORTED
+        if unknown:
+            raise UnsupportedSchema(f"can't compile {sorted(unknown)}")
+
+        if "$ref" in schema:
+            # in draft 7, `$ref` ignores its siblings
+            return self.call(pad, self.ref(schema["$ref"]), v, path)
+
+        lines: List[Text] = []
+        types = schema.get("type")
+        if isinstance(types, str):
+            types = [types]
+        if types is not None:
+            lines += [
+                f"{pad}if not ({self.type_check(types, v)}):",
+                self.fail(
+                    pad, v, f" is not of type {', '.join(map(repr, types))}", path
+                ),
+            ]
+
+        if "enum" in schema or "const" in schema:
+            values = schema["enum"] if "enum" in schema else [schema["const"]]
+            what = f" is not one of {values!r}" if "enum" in schema else " is not"
+            if "const" in schema:
+                what += f" {values[0]!r}"
+            if values and all(isinstance(value, str) for value in values):
+                name = self.constant(f"frozenset({sorted(values)!r})")
+                check = f"isinstance({v}, str) and {v} in {name}"
+            else:
+                name = self.constant(repr(tuple(values)))
+                check = f"any(_equal({v}, value) for value in {name})"
+            lines += [f"{pad}if not ({check}):", self.fail(pad, v, what, path)]
+
+        def guarded(kind: Text, body: List[Text]) -> List[Text]:
+            if not body:
+                return []
+            if types == [kind]:
+                return [line[4:] for line in body]
+            return [f"{pad}if {TYPE_CHECKS[kind].format(v=v)}:", *body]
+
+        lines += guarded("object", self.compile_object(schema, v, path, depth + 1))
+        lines += guarded("array", self.compile_array(schema, v, path, depth + 1))
+        lines += guarded("string", self.compile_string(schema, v, path, depth + 1))
+        lines += guarded("number", self.compile_number(schema, v, path, depth + 1))
+
+        for sub_schema in schema.get("allOf", []):
+            lines += self.compile(sub_schema, v, path, depth)
+
+        if "anyOf" in schema:
+            checks = [self.predicate(s).format(v=v) for s in schema["anyOf"]]
+            lines += [
+                f"{pad}if not ({' or '.join(checks)}):",
+                self.fail(pad, v, " is not valid under any of the schemas", path),
+            ]
+
+        if "oneOf" in schema:
+            checks = [self.predicate(s).format(v=v) for s in schema["oneOf"]]
+            lines += [
+                f"{pad}if [{', '.join(checks)}].count(True) != 1:",
+                self.fail(pad, v, " is not valid under exactly one schema", path),
+            ]
+
+        if "not" in schema:
+            lines += [
+                f"{pad}if {self.predicate(schema['not']).format(v=v)}:",
+                self.fail(pad, v, " should not be valid", path),
+            ]
+
+        return lines
+
+    def compile_object(
+        self, schema: Dict[Text, Any], v: Text, path: Text, depth: int
+    ) -> List[Text]:
+        pad = "    " * depth
+        lines: List[Text] = []
+        properties = schema.get("properties", {})
+
+        required = schema.get("required", [])
+        for key in required:
+            lines += [
+                f"{pad}if {key!r} not in {v}:",
+                self.fail(pad, None, f"{key!r} is a required property", path),
+            ]
+
+        for bound, op in [("minProperties", "<"), ("maxProperties", ">")]:
+            if bound in schema:
+                lines += [
+                    f"{pad}if len({v}) {op} {schema[bound]!r}:",
+                    self.fail(pad, v, f" fails {bound}", path),
+                ]
+
+        for key, sub_schema in properties.items():
+            sub_v = self.fresh("v")
+            body = self.compile(sub_schema, sub_v, f"{path} + ({key!r},)", depth + 1)
+            if not body:
+                continue
+            if key in required:
+                lines += [f"{pad}{sub_v} = {v}[{key!r}]", *[b[4:] for b in body]]
+            else:
+                lines += [
+                    f"{pad}if {key!r} in {v}:",
+                    f"{pad}    {sub_v} = {v}[{key!r}]",
+                    *body,
+                ]
+
+        additional = schema.get("additionalProperties", True)
+        if additional is False:
+            key_v = self.fresh("k")
+            known = self.constant(f"frozenset({sorted(properties)!r})")
+            lines += [
+                f"{pad}if not {known}.issuperset({v}):",
+                f"{pad}    for {key_v} in {v}:",
+                f"{pad}        if {key_v} not in {known}:",
+                self.fail(pad + "        ", key_v, " is not an allowed property", path),
+            ]
+        elif additional is not True and additional != {}:
+            key_v = self.fresh("k")
+            known = self.constant(f"frozenset({sorted(properties)!r})")
+            lines += [
+                f"{pad}for {key_v} in {v}:",
+                f"{pad}    if {key_v} in {known}:",
+                f"{pad}        continue",
+                *self.compile(
+                    additional, f"{v}[{key_v}]", f"{path} + ({key_v},)", depth + 1
+                ),
+            ]
+        return lines
+
+    def compile_array(
+        self, schema: Dict[Text, Any], v: Text, path: Text, depth: int
+    ) -> List[Text]:
+        pad = "    " * depth
+        lines: List[Text] = []
+
+        for bound, op, what in [("minItems", "<", "short"), ("maxItems", ">", "long")]:
+            if bound in schema:
+                lines += [
+                    f"{pad}if len({v}) {op} {schema[bound]!r}:",
+                    self.fail(pad, v, f" is too {what}", path),
+                ]
+
+        items = schema.get("items", True)
+        i = self.fresh("i")
+        item = self.fresh("v")
+        if isinstance(items, list):
+            for index, sub_schema in enumerate(items):
+                body = self.compile(sub_schema, item, f"{path} + ({index},)", depth + 1)
+                if body:
+                    lines += [
+                        f"{pad}if len({v}) > {index}:",
+                        f"{pad}    {item} = {v}[{index}]",
+                        *body,
+                    ]
+            additional = schema.get("additionalItems", True)
+            if additional is not True and additional != {}:
+                if additional is False:
+                    lines += [
+                        f"{pad}if len({v}) > {len(items)}:",
+                        self.fail(pad, v, " has too many items", path),
+                    ]
+                else:
+                    body = self.compile(additional, item, f"{path} + ({i},)", depth + 1)
+                    lines += [
+                        f"{pad}for {i} in range({len(items)}, len({v})):",
+                        f"{pad}    {item} = {v}[{i}]",
+                        *body,
+                    ]
+        else:
+            bulk = self.bulk_numbers(items, v)
+            if bulk is not None:
+                # only walk the items if the bulk check can't tell
+                lines += [f"{pad}if not ({bulk}):"]
+                pad, depth = pad + "    ", depth + 1
+            body = self.compile(items, item, f"{path} + ({i},)", depth + 1)
+            if body:
+                lines += [f"{pad}for {i}, {item} in enumerate({v}):", *body]
+        return lines
+
+    @staticmethod
+    def bulk_numbers(items: Any, v: Text) -> Optional[Text]:
+        """ an expression that is true if all of `v` are numbers matching `items`,
+            without a python loop, if `items` is simple enough
+        """
+        if not isinstance(items, dict) or items.get("type") not in NUMERIC_TYPES:
+            return None
+        if set(items) - ANNOTATIONS - {"type", *BOUNDS}:
+            return None
+        bounds = [(key, items[key]) for key in BOUNDS if key in items]
+        if any(type(limit) not in (int, float) for _, limit in bounds):
+            return None
+        if items["type"] == "number" and not bounds:
+            return f"_numbers({v})"
+        # floats, which might be `NaN`, are left to the loop
+        checks = [f"_ints({v})"] + [
+            f"{BOUNDS[key].format(v=v)} {limit!r}" for key, limit in bounds
+        ]
+        return " and ".join(checks)
+
+    def compile_string(
+        self, schema: Dict[Text, Any], v: Text, path: Text, depth: int
+    ) -> List[Text]:
+        pad = "    " * depth
+        lines: List[Text] = []
+        for bound, op, what in [
+            ("minLength", "<", "short"),
+            ("maxLength", ">", "long"),
+        ]:
+            if bound in schema:
+                lines += [
+                    f"{pad}if len({v}) {op} {schema[bound]!r}:",
+                    self.fail(pad, v, f" is too {what}", path),
+                ]
+        if "pattern" in schema:
+            pattern = self.constant(f"re.compile({schema['pattern']!r})")
+            lines += [
+                f"{pad}if not {pattern}.search({v}):",
+                self.fail(pad, v, f" does not match {schema['pattern']!r}", path),
+            ]
+        return lines
+
+    def compile_number(
+        self, schema: Dict[Text, Any], v: Text, path: Text, depth: int
+    ) -> List[Text]:
+        pad = "    " * depth
+        lines: List[Text] = []
+        for bound, op in [
+            ("minimum", "<"),
+            ("maximum", ">"),
+            ("exclusiveMinimum", "<="),
+            ("exclusiveMaximum", ">="),
+        ]:
+            if bound in schema:
+                lines += [
+                    f"{pad}if {v} {op} {schema[bound]!r}:",
+                    self.fail(pad, v, f" fails {bound} {schema[bound]!r}", path),
+                ]
+        if "multipleOf" in schema:
+            lines += [
+                f"{pad}if ({v} / {schema['multipleOf']!r}) % 1:",
+                self.fail(
+                    pad, v, f" is not a multiple of {schema['multipleOf']}", path
+                ),
+            ]
+        return lines
+
+
+def compile_schema(
+    schema: Dict[Text, Any],
+    methods: Optional[Dict[Text, Dict[Text, Text]]] = None,
+    source: Text = "",
+) -> Text:
+    """ the source of a validator module for every definition of `schema`
+    """
+    return SchemaCompiler(schema).module(methods, source)
+
+
+def load_validators(path: Path) -> ModuleType:
+    """ import a compiled validator module from a file
+    """
+    spec = importlib.util.spec_from_file_location(
+        re.sub(r"\W", "_", path.stem), str(path)
+    )
+    assert spec is not None and spec.loader is not None, path
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
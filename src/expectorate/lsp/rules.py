@@ -0,0 +1,122 @@
+""" declarative rewrite rules for the prose of spec `params` and `result` bullets
+
+    the rules of a `RuleSet` are compiled once into a single alternation, so
+    each text is rewritten in one left-to-right scan: at each position the
+    first rule (in order) that matches wins, and its match is replaced, or
+    (for a `truncate` rule) it and everything after it are dropped
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Text, Tuple
+
+GROUP_REF = re.compile(r"\\(\d+)")
+
+
+def shift_group(base: int, match: "re.Match[Text]") -> Text:
+    """ a reference to a rule's own group, as numbered in the whole alternation
+    """
+    return f"\\g<{base + int(match[1])}>"
+
+
+@dataclass(frozen=True)
+class Rule:
+    """ a named regex, and what to replace its matches with
+    """
+
+    name: Text
+    pattern: Text
+    replacement: Text = ""
+    truncate: bool = False
+
+
+class RuleSet:
+    """ some rules, compiled into one pattern
+    """
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = tuple(rules)
+        alternatives: List[Text] = []
+        self.templates: List[Text] = []
+        group = 1
+        for index, rule in enumerate(self.rules):
+            alternatives.append(f"(?P<r{index}>{rule.pattern})")
+            # renumber the rule's own groups, as they sit in the alternation
+            self.templates.append(
+                GROUP_REF.sub(partial(shift_group, group), rule.replacement)
+            )
+            group += 1 + re.compile(rule.pattern).groups
+        self.pattern = re.compile("|".join(alternatives) or "(?!)", re.DOTALL)
+
+    def which(self, match: "re.Match[Text]") -> int:
+        # the named group around a rule is the last one to close
+        assert match.lastgroup is not None
+        return int(match.lastgroup[1:])
+
+    def rewrite(self, text: Text, hits: "Counter[Text]") -> Text:
+        """ apply every rule in one scan, counting which fired
+        """
+        pieces: List[Text] = []
+        pos = 0
+        for match in self.pattern.finditer(text):
+            index = self.which(match)
+            rule = self.rules[index]
+            hits[rule.name] += 1
+            pieces.append(text[pos : match.start()])
+            pos = match.end()
+            if rule.truncate:
+                break
+            pieces.append(match.expand(self.templates[index]))
+        else:
+            pieces.append(text[pos:])
+        return "".join(pieces)
+
+    def split(self, text: Text, hits: "Counter[Text]") -> List[Text]:
+        """ the text between matches of any rule
+        """
+        pieces: List[Text] = []
+        pos = 0
+        for match in self.pattern.finditer(text):
+            hits[self.rules[self.which(match)].name] += 1
+            pieces.append(text[pos : match.start()])
+            pos = match.end()
+        pieces.append(text[pos:])
+        return pieces
+
+    def extract(self, text: Text, hits: "Counter[Text]") -> Optional[Text]:
+        """ the replacement of the first match of any rule, or None
+        """
+        match = self.pattern.search(text)
+        if match is None:
+            return None
+        index = self.which(match)
+        hits[self.rules[index].name] += 1
+        return match.expand(self.templates[index])
+
+    def batch(
+        self, texts: Iterable[Optional[Text]], hits: "Counter[Text]", how: Text
+    ) -> Dict[Text, Any]:
+        """ the `rewrite`, `split` or `extract` of each distinct text
+
+            hits are counted once for every copy of a text
+        """
+        apply = getattr(self, how)
+        results: Dict[Text, Any] = {}
+        for text, count in Counter(t for t in texts if t is not None).items():
+            fired: "Counter[Text]" = Counter()
+            results[text] = apply(text, fired)
+            for name, n in fired.items():
+                hits[name] += n * count
+        return results
+
+
+@lru_cache(maxsize=None)
+def compile_rules(rules: Tuple[Rule, ...]) -> RuleSet:
+    return RuleSet(rules)
+
+
+def dead_rules(rules: Sequence[Rule], hits: "Counter[Text]") -> List[Text]:
+    """ the names of rules that never fired
+    """
+    return [rule.name for rule in rules if not hits[rule.name]]
@@ -0,0 +1,87 @@
+""" an offset index of the feature sections of a (memory-mapped) markdown spec
+"""
+import mmap
+from pathlib import Path
+from typing import Any, List, Sequence, Text, Tuple, Union, overload
+
+from .conventions import SpecConvention
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+class SectionIndex(Sequence[Text]):
+    """ (start, end) byte offsets of feature sections, which are decoded lazily
+
+        features are the chunks between `feature_separator`s, after a
+        `preamble_separator` and before the next `epilogue_separator`. Every
+        such region is indexed, so concatenated specs are read in one pass.
+    """
+
+    def __init__(self, buffer: Buffer):
+        self.buffer = buffer
+        self.spans: List[Tuple[int, int]] = []
+
+    @classmethod
+    def open(cls, path: Path) -> "SectionIndex":
+        with path.open("rb") as fd:
+            try:
+                buffer: Buffer = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                buffer = b""
+        return cls(buffer)
+
+    def scan(self, convention: SpecConvention) -> "SectionIndex":
+        buf = self.buffer
+        preamble = convention.preamble_separator.encode("utf-8")
+        epilogue = convention.epilogue_separator.encode("utf-8")
+        separator = convention.feature_separator.encode("utf-8")
+
+        spans = []
+        region = buf.find(preamble)
+        while region != -1:
+            start = region + len(preamble)
+            region = buf.find(preamble, start)
+            end = len(buf) if region == -1 else region
+            epilogue_at = buf.find(epilogue, start, end)
+            if epilogue_at != -1:
+                end = epilogue_at
+
+            feature = buf.find(separator, start, end)
+            while feature != -1:
+                feature_start = feature + len(separator)
+                feature = buf.find(separator, feature_start, end)
+                spans.append((feature_start, end if feature == -1 else feature))
+
+        self.spans = spans
+        return self
+
+    def raw(self, i: int) -> bytes:
+        start, end = self.spans[i]
+        return self.buffer[start:end]
+
+    @overload
+    def __getitem__(self, i: int) -> Text:
+        ...  # pragma: no cover
+
+    @overload
+    def __getitem__(self, i: slice) -> List[Text]:
+        ...  # pragma: no cover
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        return self.raw(i).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def close(self) -> None:
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self) -> "SectionIndex":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
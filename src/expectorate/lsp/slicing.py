@@ -0,0 +1,51 @@
+""" minimal schemas for single definitions of the synthetic schema
+"""
+from typing import Any, Dict, Iterable, Iterator, Set, Text
+
+from .constants import DEFINITIONS
+
+
+def iter_refs(node: Any) -> Iterator[Text]:
+    """ the names of every definition referenced in (part of) a schema
+    """
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "$ref" and isinstance(value, str):
+                if value.startswith(DEFINITIONS):
+                    yield value[len(DEFINITIONS) :]
+            else:
+                yield from iter_refs(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from iter_refs(item)
+
+
+def reachable_definitions(
+    definitions: Dict[Text, Any], roots: Iterable[Text]
+) -> Set[Text]:
+    """ the names of the roots, and all definitions they transitively `$ref`
+    """
+    found: Set[Text] = set()
+    queue = list(roots)
+    while queue:
+        name = queue.pop()
+        if name in found:
+            continue
+        if name not in definitions:
+            raise KeyError(f"no definition {name}")
+        found.add(name)
+        queue += [ref for ref in iter_refs(definitions[name]) if ref not in found]
+    return found
+
+
+def slice_schema(schema: Dict[Text, Any], root: Text) -> Dict[Text, Any]:
+    """ a schema of one definition, keeping only the definitions it needs
+    """
+    definitions = schema["definitions"]
+    names = reachable_definitions(definitions, [root])
+    sliced: Dict[Text, Any] = {}
+    if "$schema" in schema:
+        sliced["$schema"] = schema["$schema"]
+    sliced["$ref"] = f"{DEFINITIONS}{root}"
+    sliced["definitions"] = {name: definitions[name] for name in sorted(names)}
+    return sliced
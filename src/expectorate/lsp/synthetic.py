@@ -0,0 +1,219 @@
+""" assembling the synthetic schema in python, straight from the naive schema
+
+    this aims to make the same `_<Title>Request`, `_<Title>Response`, etc.
+    wrappers as compiling `templates/protocol-schema.ts.j2`, without rendering,
+    formatting and compiling any typescript. The fake TSSG of the tests follows
+    this module, so only `check_synthetic` against a real TSSG (the `node` tests)
+    shows whether they agree
+"""
+import re
+from typing import Any, Dict, Iterable, List, Text, Tuple
+
+from .constants import DEFINITIONS
+from .features import FeatureRecord
+from .slicing import reachable_definitions
+
+SCHEMA_DRAFT = "http://json-schema.org/draft-07/schema#"
+
+TYPE_TOKEN = re.compile(r"\s*('[^']*'|\[\]|[|()]|[\w.$]+(?:<[^>]*>)?)")
+
+PRIMITIVES: Dict[Text, Dict[Text, Any]] = {
+    "number": {"type": "number"},
+    "integer": {"type": "integer"},
+    "string": {"type": "string"},
+    "boolean": {"type": "boolean"},
+    "null": {"type": "null"},
+    "void": {"type": "null"},
+    "any": {},
+}
+
+# (schema, required) of each property of an interface
+Properties = Dict[Text, Tuple[Dict[Text, Any], bool]]
+
+# the base messages of `vscode-jsonrpc`
+MESSAGE: Properties = {"jsonrpc": ({"type": "string"}, True)}
+REQUEST_MESSAGE: Properties = {
+    **MESSAGE,
+    "id": ({"type": ["number", "string"]}, True),
+    "method": ({"type": "string"}, True),
+    "params": ({}, False),
+}
+NOTIFICATION_MESSAGE: Properties = {
+    **MESSAGE,
+    "method": ({"type": "string"}, True),
+    "params": ({}, False),
+}
+RESPONSE_MESSAGE: Properties = {
+    **MESSAGE,
+    "id": ({"type": ["number", "string", "null"]}, True),
+    "result": ({}, False),
+    "error": ({"$ref": f"{DEFINITIONS}ResponseErrorLiteral"}, False),
+}
+
+# types the template declares (or imports) itself
+BUILTIN_DEFINITIONS: Dict[Text, Any] = {
+    "ResponseErrorLiteral": {
+        "type": "object",
+        "properties": {
+            "code": {"type": "number"},
+            "message": {"type": "string"},
+            "data": {},
+        },
+        "required": ["code", "message"],
+        "additionalProperties": False,
+    },
+}
+CANCEL_PARAMS = "CancelParams"
+CANCEL_PARAMS_TYPE = "number | string"
+
+
+def parse_type(expr: Text) -> Dict[Text, Any]:
+    """ the schema of a typescript type expression of names, literals, arrays
+        and unions
+    """
+    tokens: List[Text] = []
+    pos = 0
+    while pos < len(expr.rstrip()):
+        match = TYPE_TOKEN.match(expr, pos)
+        if match is None:
+            raise ValueError(f"can't parse type {expr!r} at {pos}")
+        tokens.append(match.group(1))
+        pos = match.end()
+    position = 0
+
+    def union() -> Dict[Text, Any]:
+        nonlocal position
+        if position < len(tokens) and tokens[position] == "|":
+            position += 1
+        options = [postfix()]
+        while position < len(tokens) and tokens[position] == "|":
+            position += 1
+            options.append(postfix())
+        return options[0] if len(options) == 1 else {"anyOf": options}
+
+    def postfix() -> Dict[Text, Any]:
+        nonlocal position
+        schema = primary()
+        while position < len(tokens) and tokens[position] == "[]":
+            position += 1
+            schema = {"type": "array", "items": schema}
+        return schema
+
+    def primary() -> Dict[Text, Any]:
+        nonlocal position
+        if position >= len(tokens):
+            raise ValueError(f"unexpected end of type {expr!r}")
+        token = tokens[position]
+        position += 1
+        if token == "(":
+            inner = union()
+            position += 1
+            return inner
+        if token.startswith("'"):
+            return {"type": "string", "enum": [token[1:-1]]}
+        name = re.sub(r"^proto\.", "", re.sub(r"<.*>$", "", token))
+        if name in PRIMITIVES:
+            return dict(PRIMITIVES[name])
+        return {"$ref": f"{DEFINITIONS}{name}"}
+
+    schema = union()
+    if position != len(tokens):
+        raise ValueError(f"can't parse type {expr!r}")
+    return schema
+
+
+def interface(properties: Properties) -> Dict[Text, Any]:
+    """ the schema of an interface, which (like `--strict-tuples`) is closed
+    """
+    schema: Dict[Text, Any] = {
+        "type": "object",
+        "properties": {name: prop for name, (prop, _) in properties.items()},
+        "additionalProperties": False,
+    }
+    required = [name for name, (_, is_required) in properties.items() if is_required]
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def omit(properties: Properties, name: Text) -> Properties:
+    return {key: value for key, value in properties.items() if key != name}
+
+
+def has_response(row: FeatureRecord) -> bool:
+    return bool(row.result) and row.result != "void"
+
+
+def feature_definitions(row: FeatureRecord) -> Dict[Text, Any]:
+    """ the request, notification, response and feature definitions of a row
+    """
+    title = row.ns_title
+    method = ({"type": "string", "enum": [row.method]}, True)
+    message: Properties = {"method": method}
+    if row.params:
+        message["params"] = (parse_type(row.params), True)
+
+    definitions = {f"_{title}Request": interface({**REQUEST_MESSAGE, **message})}
+    feature: Properties = {"request": ({"$ref": f"{DEFINITIONS}_{title}Request"}, True)}
+
+    if row.is_notification:
+        definitions[f"_{title}Notification"] = interface(
+            {**NOTIFICATION_MESSAGE, **message}
+        )
+        feature["notification"] = (
+            {"$ref": f"{DEFINITIONS}_{title}Notification"},
+            False,
+        )
+
+    if has_response(row):
+        assert row.ns_result is not None, row
+        definitions[f"_{title}Response"] = interface(
+            {
+                **omit(RESPONSE_MESSAGE, "error"),
+                "result": (parse_type(row.ns_result), True),
+            }
+        )
+        response = {
+            "anyOf": [
+                {"$ref": f"{DEFINITIONS}_{title}Response"},
+                {"$ref": f"{DEFINITIONS}_ErrorResponse"},
+            ]
+        }
+        feature["response"] = (response, True)
+
+    definitions[f"_{title}Feature"] = interface(feature)
+    return definitions
+
+
+def assemble_synthetic_schema(
+    naive_schema: Dict[Text, Any], rows: Iterable[FeatureRecord],
+) -> Dict[Text, Any]:
+    """ a synthetic schema of some features, like compiling the rendered template
+        for `_AnyFeature` would make
+    """
+    rows = list(rows)
+    available: Dict[Text, Any] = {
+        **BUILTIN_DEFINITIONS,
+        **naive_schema["definitions"],
+        CANCEL_PARAMS: interface({"id": (parse_type(CANCEL_PARAMS_TYPE), True)}),
+        "_ErrorResponse": interface(
+            {
+                **omit(RESPONSE_MESSAGE, "result"),
+                "error": ({"$ref": f"{DEFINITIONS}ResponseErrorLiteral"}, True),
+            }
+        ),
+    }
+    for row in rows:
+        available.update(feature_definitions(row))
+    available["_AnyFeature"] = {
+        "anyOf": [{"$ref": f"{DEFINITIONS}_{row.ns_title}Feature"} for row in rows]
+    }
+    if len(rows) == 1:
+        available["_AnyFeature"] = available["_AnyFeature"]["anyOf"][0]
+
+    names = reachable_definitions(available, ["_AnyFeature"])
+    return {
+        "$schema": SCHEMA_DRAFT,
+        "$ref": f"{DEFINITIONS}_AnyFeature",
+        "definitions": {name: available[name] for name in sorted(names)},
+    }
@@ -0,0 +1,134 @@
+""" keeping a generator (and its node worker) hot, and rebuilding on changes
+
+    each watched file belongs to the first stage that reads it: after a change,
+    only that stage and the stages downstream of it are run again
+"""
+import importlib
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Text, Tuple
+
+from ..stages import Stage
+from . import conventions
+from .generate import SpecGenerator
+from .worker import NodeWorker
+
+CONVENTIONS_PY = Path(conventions.__file__)
+
+# (mtime, size) of each file, or None once deleted
+Snapshot = Dict[Path, Optional[Tuple[int, int]]]
+
+
+def snapshot(paths: List[Path]) -> Snapshot:
+    stats: Snapshot = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stats[path] = None
+    return stats
+
+
+@dataclass
+class SpecWatcher:
+    """ polls the spec, the protocol sources and the conventions for changes
+    """
+
+    gen: SpecGenerator
+    interval: float = 0.25
+
+    snapshots: Dict[Text, Snapshot] = field(default_factory=dict, init=False)
+    # stages whose last rebuild failed, to retry with the next change
+    pending: Set[Text] = field(default_factory=set, init=False)
+
+    def watched(self) -> Dict[Text, List[Path]]:
+        """ the files read by each stage, rescanned for added sources
+        """
+        return {
+            "parse_spec": [self.gen.spec_md_path],
+            "extract_spec_features": [CONVENTIONS_PY],
+            "build_naive_schema": self.gen.protocol_sources,
+        }
+
+    def changed(self) -> List[Text]:
+        """ the stages whose files changed since the last look
+        """
+        names = []
+        for name, paths in self.watched().items():
+            current = snapshot(paths)
+            if self.snapshots.get(name, current) != current:
+                names.append(name)
+            self.snapshots[name] = current
+        return names
+
+    def reload_conventions(self) -> None:
+        """ pick up edits to `SpecConvention`s without restarting
+        """
+        version = self.gen.lsp_spec.version
+        reloaded = importlib.reload(conventions)
+        self.gen.lsp_spec = reloaded.CONVENTIONS.get(version, self.gen.lsp_spec)
+
+    def build(self) -> None:
+        """ run every stage, keeping the spec open for later rebuilds
+        """
+        self.gen.scheduler.run(self.gen.run_stage)
+
+    def rebuild(self, names: List[Text]) -> List[Stage]:
+        """ run the named stages, and all the stages downstream of them
+        """
+        gen = self.gen
+        if "extract_spec_features" in names:
+            self.reload_conventions()
+        if "parse_spec" in names:
+            gen.close_spec_index()
+        stages = gen.scheduler.downstream(names)
+        gen.scheduler.run(gen.run_stage, stages)
+        return stages
+
+    def poll(self) -> List[Stage]:
+        """ rebuild whatever changed, returning the stages that ran
+        """
+        names = sorted(self.pending | set(self.changed()))
+        if not names:
+            return []
+        start = time.perf_counter()
+        try:
+            stages = self.rebuild(names)
+        except Exception:
+            self.pending = set(names)
+            self.gen.log.exception("rebuilding after changes to %s failed", names)
+            return []
+        self.pending = set()
+        self.gen.log.info(
+            "rebuilt %s stages after changes to %s in %.2fs",
+            len(stages),
+            names,
+            time.perf_counter() - start,
+        )
+        return stages
+
+    def run(self, stop: Optional[threading.Event] = None) -> int:
+        """ build everything once, then rebuild on changes until stopped
+        """
+        gen = self.gen
+        stop = stop or threading.Event()
+        owns_worker = gen.use_node_worker and gen.node_worker is None
+        if owns_worker:
+            gen.node_worker = NodeWorker(log=gen.log)
+        try:
+            self.build()
+            self.changed()
+            gen.log.info("watching %s for changes", list(self.watched()))
+            while not stop.wait(self.interval):
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            gen.close_spec_index()
+            if owns_worker and gen.node_worker is not None:
+                gen.node_worker.close()
+                gen.node_worker = None
+        return 0
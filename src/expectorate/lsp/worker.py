@@ -0,0 +1,136 @@
+""" a persistent node process for ts-json-schema-generator and prettier
+"""
+import json
+import logging
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Text
+
+from ..profile import profiled, record_child_cpu
+
+WORKER_JS = Path(__file__).parent / "js" / "worker.js"
+
+
+class NodeWorkerError(RuntimeError):
+    """ a request failed inside the node worker
+    """
+
+
+@dataclass
+class NodeWorker:
+    """ a JSON-RPC client for `js/worker.js`, started on first use
+
+        calls are serialized, so one worker can be shared between threads
+    """
+
+    node: Text = "node"
+    log: Optional[logging.Logger] = None
+
+    _proc: Optional[subprocess.Popen] = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _next_id: int = field(default=0, init=False, repr=False)
+
+    @property
+    def pid(self) -> Optional[int]:
+        return None if self._proc is None else self._proc.pid
+
+    def _ensure_started(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            if self._proc is not None:
+                # now counted with the other finished children
+                record_child_cpu(self._proc.pid, None)
+            if self.log:
+                self.log.debug("[node] starting %s", WORKER_JS)
+            self._proc = subprocess.Popen(
+                [self.node, str(WORKER_JS)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        return self._proc
+
+    def _send(self, proc: subprocess.Popen, method: Text, params: Any) -> None:
+        assert proc.stdin is not None
+        self._next_id += 1
+        request = {
+            "jsonrpc": "2.0",
+            "id": self._next_id,
+            "method": method,
+            "params": params,
+        }
+        proc.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+        proc.stdin.flush()
+
+    def call(self, method: Text, **params: Any) -> Any:
+        with self._lock, profiled(f"node {method}", "node"):
+            proc = self._ensure_started()
+            assert proc.stdout is not None
+            self._send(proc, method, params)
+            line = proc.stdout.readline()
+            if not line:
+                raise NodeWorkerError(f"node worker exited during {method}")
+            response: Dict[Text, Any] = json.loads(line)
+            if "cpu" in response:
+                # while still in the span of this call
+                record_child_cpu(proc.pid, response["cpu"])
+
+        error = response.get("error")
+        if error:
+            raise NodeWorkerError(f"""{method}: {error["message"]}\n{error["data"]}""")
+        return response["result"]
+
+    def tssg(
+        self,
+        root: Path,
+        path: Path,
+        type: Optional[Text] = None,
+        out: Optional[Path] = None,
+    ) -> Any:
+        """ compile a typescript file to JSON schema, like `--expose all`
+
+            with `out`, the schema is written there by node, rather than sent
+            back over the pipe
+        """
+        return self.call(
+            "tssg",
+            root=str(root),
+            path=str(path),
+            type=type,
+            out=None if out is None else str(out),
+        )
+
+    def prettier(self, root: Path, path: Path) -> None:
+        """ format a file in place, like `prettier --write`
+        """
+        self.call("prettier", root=str(root), path=str(path))
+
+    def close(self) -> None:
+        """ ask the worker to exit, even if something still holds its event loop
+        """
+        with self._lock:
+            proc, self._proc = self._proc, None
+            if proc is None:
+                return
+            assert proc.stdin is not None
+            try:
+                if proc.poll() is None:
+                    self._send(proc, "shutdown", {})
+            except BrokenPipeError:  # pragma: no cover
+                pass
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:  # pragma: no cover
+            proc.kill()
+            proc.wait()
+        finally:
+            record_child_cpu(proc.pid, None)
+            if proc.stdout is not None:
+                proc.stdout.close()
+
+    def __enter__(self) -> "NodeWorker":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -0,0 +1,168 @@
+""" where the time (and memory) of a run goes: stages, subprocesses and node calls
+"""
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Text
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+_PROFILER: Optional["Profiler"] = None
+
+# user + system seconds so far of running children, by pid, as they report them
+_RUNNING_CPU: Dict[int, float] = {}
+
+
+def record_child_cpu(pid: int, seconds: Optional[float]) -> None:
+    """ the CPU time so far of a long-lived child (like the node worker), or
+        `None` once it has been waited for, and is counted as finished
+    """
+    if seconds is None:
+        _RUNNING_CPU.pop(pid, None)
+    else:
+        _RUNNING_CPU[pid] = seconds
+
+
+def child_cpu_time() -> float:
+    """ user + system seconds of all finished (and waited for) child processes,
+        and of running ones which report their own
+    """
+    running = sum(list(_RUNNING_CPU.values()))
+    if resource is None:  # pragma: no cover
+        return running
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime + running
+
+
+class Profiler:
+    """ nested spans of wall time, child CPU time and python peak memory
+
+        child CPU time and peak memory are process-wide, so they are only exact
+        for stages run with `--jobs 1`
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.spans: List[Dict[Text, Any]] = []
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._main_stack: List[Dict[Text, Any]] = []
+
+    def _stack(self) -> List[Dict[Text, Any]]:
+        if threading.current_thread() is threading.main_thread():
+            return self._main_stack
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            # spans on worker threads nest under whatever the main thread is doing
+            stack = self._local.stack = list(self._main_stack)
+        return stack
+
+    def __enter__(self) -> "Profiler":
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _peak(self) -> int:
+        return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+    @contextmanager
+    def span(self, name: Text, kind: Text, **meta: Any) -> Iterator[Dict[Text, Any]]:
+        """ time a block, nested under any span already open on this thread
+        """
+        stack = self._stack()
+        record: Dict[Text, Any] = {
+            "name": name,
+            "kind": kind,
+            "stack": ";".join([*[s["name"] for s in stack], name]),
+            "thread": threading.current_thread().name,
+            **meta,
+        }
+        reset_peak = getattr(tracemalloc, "reset_peak", None)
+        outer_peak = self._peak()
+        if reset_peak is not None and tracemalloc.is_tracing():
+            reset_peak()
+        stack.append(record)
+        cpu = child_cpu_time()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["start"] = start - self.start
+            record["wall"] = time.perf_counter() - start
+            record["child_cpu"] = child_cpu_time() - cpu
+            # peaks are reset for each span, so carry the highest one outwards
+            peak = max(self._peak(), record.pop("_peak", 0))
+            record["peak_memory"] = peak
+            stack.pop()
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1].get("_peak", 0), outer_peak, peak)
+            with self._lock:
+                self.spans.append(record)
+
+    def report(self) -> Dict[Text, Any]:
+        totals: Dict[Text, Dict[Text, float]] = {}
+        for span in self.spans:
+            total = totals.setdefault(span["kind"], {"count": 0, "wall": 0.0})
+            total["count"] += 1
+            total["wall"] += span["wall"]
+        return {
+            "wall": time.perf_counter() - self.start,
+            "peak_memory": max([s["peak_memory"] for s in self.spans] or [0]),
+            "totals": totals,
+            "spans": sorted(self.spans, key=lambda span: span["start"]),
+        }
+
+    def folded(self) -> Text:
+        """ `stack;frames microseconds` lines of self time, for flamegraph tools
+        """
+        self_time: Dict[Text, float] = {}
+        for span in self.spans:
+            self_time[span["stack"]] = self_time.get(span["stack"], 0) + span["wall"]
+        for span in self.spans:
+            parent = span["stack"].rpartition(";")[0]
+            if parent in self_time:
+                self_time[parent] -= span["wall"]
+        return "".join(
+            f"{stack} {max(int(seconds * 1e6), 0)}\n"
+            for stack, seconds in sorted(self_time.items())
+        )
+
+    def write(self, output: Path) -> List[Path]:
+        output.mkdir(parents=True, exist_ok=True)
+        report = output / "profile.json"
+        folded = output / "profile.folded"
+        report.write_text(json.dumps(self.report(), indent=2, sort_keys=True))
+        folded.write_text(self.folded())
+        return [report, folded]
+
+
+def current() -> Optional[Profiler]:
+    return _PROFILER
+
+
+def activate(profiler: Optional[Profiler]) -> None:
+    global _PROFILER
+    _PROFILER = profiler
+
+
+@contextmanager
+def profiled(name: Text, kind: Text, **meta: Any) -> Iterator[None]:
+    """ a span of the active profiler, if there is one
+    """
+    profiler = _PROFILER
+    if profiler is None:
+        yield
+        return
+    with profiler.span(name, kind, **meta):
+        yield
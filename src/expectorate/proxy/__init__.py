@@ -0,0 +1,2 @@
+""" validating live traffic between a language client and server
+"""
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Optional, Text, Tuple
+
+import click
+
+from ..context import Context
+from ..lsp import constants
+
+
+@click.command()
+@click.pass_context
+@click.argument("command", nargs=-1, required=True)
+@click.option(
+    "--schema",
+    type=Path,
+    help="a synthetic schema, instead of the one made by `lsp` in --output",
+)
+@click.option("--lsp-spec-version", default=constants.LSP_SPEC_VERSION)
+@click.option("--report", type=Path, help="write a JSON report here on exit")
+@click.option("--max-errors", default=1000, help="most errors to report")
+def proxy(
+    ctx: Context,
+    command: Tuple[Text, ...],
+    schema: Optional[Path],
+    lsp_spec_version: Text,
+    report: Optional[Path],
+    max_errors: int,
+):
+    """ run a language server, validating the messages between it and its client
+
+        use as `expectorate proxy -- <server command>`: stdin and stdout are
+        relayed to and from the server unchanged, and violations are logged to
+        stderr as they are found
+    """
+    from .relay import ValidatingProxy
+
+    assert ctx.obj.log, "Need a log"
+    if schema is None:
+        assert ctx.obj.output, "Need an output directory"
+        schema = ctx.obj.output / f"lsp.{lsp_spec_version}.synthetic.schema.json"
+
+    relay = ValidatingProxy(schema, command, log=ctx.obj.log, max_errors=max_errors)
+    returncode = asyncio.run(serve_stdio(relay))
+
+    result = relay.report
+    forwarding = result.to_json()["forwarding_us"]
+    click.echo(
+        f"{result.messages} messages, {result.invalid} invalid, "
+        f"{sum(result.skipped.values())} skipped, {result.dropped} dropped; "
+        f"forwarded in {forwarding.get('p50', 0):.0f}us (p50), "
+        f"{forwarding.get('p99', 0):.0f}us (p99)",
+        err=True,
+    )
+    for method, stats in sorted(result.methods.items()):
+        latency = stats.to_json()["latency_ms"]
+        click.echo(
+            f"  {method}: {stats.messages} messages, {stats.invalid} invalid, "
+            f"{latency.get('p50', 0):.1f}ms (p50)",
+            err=True,
+        )
+    if report is not None:
+        report.parent.mkdir(parents=True, exist_ok=True)
+        report.write_text(json.dumps(result.to_json(), indent=2, sort_keys=True))
+    sys.exit(returncode)
+
+
+async def serve_stdio(relay) -> int:
+    """ relay this process's stdin and stdout
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer
+    )
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, sys.stdout.buffer
+    )
+    writer = asyncio.StreamWriter(transport, protocol, None, loop)
+    return await relay.run(reader, writer)
@@ -0,0 +1,371 @@
+""" a stdio relay which forwards `Content-Length` frames as soon as they arrive
+
+    every frame is also queued for validation, which never holds up forwarding:
+    a worker process decodes each batch once, matches responses to the requests
+    still pending before it, and checks each message against its definition,
+    sending back only what it found. Responses are matched in the order frames
+    were seen, so batches are checked one at a time
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Text, Tuple
+
+from ..validate import bulk
+from ..validate.bulk import Job, _init_worker, check_chunk
+from ..validate.dispatch import MessageDispatcher
+from ..validate.framing import FrameHeaders, FramingError
+
+CLIENT, SERVER = "client", "server"
+OTHER = {CLIENT: SERVER, SERVER: CLIENT}
+
+# the most frames waiting for validation, beyond which they are dropped
+QUEUE_SIZE = 10_000
+
+# (kind, method, id, is_error) of a message, as found by `inspect`
+Inspection = Tuple[Text, Optional[Text], Any, bool]
+
+# the method and arrival time of each request without a response yet, by the
+# (sender, id) of the request
+Pending = Dict[Tuple[Text, Any], Tuple[Text, float]]
+
+# (index, sender, body) of a frame, as sent to be checked
+RawFrame = Tuple[int, Text, bytes]
+
+# the (name, reason, method, request arrival time) of a routed message
+Route = Tuple[Optional[Text], Text, Optional[Text], Optional[float]]
+
+
+class Sink(Protocol):
+    def write(self, data: bytes) -> None:
+        ...  # pragma: no cover
+
+    async def drain(self) -> None:
+        ...  # pragma: no cover
+
+
+@dataclass
+class Frame:
+    index: int
+    sender: Text
+    body: bytes
+    received: float
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Tuple[bytes, bytes]]:
+    """ the (raw headers, body) of the next frame, or None at EOF
+    """
+    headers = FrameHeaders()
+    while True:
+        line = await reader.readline()
+        if not line and not headers.lines:
+            return None
+        if headers.feed(line):
+            break
+    assert headers.length is not None
+    try:
+        body = await reader.readexactly(headers.length)
+    except asyncio.IncompleteReadError as err:
+        body = err.partial
+    return b"".join(headers.lines), headers.check(body)
+
+
+def inspect(body: bytes) -> Tuple[Inspection, Any]:
+    """ what kind of message a body is, and the decoded message
+    """
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return ("not JSON", None, None, False), None
+    if not isinstance(message, dict):
+        return ("not an object", None, None, False), message
+    id_ = message.get("id")
+    method = message.get("method")
+    if isinstance(method, str):
+        kind = "request" if "id" in message else "notification"
+        return (kind, method, id_, False), message
+    return ("response", None, id_, "error" in message), message
+
+
+def route(
+    dispatcher: MessageDispatcher,
+    pending: Pending,
+    sender: Text,
+    received: float,
+    inspection: Inspection,
+) -> Route:
+    """ the definition to check a message against, matching responses by id
+
+        `pending` is updated with each request, and each response's request
+    """
+    kind, method, id_, is_error = inspection
+    name = sent = None
+    if kind == "request" or kind == "notification":
+        assert method is not None
+        if kind == "request":
+            pending[sender, id_] = (method, received)
+        name = dispatcher.request(method, kind == "request")
+        if name is None:
+            kind = f"unknown method {method}"
+    elif kind == "response":
+        request = pending.pop((OTHER[sender], id_), None)
+        if request is None:
+            kind = "unmatched response"
+        else:
+            method, sent = request
+            name = dispatcher.response(method, is_error)
+            if name is None:
+                kind = f"no response for {method}"
+    return name, kind, method, sent
+
+
+def check_frames(
+    frames: Sequence[RawFrame], pending: Pending
+) -> Tuple[List[Inspection], List[Dict[Text, Any]]]:
+    """ inspect, route and check a batch of frames in a worker, decoding each once
+
+        `pending` has the requests still waiting for a response before the batch
+    """
+    registry = bulk._REGISTRY
+    assert registry is not None, "worker not initialized"
+    dispatcher = MessageDispatcher(registry.definitions)
+    pending = dict(pending)
+    inspections: List[Inspection] = []
+    jobs: List[Job] = []
+    for index, sender, body in frames:
+        inspection, message = inspect(body)
+        inspections.append(inspection)
+        name, _, method, _ = route(dispatcher, pending, sender, 0.0, inspection)
+        if name is not None:
+            jobs.append((index, 0, name, method or "", message))
+    return inspections, check_chunk(jobs, registry)
+
+
+def summary(values: Sequence[float], scale: float) -> Dict[Text, float]:
+    """ the count, mean and some percentiles of some timings, in seconds/`scale`
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) / scale,
+        "p50": ordered[last // 2] / scale,
+        "p95": ordered[last * 95 // 100] / scale,
+        "p99": ordered[last * 99 // 100] / scale,
+        "max": ordered[last] / scale,
+    }
+
+
+@dataclass
+class MethodStats:
+    messages: int = 0
+    invalid: int = 0
+    latencies: "array[float]" = field(default_factory=lambda: array("d"))
+
+    def to_json(self) -> Dict[Text, Any]:
+        return {
+            "messages": self.messages,
+            "invalid": self.invalid,
+            "latency_ms": summary(self.latencies, 1e-3),
+        }
+
+
+@dataclass
+class ProxyReport:
+    messages: int = 0
+    invalid: int = 0
+    dropped: int = 0
+    seconds: float = 0.0
+    returncode: Optional[int] = None
+    methods: Dict[Text, MethodStats] = field(default_factory=dict)
+    skipped: Counter = field(default_factory=Counter)
+    forwarding: "array[float]" = field(default_factory=lambda: array("d"))
+    errors: List[Dict[Text, Any]] = field(default_factory=list)
+
+    def method(self, method: Text) -> MethodStats:
+        stats = self.methods.get(method)
+        if stats is None:
+            stats = self.methods[method] = MethodStats()
+        return stats
+
+    def to_json(self) -> Dict[Text, Any]:
+        return {
+            "messages": self.messages,
+            "invalid": self.invalid,
+            "dropped": self.dropped,
+            "seconds": self.seconds,
+            "returncode": self.returncode,
+            "forwarding_us": summary(self.forwarding, 1e-6),
+            "methods": {
+                method: stats.to_json()
+                for method, stats in sorted(self.methods.items())
+            },
+            "skipped": dict(self.skipped),
+            "errors": self.errors,
+        }
+
+
+@dataclass
+class ValidatingProxy:
+    """ relays frames between a client and a server command, validating both ways
+    """
+
+    schema_path: Path
+    command: Sequence[Text]
+    log: logging.Logger
+    chunk_size: int = 100
+    max_errors: int = 1000
+
+    report: ProxyReport = field(default_factory=ProxyReport, init=False)
+
+    def __post_init__(self):
+        definitions = json.loads(self.schema_path.read_text()).get("definitions", {})
+        self.dispatcher = MessageDispatcher(definitions)
+        self.pending: Pending = {}
+        self.queue: Optional["asyncio.Queue[Optional[Frame]]"] = None
+        self.next_index = 0
+
+    async def pump(
+        self, sender: Text, reader: asyncio.StreamReader, writer: Sink
+    ) -> None:
+        """ forward every frame from one side to the other, queueing a copy
+        """
+        report = self.report
+        assert self.queue is not None
+        while True:
+            frame = await read_frame(reader)
+            if frame is None:
+                return
+            received = time.perf_counter()
+            headers, body = frame
+            writer.write(headers + body)
+            await writer.drain()
+            report.forwarding.append(time.perf_counter() - received)
+            report.messages += 1
+            self.next_index += 1
+            try:
+                self.queue.put_nowait(Frame(self.next_index, sender, body, received))
+            except asyncio.QueueFull:
+                report.dropped += 1
+
+    async def next_batch(self) -> Tuple[List[Frame], bool]:
+        """ at least one queued frame (and any others waiting), and if that's all
+        """
+        assert self.queue is not None
+        frame = await self.queue.get()
+        if frame is None:
+            return [], True
+        batch = [frame]
+        while len(batch) < self.chunk_size and not self.queue.empty():
+            frame = self.queue.get_nowait()
+            if frame is None:
+                return batch, True
+            batch.append(frame)
+        return batch, False
+
+    def count(self, frame: Frame, inspection: Inspection) -> None:
+        """ count a checked frame, and time the response to each request
+        """
+        report = self.report
+        name, reason, method, sent = route(
+            self.dispatcher, self.pending, frame.sender, frame.received, inspection
+        )
+        if method is not None:
+            report.method(method).messages += 1
+            if sent is not None:
+                report.method(method).latencies.append(frame.received - sent)
+        if name is None:
+            report.skipped[reason] += 1
+
+    def collect(self, senders: Dict[int, Text], errors: List[Dict[Text, Any]]) -> None:
+        report = self.report
+        for error in errors:
+            error.pop("offset", None)
+            error["sender"] = senders[error["index"]]
+            report.invalid += 1
+            report.method(error["method"]).invalid += 1
+            self.log.warning(
+                "%s %s (%s) %s: %s",
+                error["sender"],
+                error["method"],
+                error["definition"],
+                error["path"],
+                error["message"],
+            )
+            if len(report.errors) < self.max_errors:
+                report.errors.append(error)
+
+    async def validate(self, pool: Executor) -> None:
+        """ check queued frames, a batch at a time, until the relay is done
+        """
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            batch, done = await self.next_batch()
+            if not batch:
+                continue
+            frames = [(frame.index, frame.sender, frame.body) for frame in batch]
+            inspections, errors = await loop.run_in_executor(
+                pool, check_frames, frames, self.pending
+            )
+            # the worker only routed a copy of `pending`
+            for frame, inspection in zip(batch, inspections):
+                self.count(frame, inspection)
+            self.collect({frame.index: frame.sender for frame in batch}, errors)
+
+    async def run(self, client_in: asyncio.StreamReader, client_out: Sink) -> int:
+        """ relay until the server's stdout closes, then finish validating
+        """
+        start = time.perf_counter()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        proc = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        stdin, stdout = proc.stdin, proc.stdout
+        assert stdin is not None and stdout is not None
+        pool = ProcessPoolExecutor(
+            max_workers=1,
+            # forked workers would hold the server's stdin open, so it would
+            # never see the client hang up
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(self.schema_path),),
+        )
+        validating = asyncio.ensure_future(self.validate(pool))
+
+        async def to_server() -> None:
+            try:
+                await self.pump(CLIENT, client_in, stdin)
+            finally:
+                # the server sees the client hang up
+                stdin.close()
+
+        client = asyncio.ensure_future(to_server())
+        try:
+            await self.pump(SERVER, stdout, client_out)
+        except FramingError as err:
+            # nothing more can be relayed, so both ends are closed below
+            self.log.error("reading from the server failed: %s", err)
+        finally:
+            client.cancel()
+            stdin.close()
+            self.report.returncode = await proc.wait()
+            await self.queue.put(None)
+            await validating
+            pool.shutdown()
+            self.report.seconds = time.perf_counter() - start
+        (error,) = await asyncio.gather(client, return_exceptions=True)
+        if isinstance(error, Exception):
+            self.log.error("reading from the client failed: %s", error)
+        return self.report.returncode
@@ -0,0 +1,107 @@
+""" a dependency graph of named steps, each run as soon as its inputs are ready
+"""
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Text, Tuple
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: Text
+    requires: Tuple[Text, ...] = ()
+    provides: Tuple[Text, ...] = ()
+
+
+@dataclass
+class StageScheduler:
+    """ runs stages on a thread pool, respecting their declared inputs and outputs
+
+        with `jobs=1`, stages run inline, in declaration order
+    """
+
+    stages: List[Stage]
+    jobs: int = 1
+    log: Optional[logging.Logger] = None
+
+    def __post_init__(self):
+        self.providers: Dict[Text, Stage] = {}
+        for stage in self.stages:
+            for resource in stage.provides:
+                if resource in self.providers:
+                    raise ValueError(
+                        f"{resource} provided by both "
+                        f"{self.providers[resource].name} and {stage.name}"
+                    )
+                self.providers[resource] = stage
+        available: Set[Text] = set()
+        for stage in self.stages:
+            for resource in stage.requires:
+                if resource not in self.providers:
+                    raise ValueError(f"nothing provides {resource} for {stage.name}")
+                if resource not in available:
+                    raise ValueError(
+                        f"{stage.name} is declared before {resource} is provided"
+                    )
+            available.update(stage.provides)
+
+    def downstream(self, names: Iterable[Text]) -> List[Stage]:
+        """ the named stages, and every stage that (transitively) depends on them
+        """
+        dirty = set(names)
+        affected = []
+        for stage in self.stages:
+            if stage.name in dirty or any(
+                self.providers[r].name in dirty for r in stage.requires
+            ):
+                dirty.add(stage.name)
+                affected.append(stage)
+        return affected
+
+    def run(
+        self,
+        run_stage: Callable[[Stage], Any],
+        stages: Optional[Iterable[Stage]] = None,
+    ) -> None:
+        """ run some (default: all) stages, assuming the outputs of others exist
+        """
+        pending = list(self.stages if stages is None else stages)
+        pending_names = {stage.name for stage in pending}
+        available = {
+            resource
+            for stage in self.stages
+            if stage.name not in pending_names
+            for resource in stage.provides
+        }
+
+        def ready() -> List[Stage]:
+            return [s for s in pending if available.issuperset(s.requires)]
+
+        if self.jobs <= 1:
+            while pending:
+                stage = ready()[0]
+                pending.remove(stage)
+                self._run_one(run_stage, stage)
+                available.update(stage.provides)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            running: Dict[Future, Stage] = {}
+            while pending or running:
+                for stage in ready():
+                    pending.remove(stage)
+                    running[pool.submit(self._run_one, run_stage, stage)] = stage
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        for other in running:
+                            other.cancel()
+                        raise error
+                    available.update(stage.provides)
+
+    def _run_one(self, run_stage: Callable[[Stage], Any], stage: Stage) -> Any:
+        if self.log:
+            self.log.debug("[stage] %s", stage.name)
+        return run_stage(stage)
@@ -1,18 +1,136 @@
+import json
+import shutil
+import subprocess
 from pathlib import Path
+from typing import List, Text
 
 import pytest
 from click.testing import CliRunner
 from ruamel import yaml
 
+from ..lsp import constants
+
 HERE = Path(__file__).parent
 FIXTURES = HERE / "fixtures"
 LSP_FIXTURES = FIXTURES / "lsp"
+UPSTREAMS = FIXTURES / "upstreams"
 GOOD_LSP = {
     p.name: [*yaml.safe_load_all(p.read_text())]
     for p in sorted(LSP_FIXTURES.glob("*_good_*.yaml"))
 }
 
 
+def git(cwd: Path, *args: Text) -> Text:
+    return (
+        subprocess.check_output(["git", *args], cwd=cwd, stderr=subprocess.STDOUT)
+        .decode("utf-8")
+        .strip()
+    )
+
+
+def git_commit_all(repo: Path, message: Text) -> Text:
+    """ commit everything in a fixture repo, returning the short sha
+    """
+    if not (repo / ".git").exists():
+        git(repo, "init", "-q")
+        git(repo, "config", "user.email", "expectorate@example.com")
+        git(repo, "config", "user.name", "expectorate")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+    return git(repo, "rev-parse", "--short", "HEAD")
+
+
+def make_lsp_repo(root: Path, spec_md: Text) -> Path:
+    """ a stand-in language-server-protocol repo with 3.14 and 3.15 specs
+    """
+    repo = root / "language-server-protocol"
+    specs = repo / "_specifications"
+    specs.mkdir(parents=True, exist_ok=True)
+    (specs / "specification-3-14.md").write_text(spec_md)
+    (specs / "specification-3-15.md").write_text(
+        spec_md.replace("#### $ Notifications and Requests", "#### Server lifetime")
+    )
+    return repo
+
+
+def make_vlspn_repo(root: Path) -> Path:
+    """ a stand-in vscode-languageserver-node repo with fake node tools
+    """
+    repo = root / "vscode-languageserver-node"
+    src = repo / "protocol" / "src"
+    src.mkdir(parents=True, exist_ok=True)
+    for ts in sorted((UPSTREAMS / "protocol").glob("*.ts")):
+        shutil.copy2(ts, src / ts.name)
+
+    (repo / "package.json").write_text(
+        json.dumps(
+            {
+                "name": "vscode-languageserver-node",
+                "private": True,
+                "devDependencies": {
+                    constants.TSSG: constants.TSSG_VERSION,
+                    "prettier": constants.PRETTIER_VERSION,
+                },
+            },
+            indent=2,
+        )
+    )
+
+    node_modules = repo / "node_modules"
+    (node_modules / ".bin").mkdir(parents=True, exist_ok=True)
+    for package, fake in [
+        (constants.TSSG, "fake_tssg.js"),
+        ("prettier", "fake_prettier.js"),
+    ]:
+        pkg_dir = node_modules / package
+        pkg_dir.mkdir(exist_ok=True)
+        shutil.copy2(UPSTREAMS / fake, pkg_dir / "index.js")
+        (pkg_dir / "package.json").write_text(
+            json.dumps({"name": package, "version": "0.0.0-fake", "main": "index.js"})
+        )
+        (node_modules / ".bin" / package).write_text(
+            f"""require("../{package}").main(process.argv.slice(2));\n"""
+        )
+    return repo
+
+
+class FakeUpstreams:
+    """ local file:// repos and a log of fake node tool invocations
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.log_path = root / "fake-tools.log"
+        self.lsp_repo = make_lsp_repo(
+            root, (UPSTREAMS / "specification.md").read_text()
+        )
+        self.vlspn_repo = make_vlspn_repo(root)
+        self.lsp_committish = git_commit_all(self.lsp_repo, "initial spec")
+        self.vlspn_committish = git_commit_all(self.vlspn_repo, "initial protocol")
+
+    @property
+    def args(self) -> List[Text]:
+        return [
+            "--lsp-repo",
+            self.lsp_repo.as_uri(),
+            "--lsp-committish",
+            self.lsp_committish,
+            "--vlspn-repo",
+            self.vlspn_repo.as_uri(),
+            "--vlspn-committish",
+            self.vlspn_committish,
+        ]
+
+    def calls(self, tool: Text) -> List[Text]:
+        if not self.log_path.exists():
+            return []
+        return [
+            line
+            for line in self.log_path.read_text().splitlines()
+            if line.startswith(f"{tool} ")
+        ]
+
+
 @pytest.fixture
 def runner_with_args_and_paths(tmp_path: Path):
     """ wrap up some things used for click testing
@@ -20,5 +138,22 @@ def runner_with_args_and_paths(tmp_path: Path):
     runner = CliRunner()
     workdir = tmp_path / "work"
     output = tmp_path / "output"
-    args = ["--workdir", str(workdir), "--output", str(output)]
+    cache_dir = tmp_path / "cache"
+    args = [
+        "--workdir",
+        str(workdir),
+        "--output",
+        str(output),
+        "--cache-dir",
+        str(cache_dir),
+    ]
     return runner, args, workdir, output
+
+
+@pytest.fixture
+def fake_upstreams(tmp_path: Path, monkeypatch) -> FakeUpstreams:
+    """ offline upstream repos, with node tools that log their invocations
+    """
+    upstreams = FakeUpstreams(tmp_path / "upstreams")
+    monkeypatch.setenv("EXPECTORATE_FAKE_LOG", str(upstreams.log_path))
+    return upstreams
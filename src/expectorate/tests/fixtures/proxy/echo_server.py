@@ -0,0 +1,52 @@
+""" a dummy language server, which answers every request with canned results
+
+    unknown methods get their params echoed back as the result
+"""
+import json
+import sys
+
+RESULTS = {
+    "initialize": {"capabilities": {}, "serverInfo": {"name": "echo"}},
+    "shutdown": None,
+    "textDocument/hover": {"contents": "echo"},
+}
+
+
+def read_frame(stream):
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            if length is None:
+                continue
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    return json.loads(stream.read(length))
+
+
+def write_frame(stream, message):
+    body = json.dumps(message).encode("utf-8")
+    stream.write(b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+    stream.flush()
+
+
+def main():
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        message = read_frame(stdin)
+        if message is None or message.get("method") == "exit":
+            return 0
+        if "id" not in message or "method" not in message:
+            continue
+        method = message["method"]
+        result = RESULTS.get(method, message.get("params"))
+        write_frame(stdout, {"jsonrpc": "2.0", "id": message["id"], "result": result})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
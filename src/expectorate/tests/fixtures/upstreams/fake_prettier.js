@@ -0,0 +1,32 @@
+/**
+ * a stand-in for prettier: trims trailing whitespace and squashes blank lines
+ */
+const fs = require('fs');
+const path = require('path');
+
+function format(source, options) {
+  const logFile = process.env.EXPECTORATE_FAKE_LOG;
+  if (logFile) {
+    const file = path.basename(options.filepath);
+    fs.appendFileSync(logFile, `prettier ${file} pid=${process.pid}\n`);
+  }
+  return (
+    source
+      .replace(/[ \t]+$/gm, '')
+      .replace(/\n{3,}/g, '\n\n')
+      .trim() + '\n'
+  );
+}
+
+function main(args) {
+  for (const file of args.filter((arg) => !arg.startsWith('--'))) {
+    const source = fs.readFileSync(file, 'utf-8');
+    fs.writeFileSync(file, format(source, { filepath: file }));
+  }
+}
+
+module.exports = { format, main };
+
+if (require.main === module) {
+  main(process.argv.slice(2));
+}
@@ -0,0 +1,280 @@
+/**
+ * a stand-in for ts-json-schema-generator, good enough for the fixture protocol
+ *
+ * understands `export interface`, `export type`, unions, arrays, string
+ * literals, `extends` of other interfaces and the jsonrpc message types
+ * used by `protocol-schema.ts.j2`
+ *
+ * its jsonrpc bases and builtins follow `lsp/synthetic.py`, so comparing the
+ * two synthetic builders against it only checks how they are wired up
+ */
+const fs = require('fs');
+const path = require('path');
+
+const MESSAGE = {
+  jsonrpc: [{ type: 'string' }, true],
+};
+
+const BASES = {
+  RequestMessage: {
+    ...MESSAGE,
+    id: [{ type: ['number', 'string'] }, true],
+    method: [{ type: 'string' }, true],
+    params: [{}, false],
+  },
+  NotificationMessage: {
+    ...MESSAGE,
+    method: [{ type: 'string' }, true],
+    params: [{}, false],
+  },
+  ResponseMessage: {
+    ...MESSAGE,
+    id: [{ type: ['number', 'string', 'null'] }, true],
+    result: [{}, false],
+    error: [{ $ref: '#/definitions/ResponseErrorLiteral' }, false],
+  },
+};
+
+const BUILTIN_DEFINITIONS = {
+  ResponseErrorLiteral: {
+    type: 'object',
+    properties: {
+      code: { type: 'number' },
+      message: { type: 'string' },
+      data: {},
+    },
+    required: ['code', 'message'],
+    additionalProperties: false,
+  },
+};
+
+const PRIMITIVES = {
+  number: { type: 'number' },
+  integer: { type: 'integer' },
+  string: { type: 'string' },
+  boolean: { type: 'boolean' },
+  null: { type: 'null' },
+  void: { type: 'null' },
+  any: {},
+};
+
+function log(...args) {
+  const logFile = process.env.EXPECTORATE_FAKE_LOG;
+  if (logFile) {
+    fs.appendFileSync(logFile, `tssg ${args.join(' ')} pid=${process.pid}\n`);
+  }
+}
+
+function stripComments(src) {
+  return src.replace(/\/\*[\s\S]*?\*\//g, '').replace(/\/\/.*$/gm, '');
+}
+
+function tokenize(raw) {
+  const expr = raw.trim();
+  const tokens = [];
+  const re = /\s*('[^']*'|\[\]|[|()]|[\w.$]+(?:<[^>]*>)?)/y;
+  let match;
+  while (re.lastIndex < expr.length && (match = re.exec(expr))) {
+    tokens.push(match[1]);
+  }
+  return tokens;
+}
+
+function parseType(expr) {
+  const tokens = tokenize(expr);
+  let pos = 0;
+
+  function union() {
+    const options = [];
+    if (tokens[pos] === '|') {
+      pos++;
+    }
+    options.push(postfix());
+    while (tokens[pos] === '|') {
+      pos++;
+      options.push(postfix());
+    }
+    return options.length === 1 ? options[0] : { anyOf: options };
+  }
+
+  function postfix() {
+    let schema = primary();
+    while (tokens[pos] === '[]') {
+      pos++;
+      schema = { type: 'array', items: schema };
+    }
+    return schema;
+  }
+
+  function primary() {
+    const token = tokens[pos++];
+    if (token === '(') {
+      const inner = union();
+      pos++;
+      return inner;
+    }
+    if (token.startsWith("'")) {
+      return { type: 'string', enum: [token.slice(1, -1)] };
+    }
+    const name = token.replace(/<.*>$/, '').replace(/^proto\./, '');
+    if (PRIMITIVES[name]) {
+      return { ...PRIMITIVES[name] };
+    }
+    return { $ref: `#/definitions/${name}` };
+  }
+
+  return union();
+}
+
+function bodyOf(src, start) {
+  let depth = 0;
+  for (let i = start; i < src.length; i++) {
+    if (src[i] === '{') {
+      depth++;
+    } else if (src[i] === '}') {
+      depth--;
+      if (depth === 0) {
+        return src.slice(start + 1, i);
+      }
+    }
+  }
+  throw new Error('unbalanced braces');
+}
+
+function parseSources(sources) {
+  const interfaces = {};
+  const aliases = {};
+  for (const raw of sources) {
+    const src = stripComments(raw);
+    const ifaceRe = /export interface (\w+)(?:\s+extends\s+([^{]+))?\s*\{/g;
+    let match;
+    while ((match = ifaceRe.exec(src))) {
+      const props = {};
+      for (const member of bodyOf(src, ifaceRe.lastIndex - 1).split(';')) {
+        const prop = /^\s*(\w+)(\?)?\s*:\s*([\s\S]+?)\s*$/.exec(member);
+        if (prop) {
+          props[prop[1]] = [parseType(prop[3]), !prop[2]];
+        }
+      }
+      interfaces[match[1]] = { base: (match[2] || '').trim(), props };
+    }
+    const aliasRe = /export type (\w+)\s*=\s*([^;]+);/g;
+    while ((match = aliasRe.exec(src))) {
+      aliases[match[1]] = parseType(match[2]);
+    }
+  }
+  return { interfaces, aliases };
+}
+
+function baseProps(base, interfaces) {
+  if (!base) {
+    return {};
+  }
+  const omit = /^Omit<\s*(\w+)\s*,\s*'(\w+)'\s*>$/.exec(base);
+  if (omit) {
+    const props = { ...baseProps(omit[1], interfaces) };
+    delete props[omit[2]];
+    return props;
+  }
+  if (BASES[base]) {
+    return BASES[base];
+  }
+  if (interfaces[base]) {
+    const iface = interfaces[base];
+    return { ...baseProps(iface.base, interfaces), ...iface.props };
+  }
+  return {};
+}
+
+function buildDefinitions(sources) {
+  const { interfaces, aliases } = parseSources(sources);
+  const definitions = { ...BUILTIN_DEFINITIONS };
+  for (const [name, iface] of Object.entries(interfaces)) {
+    const props = { ...baseProps(iface.base, interfaces), ...iface.props };
+    const properties = {};
+    const required = [];
+    for (const [prop, [schema, isRequired]] of Object.entries(props)) {
+      properties[prop] = schema;
+      if (isRequired) {
+        required.push(prop);
+      }
+    }
+    definitions[name] = {
+      type: 'object',
+      properties,
+      additionalProperties: false,
+    };
+    if (required.length) {
+      definitions[name].required = required;
+    }
+  }
+  for (const [name, schema] of Object.entries(aliases)) {
+    definitions[name] = schema;
+  }
+  return definitions;
+}
+
+function reachable(definitions, root) {
+  const found = {};
+  const queue = [root];
+  while (queue.length) {
+    const name = queue.pop();
+    if (found[name] || !definitions[name]) {
+      continue;
+    }
+    found[name] = definitions[name];
+    const refs = JSON.stringify(found[name]).match(/#\/definitions\/\w+/g) || [];
+    queue.push(...refs.map((ref) => ref.split('/').pop()));
+  }
+  return found;
+}
+
+function readSources(tsPath, seen = {}) {
+  if (seen[tsPath]) {
+    return [];
+  }
+  seen[tsPath] = true;
+  const src = fs.readFileSync(tsPath, 'utf-8');
+  const sources = [src];
+  const importRe = /from '(\.[^']+)'/g;
+  let match;
+  while ((match = importRe.exec(src))) {
+    const imported = path.resolve(path.dirname(tsPath), `${match[1]}.ts`);
+    sources.push(...readSources(imported, seen));
+  }
+  return sources;
+}
+
+function createSchema(tsPath, type) {
+  log(path.basename(tsPath), type || '*');
+  const sources = readSources(tsPath);
+  let definitions = buildDefinitions(sources);
+  const schema = { $schema: 'http://json-schema.org/draft-07/schema#' };
+  if (type) {
+    definitions = reachable(definitions, type);
+    schema.$ref = `#/definitions/${type}`;
+  }
+  schema.definitions = definitions;
+  return schema;
+}
+
+function createGenerator(config) {
+  return {
+    createSchema: (type) => createSchema(path.resolve(config.path), type),
+  };
+}
+
+function main(args) {
+  const opt = (flag) => {
+    const i = args.indexOf(flag);
+    return i === -1 ? null : args[i + 1];
+  };
+  const schema = createSchema(path.resolve(opt('--path')), opt('--type'));
+  process.stdout.write(JSON.stringify(schema, null, 2));
+}
+
+module.exports = { createGenerator, createSchema, main };
+
+if (require.main === module) {
+  main(process.argv.slice(2));
+}
@@ -0,0 +1,82 @@
+/**
+ * A reduced copy of the protocol used for offline tests.
+ */
+
+export interface Position {
+    line: number;
+    character: number;
+}
+
+export interface Range {
+    start: Position;
+    end: Position;
+}
+
+export interface Location {
+    uri: string;
+    range: Range;
+}
+
+export interface TextDocumentIdentifier {
+    uri: string;
+}
+
+export interface TextDocumentItem {
+    uri: string;
+    languageId: string;
+    version: number;
+    text: string;
+}
+
+export interface TextDocumentPositionParams {
+    textDocument: TextDocumentIdentifier;
+    position: Position;
+}
+
+export interface ClientCapabilities {
+    experimental?: any;
+}
+
+export interface ServerCapabilities {
+    hoverProvider?: boolean;
+    definitionProvider?: boolean;
+    experimental?: any;
+}
+
+export interface WorkspaceFolder {
+    uri: string;
+    name: string;
+}
+
+export interface InitializeParams {
+    processId: number | null;
+    rootUri: string | null;
+    capabilities: ClientCapabilities;
+    workspaceFolders?: WorkspaceFolder[] | null;
+}
+
+export interface ServerInfo {
+    name: string;
+    version?: string;
+}
+
+export interface InitializeResult {
+    capabilities: ServerCapabilities;
+    serverInfo?: ServerInfo;
+}
+
+export interface InitializedParams {}
+
+export interface DidOpenTextDocumentParams {
+    textDocument: TextDocumentItem;
+}
+
+export interface MarkupContent {
+    kind: 'plaintext' | 'markdown';
+    value: string;
+}
+
+export interface Hover {
+    contents: MarkupContent | string;
+    range?: Range;
+}
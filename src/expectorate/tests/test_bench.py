@@ -0,0 +1,248 @@
+""" offline benchmarks of the python hot paths, at several spec sizes
+
+    timings are compared to `fixtures/bench/baselines.json`, scaled by how fast
+    this machine runs a fixed calibration loop. These are marked `bench`, and
+    only run when asked for, with `pytest -m bench`: the default suite only
+    checks that each benchmark still runs. Set `EXPECTORATE_BENCH_UPDATE=1` to
+    record new baselines.
+"""
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Text
+
+import pytest
+
+from ..lsp.conventions import CONVENTIONS
+from ..lsp.generate import SpecGenerator
+from ..lsp.pyclasses import compile_classes
+from ..lsp.pycompile import compile_schema, load_validators
+from ..lsp.sections import SectionIndex
+from ..validate import SchemaRegistry
+from .conftest import FIXTURES, GOOD_LSP, UPSTREAMS
+
+BENCH = FIXTURES / "bench"
+BASELINES = BENCH / "baselines.json"
+
+SCALES = [1, 10, 100]
+REPEAT = 3
+
+TOLERANCE = float(os.environ.get("EXPECTORATE_BENCH_TOLERANCE", 3))
+UPDATE = bool(os.environ.get("EXPECTORATE_BENCH_UPDATE"))
+
+# timings below this are mostly noise
+MIN_SECONDS = 0.005
+
+Bench = Callable[[int, Path], Dict[Text, float]]
+
+MUNGING = [
+    "extract_spec_features",
+    "init_features",
+    "annotate_results",
+    "check_results",
+    "annotate_method_titles",
+    "annotate_result_titles",
+    "annotate_params",
+    "annotate_result_schema",
+    "hash_features",
+]
+
+
+def synthetic_spec(scale: int) -> Text:
+    """ the fixture spec, with its features repeated under new method names
+    """
+    spec = (UPSTREAMS / "specification.md").read_text()
+    convention = CONVENTIONS["3.14"]
+    head, separator, rest = spec.partition(convention.feature_separator)
+    features, epilogue, tail = rest.partition(convention.epilogue_separator)
+    features = separator + features
+    copies = [features] + [
+        re.sub(r"method: '([^']+)'", rf"method: '\g<1>{i}'", features)
+        for i in range(1, scale)
+    ]
+    return head + "".join(copies) + epilogue + tail
+
+
+def calibrate() -> float:
+    """ a fixed amount of pure python work, to compare machines (and tracers)
+    """
+    return best_of(lambda: sorted(str(i) for i in range(200_000)))
+
+
+def best_of(fn: Callable[[], Any], repeat: int = REPEAT) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@pytest.fixture(scope="module")
+def baselines() -> Iterator[Dict[Text, Any]]:
+    stored = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    current: Dict[Text, Any] = {"calibration": calibrate(), "timings": {}}
+    yield {"stored": stored, "current": current}
+    if UPDATE:
+        current["calibration"] = round(current["calibration"], 6)
+        current["timings"] = {k: round(v, 6) for k, v in current["timings"].items()}
+        BASELINES.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+
+
+def check_timings(baselines: Dict[Text, Any], timings: Dict[Text, float]) -> None:
+    """ fail if any timing is much slower than its (machine-adjusted) baseline
+    """
+    baselines["current"]["timings"].update(timings)
+    if UPDATE:
+        return
+    stored = baselines["stored"]
+    speed = baselines["current"]["calibration"] / stored["calibration"]
+    slow: List[Text] = []
+    for key, seconds in sorted(timings.items()):
+        baseline = stored["timings"].get(key)
+        assert baseline is not None, f"no baseline for {key}: record some"
+        limit = max(baseline * speed * TOLERANCE, MIN_SECONDS)
+        if seconds > limit:
+            slow += [f"{key}: {seconds:.4f}s > {limit:.4f}s"]
+    assert not slow, slow
+
+
+def bench_munging(scale: int, tmp_path: Path) -> Dict[Text, float]:
+    """ the in-process stages, from markdown to annotated features
+    """
+    spec = tmp_path / "specification.md"
+    spec.write_text(synthetic_spec(scale))
+    naive = json.loads((BENCH / "naive.schema.json").read_text())
+    timings: Dict[Text, float] = {}
+
+    for _ in range(REPEAT):
+        gen = SpecGenerator(
+            workdir=tmp_path,
+            output=tmp_path,
+            log=logging.getLogger(__name__),
+            naive_schema=naive,
+            use_cache=False,
+        )
+        with SectionIndex.open(spec) as gen.spec_index:
+            for stage in MUNGING:
+                seconds = best_of(getattr(gen, stage), repeat=1)
+                key = f"{stage}@{scale}"
+                timings[key] = min(timings.get(key, seconds), seconds)
+        assert gen.features is not None
+        assert len(gen.features) == 7 * scale
+
+    return timings
+
+
+def bench_validation(scale: int, tmp_path: Path) -> Dict[Text, float]:
+    """ checking the schema, and validating many messages against it
+    """
+    schema = json.loads((BENCH / "synthetic.schema.json").read_text())
+    messages = [data for header, data in GOOD_LSP.values()] * (10 * scale)
+
+    def validate_messages():
+        registry = SchemaRegistry(schema)
+        assert all(registry.is_valid(message) for message in messages)
+
+    gen = SpecGenerator(workdir=Path(), output=Path(), log=logging.getLogger(__name__))
+    gen.synthetic_schema = schema
+
+    timings = {f"validate_messages@{scale}": best_of(validate_messages)}
+    if scale == 1:
+        timings["validate_synthetic_schema"] = best_of(gen.validate_synthetic_schema)
+    return timings
+
+
+def bench_registry(scale: int, tmp_path: Path) -> Dict[Text, float]:
+    """ building a validator for every definition of the schema
+    """
+    schema = json.loads((BENCH / "synthetic.schema.json").read_text())
+
+    def build_validators():
+        registry = SchemaRegistry(schema)
+        assert len([registry.validator(name) for name in registry]) == len(registry)
+
+    return {"build_validators": best_of(build_validators)}
+
+
+def bench_compiled(scale: int, tmp_path: Path) -> Dict[Text, float]:
+    """ validating many messages with validators compiled from the schema
+    """
+    schema = json.loads((BENCH / "synthetic.schema.json").read_text())
+    path = tmp_path / "lsp.3.14.validators.py"
+    path.write_text(compile_schema(schema))
+    module = load_validators(path)
+    messages = [data for header, data in GOOD_LSP.values()] * (10 * scale)
+
+    def compiled_messages():
+        assert all(module.is_valid(message) for message in messages)
+
+    return {f"compiled_messages@{scale}": best_of(compiled_messages)}
+
+
+def bench_classes(scale: int, tmp_path: Path) -> Dict[Text, float]:
+    """ decoding many messages into message classes
+    """
+    schema = json.loads((BENCH / "synthetic.schema.json").read_text())
+    path = tmp_path / "lsp.3.14.messages.py"
+    path.write_text(compile_classes(schema))
+    module = load_validators(path)
+    messages = [json.dumps(data) for header, data in GOOD_LSP.values()]
+    messages *= 10 * scale
+
+    def decode_messages():
+        assert all(module.from_json(json.loads(message)) for message in messages)
+
+    return {f"decode_messages@{scale}": best_of(decode_messages)}
+
+
+def bench_numeric(scale: int, tmp_path: Path) -> Dict[Text, float]:
+    """ validating a big array of numbers, like semantic tokens
+    """
+    items = {"type": "integer", "minimum": 0}
+    schema = {"definitions": {"Tokens": {"type": "array", "items": items}}}
+    path = tmp_path / "tokens.py"
+    path.write_text(compile_schema(schema))
+    module = load_validators(path)
+    registry = SchemaRegistry(schema)
+    tokens = [i % 1000 for i in range(100_000)]
+
+    def numeric_registry():
+        assert registry.is_valid(tokens, "Tokens")
+
+    def numeric_compiled():
+        assert module.is_valid(tokens, "Tokens")
+
+    return {
+        "numeric_registry": best_of(numeric_registry),
+        "numeric_compiled": best_of(numeric_compiled),
+    }
+
+
+# benchmarks which are only run once, whatever the scales
+UNSCALED = [bench_registry, bench_numeric]
+SCALED = [bench_munging, bench_validation, bench_compiled, bench_classes]
+
+CASES = [
+    pytest.param(bench, scale, id=f"{bench.__name__[6:]}@{scale}")
+    for bench in SCALED
+    for scale in SCALES
+] + [pytest.param(bench, 1, id=bench.__name__[6:]) for bench in UNSCALED]
+
+
+@pytest.mark.bench
+@pytest.mark.parametrize("bench,scale", CASES)
+def test_bench(bench: Bench, scale: int, tmp_path: Path, baselines):
+    """ each benchmark is no slower than its baseline
+    """
+    check_timings(baselines, bench(scale, tmp_path))
+
+
+@pytest.mark.parametrize("bench", [*SCALED, *UNSCALED])
+def test_bench_smoke(bench: Bench, tmp_path: Path):
+    """ each benchmark still runs, at the smallest scale, without being timed
+    """
+    assert bench(1, tmp_path)
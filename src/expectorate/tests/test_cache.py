@@ -0,0 +1,83 @@
+import logging
+from pathlib import Path
+
+from ..cache import StageCache, hash_inputs
+from ..lsp.generate import SpecGenerator
+
+
+def test_hash_inputs(tmp_path: Path):
+    """ keys depend on the content, not the location, of files
+    """
+    a = tmp_path / "a" / "protocol.ts"
+    b = tmp_path / "b" / "protocol.ts"
+    for path in [a, b]:
+        path.parent.mkdir()
+        path.write_text("export interface Foo {}")
+
+    assert hash_inputs("x", a) == hash_inputs("x", b)
+    assert hash_inputs("x", a) != hash_inputs("y", a)
+    assert hash_inputs({"a": 1, "b": 2}) == hash_inputs({"b": 2, "a": 1})
+    assert hash_inputs(["ab", "c"]) != hash_inputs(["a", "bc"])
+
+    b.write_text("export interface Bar {}")
+    assert hash_inputs("x", a) != hash_inputs("x", b)
+
+
+def test_stage_cache(tmp_path: Path):
+    """ artifacts round-trip through the cache
+    """
+    cache = StageCache(tmp_path / "cache")
+    src = tmp_path / "schema.json"
+    src.write_text("{}")
+    dest = tmp_path / "out" / "schema.json"
+    key = hash_inputs("naive", src)
+
+    assert not cache.fetch("naive", key, dest)
+    cache.store("naive", key, src)
+    assert cache.fetch("naive", key, dest)
+    assert dest.read_text() == "{}"
+
+
+def test_generator_inputs(tmp_path: Path):
+    """ config and imported packages, not just protocol sources, are inputs
+    """
+    vlspn = tmp_path / "vscode-languageserver-node"
+    for path in [
+        "protocol/src/protocol.ts",
+        "protocol/src/protocol-schema.ts",
+        "protocol/tsconfig.json",
+        "jsonrpc/src/main.ts",
+        "types/src/main.ts",
+        "node_modules/vscode-jsonrpc/package.json",
+        ".prettierrc",
+        ".editorconfig",
+    ]:
+        (vlspn / path).parent.mkdir(parents=True, exist_ok=True)
+        (vlspn / path).write_text("{}")
+    gen = SpecGenerator(
+        workdir=tmp_path, output=tmp_path, log=logging.getLogger(__name__)
+    )
+    gen.vlspn_dir = vlspn
+
+    sources = {str(p.relative_to(vlspn)) for p in gen.protocol_sources}
+    assert sources == {
+        "protocol/src/protocol.ts",
+        "protocol/tsconfig.json",
+        "jsonrpc/src/main.ts",
+        "types/src/main.ts",
+        "node_modules/vscode-jsonrpc/package.json",
+    }
+    assert gen.prettier_configs == [vlspn / ".editorconfig", vlspn / ".prettierrc"]
+
+    assert {str(p.relative_to(vlspn)) for p in gen.jsonrpc_sources} == {
+        "jsonrpc/src/main.ts",
+        "node_modules/vscode-jsonrpc/package.json",
+    }
+
+    # per-feature definitions aren't reused once the messages they extend
+    # change, but changes to protocol types are left to each feature's hash
+    key = gen.feature_state_key
+    (vlspn / "protocol/src/protocol.ts").write_text("export interface Range {}")
+    assert gen.feature_state_key == key
+    (vlspn / "jsonrpc/src/main.ts").write_text("export interface Message {}")
+    assert gen.feature_state_key != key
@@ -1,13 +1,18 @@
 import json
-from copy import deepcopy
+import logging
 from pathlib import Path
 from typing import Any, List
 
 import pytest
-from jsonschema import Draft7Validator, ValidationError
+from jsonschema import ValidationError
 
 from ..cli import cli
-from .conftest import GOOD_LSP
+from ..lsp import constants
+from ..lsp.generate import SpecGenerator
+from ..lsp.matrix import MatrixTarget
+from ..lsp.pycompile import load_validators
+from ..validate import SchemaRegistry
+from .conftest import GOOD_LSP, git_commit_all
 
 
 def assert_generated(workdir: Path, output: Path, version="3.14") -> Path:
@@ -21,30 +26,41 @@ def assert_generated(workdir: Path, output: Path, version="3.14") -> Path:
 
 
 def assert_fixtures(schema: Path):
-    schema_dict = json.loads(schema.read_text())
-    all_validators = {"_AnyFeature": Draft7Validator(schema_dict)}
+    registry = SchemaRegistry.from_path(schema)
 
     errors: List[Any] = []
 
     for path, header_data in GOOD_LSP.items():
         header, data = header_data
 
-        feature = header["feature"]
-
-        if feature not in all_validators:
-            feature_schema = deepcopy(schema_dict)
-            feature_schema["$ref"] = f"#/definitions/{feature}"
-            all_validators[feature] = Draft7Validator(feature_schema)
-
-        for validate_feature in ["_AnyFeature", feature]:
+        for validate_feature in ["_AnyFeature", header["feature"]]:
             try:
-                all_validators[validate_feature].validate(data)
+                registry.validate(data, validate_feature)
             except ValidationError as err:  # pragma: no cover
                 errors += [path, validate_feature, err]
 
     assert not errors
 
 
+def assert_compiled(output: Path, version="3.14"):
+    """ the compiled validators and classes agree with the schema on the fixtures
+    """
+    validators = load_validators(output / f"lsp.{version}.validators.py")
+    for path, (header, data) in GOOD_LSP.items():
+        for validate_feature in ["_AnyFeature", header["feature"]]:
+            validators.validate(data, validate_feature)
+    assert validators.METHODS["initialized"]["notification"].__name__ == (
+        "validate__InitializedNotification"
+    )
+    classes = load_validators(output / f"lsp.{version}.messages.py")
+    for path, (header, data) in GOOD_LSP.items():
+        message = classes.from_json(data, header["feature"])
+        assert classes.to_json(message) == data
+    assert classes.METHODS["initialized"]["notification"] == (
+        classes._InitializedNotification.from_json
+    )
+
+
 def test_lsp_cli_default(runner_with_args_and_paths):
     """ happy day, using pre-validated commits from `constants.py`
     """
@@ -78,3 +94,275 @@ def test_lsp_cli_args(label, extra_args, runner_with_args_and_paths):
     schema = assert_generated(workdir, output, spec_version)
 
     assert_fixtures(schema)
+
+
+@pytest.mark.node
+@pytest.mark.parametrize(
+    "label,extra_args", [("3.14", []), ("3.15", excursions["3.15"])]
+)
+def test_lsp_cli_check_synthetic(label, extra_args, runner_with_args_and_paths, caplog):
+    """ the python builder agrees with a real TSSG, on real upstreams
+    """
+    caplog.set_level(logging.INFO)
+    runner, args, workdir, output = runner_with_args_and_paths
+    builders = ["--synthetic-builder", "python", "--check-synthetic"]
+    final_args = [*args, "lsp", *extra_args, *builders]
+    result = runner.invoke(cli, final_args, catch_exceptions=False)
+    assert result.exit_code == 0, result.__dict__
+    assert "python and typescript built the same" in caplog.text
+
+
+@pytest.mark.parametrize("node_worker", ["--node-worker", "--no-node-worker"])
+def test_lsp_cli_offline(
+    runner_with_args_and_paths, fake_upstreams, node_worker, caplog
+):
+    """ the whole pipeline, against local repos and fake node tools
+    """
+    caplog.set_level(logging.INFO)
+    runner, args, workdir, output = runner_with_args_and_paths
+    final_args = [*args, "lsp", *fake_upstreams.args, node_worker, "--check-synthetic"]
+    result = runner.invoke(cli, final_args, catch_exceptions=False)
+    assert result.exit_code == 0, result.__dict__
+    assert_fixtures(assert_generated(workdir, output))
+    assert_compiled(output)
+    # the typescript builder is the default, but both were built and compared
+    assert "python and typescript built the same" in caplog.text
+
+    calls = fake_upstreams.calls("tssg") + fake_upstreams.calls("prettier")
+    pids = {call.split("pid=")[1] for call in calls}
+    assert len(calls) == 3
+    assert len(pids) == (1 if node_worker == "--node-worker" else 3)
+
+
+def test_lsp_cli_cached(runner_with_args_and_paths, fake_upstreams):
+    """ unchanged stages are loaded from the cache, rather than rebuilt
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    final_args = [*args, "lsp", *fake_upstreams.args]
+
+    for i in range(2):
+        result = runner.invoke(cli, final_args, catch_exceptions=False)
+        assert result.exit_code == 0, result.__dict__
+        assert len(fake_upstreams.calls("tssg")) == 2, i
+        assert len(fake_upstreams.calls("prettier")) == 1, i
+
+    # the compiled modules are keyed on the final schema, and their compiler
+    stages = workdir.parent / "cache" / "stages"
+    for stage in ["validators", "classes"]:
+        assert len(list((stages / stage).glob("*.py"))) == 1, stage
+
+    schema = assert_generated(workdir, output)
+    schema.unlink()
+    result = runner.invoke(cli, [*final_args, "--no-cache"], catch_exceptions=False)
+    assert result.exit_code == 0, result.__dict__
+    assert len(fake_upstreams.calls("tssg")) == 4
+    assert_fixtures(schema)
+
+
+def test_lsp_cli_jobs(runner_with_args_and_paths, fake_upstreams):
+    """ independent stages can run concurrently
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    final_args = [*args, "lsp", *fake_upstreams.args, "--jobs", "4"]
+    result = runner.invoke(cli, final_args, catch_exceptions=False)
+    assert result.exit_code == 0, result.__dict__
+    assert_fixtures(assert_generated(workdir, output))
+
+
+def test_lsp_cli_slice(runner_with_args_and_paths, fake_upstreams):
+    """ each message definition gets a minimal schema, listed in a manifest
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    final_args = [*args, "lsp", *fake_upstreams.args, "--slice"]
+    result = runner.invoke(cli, final_args, catch_exceptions=False)
+    assert result.exit_code == 0, result.__dict__
+    full = SchemaRegistry.from_path(assert_generated(workdir, output))
+
+    methods = output / "lsp.3.14.methods"
+    manifest = json.loads((methods / "manifest.json").read_text())
+    assert manifest["methods"]["initialized"]["notification"] == (
+        "_InitializedNotification.schema.json"
+    )
+    assert manifest["methods"]["shutdown"]["error"] == "_ErrorResponse.schema.json"
+
+    for filename, info in manifest["files"].items():
+        sliced = SchemaRegistry.from_path(methods / filename)
+        assert info["definition"] in sliced
+        assert len(sliced) == info["definitions"] < len(full)
+
+    message = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}
+    sliced = SchemaRegistry.from_path(methods / "_InitializeRequest.schema.json")
+    for registry in [full, sliced]:
+        assert not registry.is_valid(message, "_InitializeRequest")
+        message["params"] = {"processId": None, "rootUri": None, "capabilities": {}}
+        assert registry.is_valid(message, "_InitializeRequest")
+        del message["params"]
+
+
+def test_lsp_cli_dedupe(runner_with_args_and_paths, fake_upstreams):
+    """ identical definitions are merged, once nothing needs them apart
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    final_args = [*args, "lsp", *fake_upstreams.args, "--dedupe", "--slice"]
+    result = runner.invoke(cli, final_args, catch_exceptions=False)
+    assert result.exit_code == 0, result.__dict__
+    assert_fixtures(assert_generated(workdir, output))
+    assert_compiled(output)
+
+    mapping = json.loads((output / "lsp.3.14.dedupe.json").read_text())
+    assert mapping["synthetic"]["file"] == "lsp.3.14.synthetic.schema.json"
+    assert set(mapping["naive"]) == {"file", "definitions", "merged", "shared"}
+    before, after = mapping["synthetic"]["definitions"]
+    assert after == before + len(mapping["synthetic"]["shared"])
+
+
+def test_lsp_matrix_target():
+    """ targets name a spec version, and optionally committishes
+    """
+    target = MatrixTarget.parse("3.15::some/branch")
+    assert target.lsp_committish == constants.LSP_COMMIT
+    assert target.vlspn_committish == "some/branch"
+    assert target.label == f"3.15_{constants.LSP_COMMIT}_some-branch"
+    for bad in ["2.0", "3.14:a:b:c"]:
+        with pytest.raises(ValueError):
+            MatrixTarget.parse(bad)
+
+
+def test_lsp_cli_matrix(runner_with_args_and_paths, fake_upstreams):
+    """ targets run in parallel, without writing to the shared checkouts
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    up = dict(zip(fake_upstreams.args[::2], fake_upstreams.args[1::2]))
+    commits = f"""{up["--lsp-committish"]}:{up["--vlspn-committish"]}"""
+    final_args = [
+        *args,
+        "lsp-matrix",
+        "--lsp-repo",
+        up["--lsp-repo"],
+        "--vlspn-repo",
+        up["--vlspn-repo"],
+        "--jobs",
+        "2",
+    ]
+    for version in ["3.14", "3.15"]:
+        final_args += ["--target", f"{version}:{commits}"]
+    result = runner.invoke(cli, final_args, catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+
+    summary = json.loads((output / "matrix.json").read_text())
+    assert [t["version"] for t in summary["targets"]] == ["3.14", "3.15"]
+    for target in summary["targets"]:
+        assert_fixtures(
+            output
+            / target["label"]
+            / f"""lsp.{target["version"]}.synthetic.schema.json"""
+        )
+    assert not list(workdir.glob("vscode-languageserver-node/*/**/protocol-schema.ts"))
+    assert len(list(workdir.glob("scratch/*/protocol/src/protocol-schema.ts"))) == 2
+
+
+def test_lsp_cli_incremental(runner_with_args_and_paths, fake_upstreams, tmp_path):
+    """ only features whose section changed are regenerated, and merged
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    lsp_args = [*args, "lsp", *fake_upstreams.args]
+
+    def run(*extra_args: str) -> Any:
+        result = runner.invoke(cli, [*lsp_args, *extra_args], catch_exceptions=False)
+        assert result.exit_code == 0, result.__dict__
+        return json.loads((output / "lsp.3.14.changes.json").read_text())
+
+    changes = run()
+    assert len(changes["added"]) == len(changes["regenerated"]) == 7
+
+    spec = fake_upstreams.lsp_repo / "_specifications" / "specification-3-14.md"
+    spec.write_text(spec.read_text().replace("`Hover` \\| `null`", "`Hover`"))
+    committish = git_commit_all(fake_upstreams.lsp_repo, "hover can't be null")
+    lsp_args[lsp_args.index(fake_upstreams.lsp_committish)] = committish
+
+    changes = run()
+    assert changes["changed"] == changes["regenerated"] == ["textDocument/hover"]
+    assert len(changes["unchanged"]) == 6
+    assert len(fake_upstreams.calls("tssg")) == 3
+    assert "tssg protocol-schema.ts _AnyFeature" in fake_upstreams.calls("tssg")[-1]
+
+    schema = assert_generated(workdir, output)
+    assert_fixtures(schema)
+    merged = json.loads(schema.read_text())
+    hover = merged["definitions"]["_TextDocumentHoverResponse"]
+    assert hover["properties"]["result"] == {"$ref": "#/definitions/Hover"}
+
+    # the same as starting from scratch
+    full_output = tmp_path / "full-output"
+    lsp_args[lsp_args.index(str(output))] = str(full_output)
+    result = runner.invoke(cli, [*lsp_args, "--no-incremental"])
+    assert result.exit_code == 0, result.__dict__
+    full = json.loads((full_output / schema.name).read_text())
+    assert merged == full
+
+    lsp_args[lsp_args.index(str(full_output))] = str(output)
+    changes = run()
+    assert changes["regenerated"] == [] and len(changes["unchanged"]) == 7
+    assert json.loads(schema.read_text()) == full
+
+    # a protocol change only regenerates the features using the changed type
+    protocol = fake_upstreams.vlspn_repo / "protocol" / "src" / "protocol.ts"
+    protocol.write_text(
+        protocol.read_text().replace("'plaintext' | 'markdown'", "'plaintext'")
+    )
+    committish = git_commit_all(fake_upstreams.vlspn_repo, "plain text hovers")
+    lsp_args[lsp_args.index(fake_upstreams.vlspn_committish)] = committish
+    changes = run()
+    assert changes["changed"] == changes["regenerated"] == ["textDocument/hover"]
+    assert len(changes["unchanged"]) == 6
+
+
+def test_lsp_cli_profile(runner_with_args_and_paths, fake_upstreams):
+    """ every stage, and the subprocesses and node calls inside it, are profiled
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    final_args = [*args, "--profile", "lsp", *fake_upstreams.args]
+    result = runner.invoke(cli, final_args, catch_exceptions=False)
+    assert result.exit_code == 0, result.__dict__
+
+    report = json.loads((output / "profile.json").read_text())
+    stacks = {span["stack"] for span in report["spans"]}
+    assert "lsp;ensure_lsp_repo;git clone" in stacks
+    assert "lsp;build_naive_schema;node tssg" in stacks
+    assert report["totals"]["stage"]["count"] == len(SpecGenerator.STAGES)
+    assert report["peak_memory"] > 0
+
+    folded = (output / "profile.folded").read_text().splitlines()
+    assert "lsp;build_synthetic_schema" in [line.rsplit(" ", 1)[0] for line in folded]
+
+
+def test_lsp_cli_synthetic_builders(runner_with_args_and_paths, fake_upstreams):
+    """ the python builder agrees with the fake TSSG, without prettier or a
+        second compile
+
+        the fake TSSG follows the python builder, so this only checks how they
+        are wired up: `test_lsp_cli_check_synthetic` compares with a real TSSG
+    """
+    runner, args, workdir, output = runner_with_args_and_paths
+    lsp_args = [*args, "lsp", *fake_upstreams.args, "--no-incremental"]
+
+    schemas = {}
+    for builder in ["typescript", "python"]:
+        builder_args = [*lsp_args, "--synthetic-builder", builder]
+        result = runner.invoke(cli, builder_args, catch_exceptions=False)
+        assert result.exit_code == 0, result.__dict__
+        schemas[builder] = json.loads(assert_generated(workdir, output).read_text())
+    assert schemas["python"] == schemas["typescript"]
+    assert len(fake_upstreams.calls("prettier")) == 1
+    assert len(fake_upstreams.calls("tssg")) == 2
+
+    gen = SpecGenerator(workdir=workdir, output=output, log=logging.getLogger())
+    python = schemas["python"]
+    typescript = json.loads(json.dumps(python))
+    gen.compare_synthetic_schemas(python, typescript)
+    # TSSG copies JSDoc comments, which don't change what is valid
+    typescript["definitions"]["_ShutdownResponse"]["description"] = "shut down"
+    gen.compare_synthetic_schemas(python, typescript)
+    del typescript["definitions"]["_ShutdownResponse"]["required"]
+    with pytest.raises(ValueError, match="_ShutdownResponse"):
+        gen.compare_synthetic_schemas(python, typescript)
@@ -0,0 +1,192 @@
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Text
+
+import pytest
+from click.testing import CliRunner
+
+from ..cli import cli
+from ..validate import SchemaRegistry
+from ..validate.bulk import check_chunk, validate_frames
+from ..validate.dispatch import MessageDispatcher
+from ..validate.framing import FramingError, frame, iter_frames
+
+SCHEMA: Dict[Text, Any] = {
+    "definitions": {
+        "_InitializeRequest": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "number"},
+                "method": {"const": "initialize"},
+                "params": {
+                    "type": "object",
+                    "properties": {"processId": {"type": ["number", "null"]}},
+                    "required": ["processId"],
+                },
+            },
+            "required": ["id", "method", "params"],
+        },
+        "_InitializeResponse": {
+            "type": "object",
+            "properties": {"id": {"type": "number"}, "result": {"type": "object"}},
+            "required": ["id", "result"],
+        },
+        "_InitializedRequest": {
+            "type": "object",
+            "properties": {"method": {"const": "initialized"}},
+            "required": ["method"],
+        },
+        "_ErrorResponse": {
+            "type": "object",
+            "properties": {"error": {"type": "object"}},
+            "required": ["error"],
+        },
+    }
+}
+
+MESSAGES: List[Any] = [
+    {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {"processId": 1}},
+    {"jsonrpc": "2.0", "id": 1, "result": {}},
+    {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+    {"jsonrpc": "2.0", "id": 2, "method": "initialize", "params": {"processId": "1"}},
+    {"jsonrpc": "2.0", "id": 2, "error": {"code": -32600, "message": "no"}},
+    {"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": 3}},
+    {"jsonrpc": "2.0", "id": 3, "result": None},
+]
+
+
+@pytest.fixture
+def schema_path(tmp_path: Path) -> Path:
+    path = tmp_path / "output" / "lsp.3.14.synthetic.schema.json"
+    path.parent.mkdir()
+    path.write_text(json.dumps(SCHEMA))
+    return path
+
+
+def as_jsonl(messages: List[Any]) -> bytes:
+    return b"".join(json.dumps(m).encode("utf-8") + b"\n" for m in messages)
+
+
+def as_frames(messages: List[Any]) -> bytes:
+    return b"".join(frame(m) for m in messages)
+
+
+@pytest.mark.parametrize("encode", [as_jsonl, as_frames])
+def test_framing_round_trip(encode):
+    data = encode(MESSAGES)
+    frames = list(iter_frames(io.BytesIO(b"\n" + data)))
+    assert [json.loads(body) for _, body in frames] == MESSAGES
+    for offset, body in frames:
+        assert data[offset - 1 :].find(body) >= 0
+
+
+def test_framing_truncated():
+    with pytest.raises(FramingError):
+        list(iter_frames(io.BytesIO(as_frames(MESSAGES)[:-3])))
+
+
+@pytest.mark.parametrize("length", [b"abc", b"", b"-1", b"1e3"])
+def test_framing_bad_length(length: bytes):
+    """ a broken header is a framing error, saying which message it broke
+    """
+    first = frame(MESSAGES[0])
+    data = first + b"Content-Length: " + length + b"\r\n\r\n{}"
+    with pytest.raises(FramingError, match=f"at byte {len(first)}") as info:
+        list(iter_frames(io.BytesIO(data)))
+    assert info.value.offset == len(first)
+
+
+def test_dispatch():
+    dispatcher = MessageDispatcher(SCHEMA["definitions"])
+    assert [dispatcher.dispatch(m) for m in MESSAGES] == [
+        ("_InitializeRequest", "initialize"),
+        ("_InitializeResponse", "initialize"),
+        ("_InitializedRequest", "initialized"),
+        ("_InitializeRequest", "initialize"),
+        ("_ErrorResponse", "initialize"),
+        (None, "unknown method $/cancelRequest"),
+        (None, "unmatched response"),
+    ]
+    assert not dispatcher.pending
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_validate_frames(schema_path, jobs):
+    frames = iter_frames(io.BytesIO(as_frames(MESSAGES * 50)))
+    report = validate_frames(frames, schema_path, jobs=jobs, chunk_size=7)
+    assert report.messages == 350
+    assert report.invalid == 50
+    assert sum(report.skipped.values()) == 100
+    assert report.valid == 200
+    assert report.definitions["_InitializeRequest"] == 100
+    error = report.errors[0]
+    assert error["index"] == 3
+    assert error["path"] == "/params/processId"
+    assert error["definition"] == "_InitializeRequest"
+    assert [e["index"] for e in report.errors] == sorted(
+        e["index"] for e in report.errors
+    )
+
+
+def test_check_chunk(schema_path):
+    """ only invalid messages have an error
+    """
+    registry = SchemaRegistry.from_path(schema_path)
+    jobs = [
+        (i, 0, "_InitializeRequest", "initialize", m)
+        for i, m in enumerate([MESSAGES[0], MESSAGES[3]])
+    ]
+    (error,) = check_chunk(jobs, registry)
+    assert error["index"] == 1 and error["path"] == "/params/processId"
+
+
+def test_validate_cli(schema_path, tmp_path):
+    log = tmp_path / "messages.jsonl"
+    log.write_bytes(as_jsonl(MESSAGES) + b"{not json\n")
+    report = tmp_path / "report.json"
+    result = CliRunner().invoke(
+        cli,
+        [
+            "--output",
+            str(schema_path.parent),
+            "validate",
+            str(log),
+            "--report",
+            str(report),
+            "--jobs",
+            "2",
+        ],
+    )
+    assert result.exit_code == 1, result.output
+    assert "8 messages, 4 valid, 2 invalid, 2 skipped" in result.output
+    offset = len(as_jsonl(MESSAGES[:3]))
+    assert f"{log}:{offset} #3 _InitializeRequest /params/processId" in result.output
+    assert f"{log}:{len(as_jsonl(MESSAGES))} #7: Expecting" in result.output
+    summary = json.loads(report.read_text())
+    assert summary["invalid"] == 2
+    assert summary["errors"][0]["log"] == str(log)
+
+
+def test_validate_cli_stdin(schema_path):
+    result = CliRunner().invoke(
+        cli,
+        ["validate", "--schema", str(schema_path), "-"],
+        input=as_frames(MESSAGES[:3]),
+    )
+    assert result.exit_code == 0, result.output
+    assert "3 messages, 3 valid" in result.output
+
+
+def test_validate_cli_truncated(schema_path, tmp_path):
+    """ a broken frame is reported where it starts, after the messages before it
+    """
+    log = tmp_path / "messages.log"
+    log.write_bytes(as_frames(MESSAGES[:3])[:-3])
+    result = CliRunner().invoke(
+        cli, ["validate", "--schema", str(schema_path), str(log)]
+    )
+    assert result.exit_code == 1, result.output
+    assert "3 messages, 2 valid, 1 invalid" in result.output
+    offset = len(as_frames(MESSAGES[:2]))
+    assert f"{log}:{offset} #2: expected" in result.output
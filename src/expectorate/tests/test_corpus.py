@@ -0,0 +1,129 @@
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Text
+
+import pytest
+from click.testing import CliRunner
+
+from ..cli import cli
+from ..corpus.generate import CorpusMethod, corpus_methods, generate_corpus
+from ..corpus.strategies import StrategyBuilder, draw_examples
+from ..validate import SchemaRegistry
+from ..validate.bulk import validate_frames
+from ..validate.framing import iter_frames
+from .conftest import FIXTURES
+
+SYNTHETIC_PATH = FIXTURES / "bench" / "synthetic.schema.json"
+SYNTHETIC = json.loads(SYNTHETIC_PATH.read_text())
+
+SCHEMA: Dict[Text, Any] = {
+    "definitions": {
+        "Word": {"type": "string", "pattern": "^[a-z]{3}$"},
+        "Thing": {
+            "type": "object",
+            "properties": {
+                "kind": {"enum": ["a", "b"]},
+                "words": {"type": "array", "items": {"$ref": "#/definitions/Word"}},
+                "size": {"type": ["integer", "null"], "minimum": 1},
+                "maybe": {"anyOf": [{"const": 1}, {"type": "boolean"}]},
+            },
+            "required": ["kind", "words"],
+            "additionalProperties": {"type": "number"},
+        },
+    }
+}
+
+
+def test_corpus_methods():
+    methods = {m.method: m for m in corpus_methods(SYNTHETIC["definitions"])}
+    assert methods["initialize"] == CorpusMethod(
+        "initialize", "_InitializeRequest", "_InitializeResponse"
+    )
+    assert methods["initialized"] == CorpusMethod(
+        "initialized", notification="_InitializedNotification"
+    )
+    assert list(methods) == sorted(methods)
+
+
+def test_corpus_strategies():
+    """ compiled (and fallback) strategies only make valid, seeded examples
+    """
+    builder = StrategyBuilder(SCHEMA)
+    registry = SchemaRegistry(SCHEMA)
+    assert builder.definition("Thing") is builder.definition("Thing")
+
+    things = draw_examples(builder.definition("Thing"), 200, seed=1)
+    assert len(things) == 200
+    assert all(registry.is_valid(thing, "Thing") for thing in things)
+    assert len({json.dumps(thing, sort_keys=True) for thing in things}) > 100
+    assert things == draw_examples(builder.definition("Thing"), 200, seed=1)
+    assert things != draw_examples(builder.definition("Thing"), 200, seed=2)
+
+    # a strategy with few examples repeats them
+    kinds = draw_examples(builder.build({"enum": ["a", "b"]}), 10, seed=1)
+    assert len(kinds) == 10 and set(kinds) == {"a", "b"}
+
+    with pytest.raises(KeyError):
+        builder.definition("Nope")
+
+
+def test_corpus_generate(tmp_path: Path):
+    """ the corpus is valid, and the same for a seed, however many jobs make it
+    """
+    one = tmp_path / "one.corpus"
+    report = generate_corpus(SYNTHETIC_PATH, one, count=15, seed=3)
+    assert report.methods["initialize"] == {"request": 15, "response": 15}
+    assert report.methods["initialized"] == {"notification": 15}
+    assert report.messages == sum(sum(c.values()) for c in report.methods.values())
+
+    with one.open("rb") as stream:
+        checked = validate_frames(iter_frames(stream), SYNTHETIC_PATH)
+    assert checked.messages == report.messages
+    assert checked.valid == report.messages, checked.errors[:3]
+
+    sharded, many = tmp_path / "sharded.corpus", tmp_path / "many.corpus"
+    generate_corpus(SYNTHETIC_PATH, sharded, count=15, seed=3, shard_size=4)
+    generate_corpus(SYNTHETIC_PATH, many, count=15, seed=3, jobs=2, shard_size=4)
+    assert many.read_bytes() == sharded.read_bytes()
+    assert not [*tmp_path.glob(".*.parts")]
+
+    other = tmp_path / "other.corpus"
+    generate_corpus(SYNTHETIC_PATH, other, count=15, seed=4)
+    assert other.read_bytes() != one.read_bytes()
+
+
+def test_cli_corpus(tmp_path: Path):
+    corpus = tmp_path / "shutdown.corpus"
+    report = tmp_path / "report.json"
+    base = ["--output", str(tmp_path), "corpus", "--schema", str(SYNTHETIC_PATH)]
+    args = [*base, "-m", "shutdown", "-n", "5", "--corpus", str(corpus)]
+    result = CliRunner().invoke(cli, [*args, "--report", str(report)])
+    assert result.exit_code == 0, result.output
+    assert "10 messages for 1 methods" in result.output
+    assert json.loads(report.read_text())["methods"] == {
+        "shutdown": {"request": 5, "response": 5}
+    }
+
+    with corpus.open("rb") as stream:
+        ids = [json.loads(body)["id"] for offset, body in iter_frames(stream)]
+    assert ids == [1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+
+    result = CliRunner().invoke(cli, [*base, "-m", "nope"])
+    assert result.exit_code == 2
+    assert "no messages for nope" in result.output
+
+    result = CliRunner().invoke(cli, [*base, "-n", "2"])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "lsp.3.14.corpus").exists()
+
+
+def test_cli_corpus_missing(tmp_path: Path, monkeypatch):
+    """ without the `corpus` extra, the command says how to get it
+    """
+    monkeypatch.setitem(sys.modules, "hypothesis_jsonschema", None)
+    args = ["--output", str(tmp_path), "corpus", "--schema", str(SYNTHETIC_PATH)]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 1
+    assert "pip install expectorate[corpus]" in result.output
+    assert not (tmp_path / "lsp.3.14.corpus").exists()
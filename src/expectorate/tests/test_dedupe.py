@@ -0,0 +1,173 @@
+import copy
+import json
+from typing import Any, Callable, Dict, List, Text
+
+import pytest
+
+from ..lsp.dedupe import SHARED_PREFIX, canonical, dedupe_schema
+from ..lsp.pycompile import compile_schema
+from ..validate import SchemaRegistry
+from .conftest import GOOD_LSP
+from .test_pycompile import SYNTHETIC, mutations
+
+
+def point(description: Text, required: List[Text]) -> Dict[Text, Any]:
+    return {
+        "type": "object",
+        "description": description,
+        "properties": {
+            "line": {"type": "integer", "description": f"the line of {description}"},
+            "character": {"type": "integer"},
+        },
+        "required": required,
+        "additionalProperties": False,
+    }
+
+
+def ref(name: Text) -> Dict[Text, Text]:
+    return {"$ref": f"#/definitions/{name}"}
+
+
+def span(start: Text, end: Text) -> Dict[Text, Any]:
+    return {
+        "type": "object",
+        "properties": {"start": ref(start), "end": ref(end)},
+        "required": ["start", "end"],
+        "additionalProperties": False,
+    }
+
+
+# like `SymbolKind`
+KIND = {"enum": list(range(1, 27)), "description": "a kind of symbol"}
+
+SCHEMA: Dict[Text, Any] = {
+    "$ref": "#/definitions/_AnyFeature",
+    "definitions": {
+        "Position": point("a position", ["line", "character"]),
+        "_Position": point("a cursor", ["character", "line"]),
+        "Range": span("Position", "_Position"),
+        "_Range": span("_Position", "Position"),
+        "Location": {
+            "type": "object",
+            "properties": {
+                "uri": {"type": "string"},
+                "range": span("_Position", "_Position"),
+                "kind": KIND,
+            },
+            "additionalProperties": False,
+        },
+        "Symbol": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "kind": {**KIND, "description": "another kind"},
+                "selection": ref("_Range"),
+            },
+            "additionalProperties": False,
+        },
+        "Described": {"properties": {"description": {"type": "string"}}},
+        "Titled": {"properties": {"title": {"type": "string"}}},
+        "_AnyFeature": {"anyOf": [ref("Location"), ref("Symbol"), ref("_Position")]},
+    },
+}
+
+INSTANCES: List[Any] = [
+    {"line": 1, "character": 2},
+    {"line": 1},
+    {"line": 1, "character": 2, "other": 3},
+    {"uri": "file:///", "range": {"start": {"line": 1, "character": 2}}},
+    {
+        "uri": "file:///",
+        "range": {
+            "start": {"line": 1, "character": 2},
+            "end": {"line": 1, "character": 3},
+        },
+        "kind": 6,
+    },
+    {"name": "x", "kind": 7},
+    {"name": "x", "kind": 1, "selection": {"start": {"line": 1, "character": 2}}},
+    {"description": 1},
+    {"title": 1},
+    None,
+]
+
+
+@pytest.fixture(scope="module")
+def deduped() -> Any:
+    return dedupe_schema(SCHEMA)
+
+
+def test_dedupe_merged(deduped):
+    """ identical definitions are merged, even once they only differ by `$ref`s
+    """
+    schema, mapping = deduped
+    definitions = schema["definitions"]
+    assert mapping["merged"] == {"_Position": "Position", "_Range": "Range"}
+    assert definitions["_Position"] == ref("Position")
+    assert definitions["Range"]["properties"]["end"] == ref("Position")
+    assert definitions["_AnyFeature"]["anyOf"][2] == ref("Position")
+    # the original is untouched
+    assert SCHEMA["definitions"]["_Position"]["description"] == "a cursor"
+
+
+def test_dedupe_shared(deduped):
+    """ inline copies of definitions, and of each other, become `$ref`s
+    """
+    schema, mapping = deduped
+    definitions = schema["definitions"]
+    assert definitions["Location"]["properties"]["range"] == ref("Range")
+    (shared,) = mapping["shared"]
+    assert shared.startswith(SHARED_PREFIX) and mapping["shared"][shared] == 2
+    assert definitions["Location"]["properties"]["kind"] == ref(shared)
+    assert definitions["Symbol"]["properties"]["kind"] == ref(shared)
+    assert definitions[shared]["enum"] == KIND["enum"]
+    # a property called `description` isn't an annotation
+    assert "Described" not in mapping["merged"]
+    assert "Titled" not in mapping["merged"]
+    # ...and nothing is left to merge
+    assert dedupe_schema(schema)[1] == {"merged": {}, "shared": {}}
+
+
+def test_dedupe_smaller(deduped):
+    """ deduped schemas are smaller to write, and to compile
+    """
+    schema, _ = deduped
+    dumps: List[Callable[[Any], Text]] = [json.dumps, compile_schema]
+    for dump in dumps:
+        assert len(dump(schema)) < len(dump(SCHEMA))
+
+
+def test_dedupe_valid(deduped):
+    """ deduped schemas judge every instance the same way
+    """
+    schema, _ = deduped
+    before, after = SchemaRegistry(SCHEMA), SchemaRegistry(schema)
+    for name in SCHEMA["definitions"]:
+        for instance in INSTANCES:
+            assert before.is_valid(instance, name) == after.is_valid(instance, name)
+
+
+def test_dedupe_fixtures():
+    """ the synthetic schema still validates fixtures, broken or not, the same way
+    """
+    schema, _ = dedupe_schema(SYNTHETIC)
+    before, after = SchemaRegistry(SYNTHETIC), SchemaRegistry(schema)
+    for path, (header, data) in GOOD_LSP.items():
+        for name in ["_AnyFeature", header["feature"]]:
+            assert after.is_valid(data, name)
+            for mutated in mutations(copy.deepcopy(data)):
+                assert before.is_valid(mutated, name) == after.is_valid(mutated, name)
+
+
+def test_canonical():
+    """ annotations and order don't matter, but data does
+    """
+    assert canonical(point("a", ["line", "character"]), str) == canonical(
+        point("b", ["character", "line"]), str
+    )
+    assert canonical({"enum": [{"title": 1}, 2]}, str) == {"enum": [2, {"title": 1}]}
+    assert canonical(ref("A"), lambda name: name.lower()) == ref("a")
+    # whatever the validators ignore
+    assert canonical({"type": "string", "format": "uri", "readOnly": True}, str) == {
+        "type": "string"
+    }
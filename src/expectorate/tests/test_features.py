@@ -0,0 +1,42 @@
+from ..lsp.features import FeatureRecord, FeatureTable
+
+HOVER = """="#textDocument_hover" name="textDocument_hover" class="anchor">Hover Request (:leftwards_arrow_with_hook:)</a>
+
+_Request_:
+* method: 'textDocument/hover'
+* params: `TextDocumentPositionParams`
+
+_Response_:
+* Result: `Hover` \\| `null`
+* error: code and message set in case an exception happens.
+"""  # noqa: E501
+
+EXIT = """="#exit" name="exit" class="anchor">Exit Notification (:arrow_right:)</a>
+
+_Notification_:
+* method: 'exit'
+* params: void
+"""
+
+
+def test_feature_record():
+    """ everything is mined from the markdown in one pass
+    """
+    record = FeatureRecord(HOVER)
+    assert record.method == "textDocument/hover"
+    assert record.title == "Hover Request"
+    assert record.type == "↩️"
+    assert record.raw_params == "`TextDocumentPositionParams`"
+    assert record.raw_result == "`Hover` \\| `null`"
+    assert "code and message" in (record.raw_error or "")
+    assert record.result is None
+
+
+def test_feature_table():
+    """ records are sorted by type and method
+    """
+    table = FeatureTable([FeatureRecord(HOVER), FeatureRecord(EXIT)])
+    assert [r.method for r in table] == ["textDocument/hover", "exit"]
+    (exit,) = table.where(lambda r: r.raw_result is None)
+    assert exit.method == "exit" and exit.raw_params == "void"
+    assert "textDocument/hover" in str(table.view("params"))
@@ -0,0 +1,92 @@
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Text
+
+import pytest
+
+from ..jsonio import dump_json, load_json
+from ..utils import stream_output
+from .conftest import FIXTURES
+
+SYNTHETIC_PATH = FIXTURES / "bench" / "synthetic.schema.json"
+
+
+def big_schema(copies: int) -> Dict[Text, Any]:
+    """ a schema with many copies of the fixture definitions
+    """
+    definitions = json.loads(SYNTHETIC_PATH.read_text())["definitions"]
+    return {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "definitions": {
+            f"{name}{i}": definition
+            for i in range(copies)
+            for name, definition in definitions.items()
+        },
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+@pytest.mark.parametrize(
+    "text",
+    [
+        (SYNTHETIC_PATH).read_text(),
+        '{"a": [1, 2.5e10, -3, true, null, "}\\"{"], "b": {}, "c": []}',
+        ' [ 12345678901234567890 , {"x": {"y": ["z"]}} ] \n',
+        '"just a string"',
+        "1234",
+    ],
+)
+def test_load_json(tmp_path: Path, text: Text, chunk_size: int):
+    """ parsing in pieces, however small, is the same as parsing the whole text
+    """
+    path = tmp_path / "some.json"
+    path.write_text(text)
+    assert load_json(path, chunk_size=chunk_size) == json.loads(text)
+
+
+@pytest.mark.parametrize(
+    "text", ["", "{", '{"a" 1}', '{"a": 1,}', "[1 2]", '{"a": 1} 2', "{1: 2}"]
+)
+def test_load_json_bad(tmp_path: Path, text: Text):
+    path = tmp_path / "bad.json"
+    path.write_text(text)
+    with pytest.raises(json.JSONDecodeError):
+        load_json(path, chunk_size=2)
+
+
+def test_dump_json(tmp_path: Path):
+    """ the output is the same as `json.dumps`, even rewriting a file in place
+    """
+    path = tmp_path / "schema.json"
+    schema = big_schema(2)
+    path.write_text(json.dumps(schema))
+    dump_json(load_json(path), path)
+    assert path.read_text() == json.dumps(schema, indent=2, sort_keys=True)
+    assert [p.name for p in tmp_path.iterdir()] == ["schema.json"]
+
+
+def test_load_json_memory(tmp_path: Path):
+    """ parsing a big schema peaks well below `json.loads`, without its text
+    """
+    path = tmp_path / "big.json"
+    dump_json(big_schema(100), path)
+
+    def peak(load) -> int:
+        tracemalloc.start()
+        try:
+            load()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    whole = peak(lambda: json.loads(path.read_text()))
+    streamed = peak(lambda: load_json(path))
+    assert streamed < whole * 0.8, (streamed, whole)
+
+
+def test_stream_output(tmp_path: Path):
+    dest = tmp_path / "out" / "stdout.json"
+    stream_output([sys.executable, "-c", "print('[1, 2]')"], dest)
+    assert load_json(dest) == [1, 2]
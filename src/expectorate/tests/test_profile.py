@@ -0,0 +1,56 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import profile
+from ..utils import check_call, command_name
+
+
+def test_profiler_spans():
+    """ spans nest, and the self time of each stack is folded for flamegraphs
+    """
+    with profile.Profiler() as profiler:
+        with profiler.span("outer", "command"):
+            with profiler.span("inner", "stage"):
+                big = [0] * 100_000
+                del big
+            with profiler.span("inner", "stage"):
+                pass
+
+    outer, inner = [
+        [s for s in profiler.spans if s["name"] == name] for name in ["outer", "inner"]
+    ]
+    assert [s["stack"] for s in inner] == ["outer;inner"] * 2
+    assert inner[0]["peak_memory"] >= 800_000
+    assert outer[0]["peak_memory"] >= inner[0]["peak_memory"]
+
+    folded = dict(line.rsplit(" ", 1) for line in profiler.folded().splitlines())
+    assert sorted(folded) == ["outer", "outer;inner"]
+    total = sum(map(int, folded.values()))
+    assert abs(total - outer[0]["wall"] * 1e6) < 10
+
+    report = profiler.report()
+    assert report["totals"]["stage"]["count"] == 2
+
+
+def test_profiled_subprocesses():
+    """ subprocesses are only recorded while a profiler is active
+    """
+    args = [sys.executable, "-c", "sum(range(10 ** 6))"]
+    assert command_name(args).startswith("python")
+    assert command_name(["git", "--git-dir", "x", "fetch", "--prune"]) == "git fetch"
+    check_call(args)
+
+    profiler = profile.Profiler(trace_memory=False)
+    profile.activate(profiler)
+    try:
+        with profiler.span("root", "command"):
+            check_call(args)
+            with ThreadPoolExecutor(1) as pool:
+                pool.submit(check_call, args).result()
+    finally:
+        profile.activate(None)
+
+    calls = [s for s in profiler.spans if s["kind"] == "subprocess"]
+    assert len(calls) == 2
+    assert {s["stack"] for s in calls} == {f"root;{command_name(args)}"}
+    assert calls[0]["child_cpu"] > 0
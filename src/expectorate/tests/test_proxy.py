@@ -0,0 +1,205 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Text
+
+import pytest
+
+from ..proxy.relay import CLIENT, SERVER, ValidatingProxy, check_frames, read_frame
+from ..validate import SchemaRegistry, bulk
+from ..validate.framing import FramingError, frame, iter_frames
+from .conftest import FIXTURES, GOOD_LSP, HERE
+
+SYNTHETIC_PATH = FIXTURES / "bench" / "synthetic.schema.json"
+ECHO_SERVER = [sys.executable, str(FIXTURES / "proxy" / "echo_server.py")]
+
+POSITION = {
+    "textDocument": {"uri": "file:///a.py"},
+    "position": {"line": 0, "character": 1},
+}
+
+INITIALIZE = GOOD_LSP["00_good_init.yaml"][1]["request"]
+
+SESSION: List[Dict[Text, Any]] = [
+    {**INITIALIZE, "id": 1},
+    {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+    # a client violation
+    {
+        "jsonrpc": "2.0",
+        "id": 2,
+        "method": "textDocument/hover",
+        "params": {**POSITION, "position": {"line": 0}},
+    },
+    # the echo server sends back params, which aren't a definition result
+    {
+        "jsonrpc": "2.0",
+        "id": 3,
+        "method": "textDocument/definition",
+        "params": POSITION,
+    },
+    {"jsonrpc": "2.0", "id": 4, "method": "unknown/method", "params": {}},
+    {"jsonrpc": "2.0", "id": 5, "method": "shutdown"},
+    {"jsonrpc": "2.0", "method": "exit"},
+]
+
+
+class Collector:
+    """ stands in for the client's stdout
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+    async def drain(self) -> None:
+        pass
+
+
+def session_bytes() -> bytes:
+    # with stray blank lines between frames, which are tolerated
+    return b"\r\n".join(frame(message) for message in SESSION)
+
+
+def assert_session(report: Dict[Text, Any], replies: List[Dict[Text, Any]]):
+    assert [reply["id"] for reply in replies] == [1, 2, 3, 4, 5]
+    assert report["messages"] == len(SESSION) + len(replies)
+    assert report["invalid"] == 2
+    methods = report["methods"]
+    assert methods["initialize"]["messages"] == 2
+    assert methods["initialize"]["latency_ms"]["count"] == 1
+    assert methods["textDocument/definition"]["invalid"] == 1
+    assert methods["textDocument/hover"]["invalid"] == 1
+    assert methods["initialized"]["invalid"] == 0
+    assert report["skipped"] == {
+        "unknown method unknown/method": 1,
+        "no response for unknown/method": 1,
+        # not in the fixture schema
+        "unknown method exit": 1,
+    }
+    # the reply to an unknown method is timed, but can't be checked
+    assert methods["unknown/method"]["messages"] == 2
+    assert methods["unknown/method"]["latency_ms"]["count"] == 1
+    errors = {(error["sender"], error["method"]) for error in report["errors"]}
+    assert errors == {
+        ("client", "textDocument/hover"),
+        ("server", "textDocument/definition"),
+    }
+    assert report["forwarding_us"]["count"] == report["messages"]
+    assert report["returncode"] == 0
+
+
+def test_proxy_relay():
+    """ frames are relayed unchanged, and checked off to the side
+    """
+
+    async def relay() -> Any:
+        client_in = asyncio.StreamReader()
+        client_in.feed_data(session_bytes())
+        client_in.feed_eof()
+        client_out = Collector()
+        proxy = ValidatingProxy(
+            SYNTHETIC_PATH, ECHO_SERVER, log=logging.getLogger(__name__)
+        )
+        assert await proxy.run(client_in, client_out) == 0
+        return proxy.report, bytes(client_out.data)
+
+    report, output = asyncio.run(relay())
+    replies = [json.loads(body) for _, body in iter_frames(io.BytesIO(output))]
+    assert_session(report.to_json(), replies)
+    assert report.forwarding and min(report.forwarding) >= 0
+
+
+def test_check_frames(monkeypatch):
+    """ a batch is decoded, routed and checked at once, returning only verdicts
+    """
+    monkeypatch.setattr(bulk, "_REGISTRY", SchemaRegistry.from_path(SYNTHETIC_PATH))
+    hover = SESSION[2]
+    frames = [
+        (1, CLIENT, json.dumps(SESSION[0]).encode("utf-8")),
+        (2, CLIENT, json.dumps(hover).encode("utf-8")),
+        (3, SERVER, json.dumps({"jsonrpc": "2.0", "id": 1, "result": {}}).encode()),
+        (4, SERVER, b"{not json"),
+    ]
+    pending = {(SERVER, 7): ("shutdown", 0.0)}
+    inspections, errors = check_frames(frames, pending)
+    assert [i[0] for i in inspections] == [
+        "request",
+        "request",
+        "response",
+        "not JSON",
+    ]
+    assert [(e["index"], e["method"]) for e in errors] == [
+        (2, "textDocument/hover"),
+        (3, "initialize"),
+    ]
+    # the caller's requests are only routed by the caller
+    assert pending == {(SERVER, 7): ("shutdown", 0.0)}
+
+
+def test_proxy_bad_length():
+    """ a broken header is a framing error, like a truncated frame
+    """
+
+    async def read() -> Any:
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"Content-Length: abc\r\n\r\n{}")
+        reader.feed_eof()
+        return await read_frame(reader)
+
+    with pytest.raises(FramingError, match="Content-Length: abc"):
+        asyncio.run(read())
+
+
+def test_proxy_server_bad_frame(caplog):
+    """ a server's broken frame is logged, and the relay ends
+    """
+    server = "import sys; sys.stdout.write('Content-Length: abc\\r\\n\\r\\n{}')"
+
+    async def relay() -> Any:
+        client_in = asyncio.StreamReader()
+        client_in.feed_data(session_bytes())
+        client_in.feed_eof()
+        proxy = ValidatingProxy(
+            SYNTHETIC_PATH, [sys.executable, "-c", server], log=logging.getLogger()
+        )
+        return await proxy.run(client_in, Collector())
+
+    assert asyncio.run(relay()) == 0
+    assert "reading from the server failed" in caplog.text
+    assert "Content-Length: abc" in caplog.text
+
+
+def test_cli_proxy(tmp_path: Path):
+    report_path = tmp_path / "report.json"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(HERE.parent.parent), env.get("PYTHONPATH", "")]
+    )
+    args = ["--schema", str(SYNTHETIC_PATH), "--report", str(report_path)]
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from expectorate.cli import cli; cli()",
+            "proxy",
+            *args,
+            "--",
+            *ECHO_SERVER,
+        ],
+        input=session_bytes(),
+        capture_output=True,
+        env=env,
+        check=True,
+    )
+    replies = [json.loads(body) for _, body in iter_frames(io.BytesIO(proc.stdout))]
+    report = json.loads(report_path.read_text())
+    assert_session(report, replies)
+    stderr = proc.stderr.decode("utf-8")
+    assert "textDocument/definition: 2 messages, 1 invalid" in stderr
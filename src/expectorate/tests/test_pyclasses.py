@@ -0,0 +1,235 @@
+import copy
+import json
+import tracemalloc
+import typing
+from typing import Any, Dict, List, Text, Union
+
+import pytest
+
+from ..lsp.pyclasses import compile_classes
+from ..lsp.pycompile import load_validators
+from ..validate import SchemaRegistry
+from .conftest import GOOD_LSP
+from .test_pycompile import INSTANCES, KEYWORDS, SYNTHETIC, mutations
+
+SHAPES: Dict[Text, Any] = {
+    "definitions": {
+        "Point": {
+            "type": "object",
+            "properties": {"x": {"type": "integer"}, "y": {"type": "integer"}},
+            "required": ["x", "y"],
+            "additionalProperties": False,
+        },
+        "Named": {
+            "type": "object",
+            "properties": {
+                "class": {"type": "string"},
+                "from_json": {"type": "boolean"},
+                "a-b": {"enum": [1, 2]},
+            },
+            "additionalProperties": False,
+        },
+        "Tree": {
+            "type": "object",
+            "properties": {
+                "point": {"$ref": "#/definitions/Point"},
+                "children": {
+                    "type": "array",
+                    "items": {"$ref": "#/definitions/Tree"},
+                    "maxItems": 2,
+                },
+                "either": {"$ref": "#/definitions/Either"},
+                "label": {"oneOf": [{"type": "string"}, {"type": "null"}]},
+            },
+            "required": ["point"],
+            "additionalProperties": False,
+        },
+        "Either": {
+            "oneOf": [
+                {"$ref": "#/definitions/Point"},
+                {"$ref": "#/definitions/Named"},
+                {"type": "integer"},
+            ]
+        },
+        "Empty": {"type": "object", "properties": {}, "additionalProperties": False},
+        "Open": {
+            "type": "object",
+            "properties": {"x": {"$ref": "#/definitions/Point"}},
+        },
+    }
+}
+
+TREES: List[Any] = [
+    {"point": {"x": 1, "y": 2}},
+    {
+        "point": {"x": 1, "y": 2},
+        "children": [{"point": {"x": 3, "y": 4}, "label": None}],
+        "either": {"class": "c", "a-b": 2},
+        "label": "root",
+    },
+    {"point": {"x": 1, "y": 2}, "either": 3},
+    {"point": {"x": 1, "y": 2}, "either": {}},
+    {"point": {"x": 1, "y": 2}, "either": {"x": 1}},
+    {"point": {"x": 1, "y": 2}, "either": 1.5},
+    {"point": {"x": 1, "y": 2}, "children": [{}]},
+    {"point": {"x": 1, "y": 2}, "children": [{"point": {"x": 1, "y": 2}}] * 3},
+    {"point": {"x": 1, "y": 2}, "label": 1},
+    {"point": None},
+    {},
+    [],
+]
+
+
+@pytest.fixture(scope="module")
+def shapes(tmp_path_factory) -> Any:
+    path = tmp_path_factory.mktemp("classes") / "shapes.py"
+    path.write_text(compile_classes(SHAPES))
+    return load_validators(path)
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory) -> Any:
+    path = tmp_path_factory.mktemp("classes") / "lsp.3.14.messages.py"
+    path.write_text(compile_classes(SYNTHETIC))
+    return load_validators(path)
+
+
+def decoded(module: Any, instance: Any, name: Text) -> bool:
+    """ whether an instance decodes, checking it round-trips if it does
+    """
+    try:
+        value = module.from_json(instance, name)
+    except module.ValidationError:
+        return False
+    assert module.to_json(value) == instance
+    return True
+
+
+@pytest.mark.parametrize("definition", sorted(SHAPES["definitions"]))
+def test_classes_shapes(definition: Text, shapes):
+    """ classes check instances like jsonschema's draft 7, while decoding them
+    """
+    registry = SchemaRegistry(SHAPES)
+    for instance in [*TREES, *INSTANCES, *[tree["point"] for tree in TREES[:-2]]]:
+        expected = registry.is_valid(instance, definition)
+        assert decoded(shapes, instance, definition) == expected, instance
+
+
+def test_classes_api(shapes):
+    """ classes have slots, and names that python allows
+    """
+    tree = shapes.from_json(TREES[1], "Tree")
+    assert isinstance(tree, shapes.Tree)
+    assert tree.point == shapes.Point(1, 2)
+    assert tree.either.class_ == "c" and tree.either.from_json_ is shapes.MISSING
+    assert tree.children[0].either is shapes.MISSING and not tree.children[0].either
+    assert tree.children[0].label is None
+    assert shapes.from_json(TREES[2], "Tree").either == 3
+    assert shapes.Point.__slots__ == ("x", "y")
+    assert not hasattr(tree.point, "__dict__")
+    assert repr(tree.point) == "Point(x=1, y=2)"
+    assert set(shapes.CLASSES) == {"Point", "Named", "Tree", "Empty"}
+    assert shapes.Empty().to_json() == {}
+    assert shapes.to_json(shapes.Point(x=1, y=2)) == {"x": 1, "y": 2}
+    assert typing.get_type_hints(shapes.Tree, vars(shapes)) == {
+        "point": shapes.Point,
+        "children": Union[List[shapes.Tree], shapes._Missing],
+        "either": Union[shapes.Point, shapes.Named, int, shapes._Missing],
+        "label": Union[str, None, shapes._Missing],
+    }
+    assert (
+        typing.get_type_hints(shapes.Named.__init__)["a_b"]
+        == Union[int, shapes._Missing]
+    )
+
+    with pytest.raises(shapes.ValidationError) as info:
+        shapes.from_json({**TREES[1], "children": [{"point": {"x": 1}}]}, "Tree")
+    assert info.value.path == ("children", 0, "point")
+
+
+def test_classes_reserved(tmp_path):
+    """ definitions, and properties, named like what the module defines still work
+    """
+    names = ["to_json", "METHODS", "_dump", "_C1", "data", "v3", "list", "isinstance"]
+    point = SHAPES["definitions"]["Point"]
+    properties = {name: {"$ref": f"#/definitions/{name}"} for name in names}
+    for name in ["__doc__", "__class__", "_fields", "to_json", "id", "type"]:
+        properties.setdefault(name, {"type": "integer"})
+    schema = {
+        "definitions": {
+            **{name: point for name in names},
+            "Holder": {
+                "type": "object",
+                "properties": properties,
+                "additionalProperties": False,
+            },
+        }
+    }
+    path = tmp_path / "reserved.py"
+    path.write_text(compile_classes(schema))
+    reserved = load_validators(path)
+    holder: Dict[Text, Any] = {name: {"x": 1, "y": 2} for name in names}
+    holder.update({"__doc__": 1, "__class__": 2, "_fields": 3})
+    registry = SchemaRegistry(schema)
+    for name in [*names, "Holder"]:
+        for instance in [holder, {"x": 1, "y": 2}, {"x": 1}, {**holder, "list": 1}]:
+            expected = registry.is_valid(instance, name)
+            assert decoded(reserved, instance, name) == expected, (name, instance)
+    assert set(reserved.CLASSES) == {*names, "Holder"}
+    assert reserved.CLASSES["to_json"].__name__ == "to_json_"
+    assert reserved.to_json(reserved.CLASSES["list"](1, 2)) == {"x": 1, "y": 2}
+    # attributes only avoid keywords, and what objects already have
+    fields = dict(reserved.Holder._fields)
+    assert fields["list"] == "list" and fields["id"] == "id"
+    assert fields["type"] == "type" and fields["to_json"] == "to_json_"
+
+
+@pytest.mark.parametrize("definition", sorted(KEYWORDS["definitions"]))
+def test_classes_keywords(definition: Text, tmp_path):
+    """ definitions that aren't classes are checked, and left as they are
+    """
+    path = tmp_path / "keywords.py"
+    path.write_text(compile_classes(KEYWORDS))
+    keywords = load_validators(path)
+    registry = SchemaRegistry(KEYWORDS)
+    for instance in INSTANCES:
+        expected = registry.is_valid(instance, definition)
+        assert decoded(keywords, instance, definition) == expected, instance
+
+
+def test_classes_fixtures(synthetic):
+    """ classes agree with jsonschema on fixtures, and broken fixtures
+    """
+    for klass in synthetic.CLASSES.values():
+        assert typing.get_type_hints(klass.__init__) == typing.get_type_hints(
+            klass, vars(synthetic)
+        )
+    registry = SchemaRegistry(SYNTHETIC)
+    checked = 0
+    for path, (header, data) in GOOD_LSP.items():
+        for name in ["_AnyFeature", header["feature"]]:
+            assert decoded(synthetic, data, name)
+            for mutated in mutations(copy.deepcopy(data)):
+                checked += 1
+                expected = registry.is_valid(mutated, name)
+                assert decoded(synthetic, mutated, name) == expected, mutated
+    assert checked > 100
+
+
+def test_classes_memory(synthetic):
+    """ decoded classes are smaller than the dicts they are decoded from
+    """
+    messages = [json.dumps(data) for header, data in GOOD_LSP.values()] * 200
+
+    def kept(decode) -> int:
+        tracemalloc.start()
+        values = [decode(message) for message in messages]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(values) == len(messages)
+        return size
+
+    def from_json(message: Text) -> Any:
+        return synthetic.from_json(json.loads(message))
+
+    assert kept(from_json) < kept(json.loads) * 0.6
@@ -0,0 +1,252 @@
+import copy
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Text
+
+import pytest
+from hypothesis import HealthCheck, given, settings, strategies as st
+from hypothesis_jsonschema import from_schema
+
+from ..lsp.pycompile import (
+    SchemaCompiler,
+    UnsupportedSchema,
+    compile_schema,
+    load_validators,
+)
+from ..lsp.slicing import slice_schema
+from ..validate import SchemaRegistry
+from .conftest import FIXTURES, GOOD_LSP
+
+SYNTHETIC = json.loads((FIXTURES / "bench" / "synthetic.schema.json").read_text())
+
+KEYWORDS: Dict[Text, Any] = {
+    "definitions": {
+        "Tuple": {
+            "type": "array",
+            "items": [{"type": "integer"}, {"const": "two"}],
+            "additionalItems": {"type": "boolean"},
+            "minItems": 1,
+            "maxItems": 4,
+        },
+        "Closed": {"type": "array", "items": [{}], "additionalItems": False},
+        "Text": {
+            "type": "string",
+            "pattern": "^[a-z]+$",
+            "minLength": 2,
+            "maxLength": 4,
+        },
+        "Number": {
+            "type": ["number", "null"],
+            "minimum": 0,
+            "exclusiveMaximum": 10,
+            "multipleOf": 0.5,
+        },
+        "Mixed": {"enum": [1, "one", True, None, [1], {"a": 1}]},
+        "Choice": {
+            "oneOf": [{"type": "integer"}, {"type": "number", "minimum": 3}],
+            "not": {"const": 7},
+        },
+        "Both": {
+            "allOf": [{"$ref": "#/definitions/Text"}, {"enum": ["ab", "abc", "x"]}]
+        },
+        "Map": {
+            "type": "object",
+            "properties": {"fixed": {"type": "boolean"}},
+            "additionalProperties": {"$ref": "#/definitions/Number"},
+            "minProperties": 1,
+            "maxProperties": 2,
+        },
+        "Tokens": {
+            "type": "array",
+            "items": {"type": "integer", "minimum": 0, "exclusiveMaximum": 10},
+        },
+        "Numbers": {"type": "array", "items": {"type": "number", "title": "n"}},
+        "Never": False,
+        "Anything": True,
+    }
+}
+
+INSTANCES = [
+    None,
+    True,
+    False,
+    0,
+    1,
+    1.0,
+    2.5,
+    3,
+    7,
+    7.0,
+    10,
+    -1,
+    "a",
+    "ab",
+    "abc",
+    "abcde",
+    "AB",
+    "one",
+    "two",
+    "x",
+    [],
+    [1],
+    [1.0, "two"],
+    [1, "two", True, False],
+    [1, "two", True, False, True],
+    [1, "three"],
+    [True],
+    [1, 2],
+    [0, 9, 3],
+    [0, 10],
+    [-1, 3],
+    [2.0, 3],
+    [1.5, 2],
+    [1, float("nan")],
+    [1, None],
+    {},
+    {"a": 1},
+    {"fixed": True},
+    {"fixed": 1},
+    {"other": 1.5},
+    {"other": "1.5"},
+    {"a": 1, "b": 2, "c": 3},
+]
+
+
+@pytest.fixture(scope="module")
+def keywords(tmp_path_factory) -> Any:
+    path = tmp_path_factory.mktemp("compiled") / "keywords.py"
+    path.write_text(compile_schema(KEYWORDS))
+    return load_validators(path)
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory) -> Any:
+    path = tmp_path_factory.mktemp("compiled") / "lsp.3.14.validators.py"
+    path.write_text(compile_schema(SYNTHETIC, {"initialize": {"request": "nope"}}))
+    return load_validators(path)
+
+
+@pytest.mark.parametrize("definition", sorted(KEYWORDS["definitions"]))
+def test_compiled_keywords(definition: Text, keywords):
+    """ each supported keyword behaves like jsonschema's draft 7
+    """
+    registry = SchemaRegistry(KEYWORDS)
+    for instance in INSTANCES:
+        expected = registry.is_valid(instance, definition)
+        assert keywords.is_valid(instance, definition) == expected, instance
+
+
+def mutations(data: Any) -> Iterator[Any]:
+    """ copies of some JSON, each with one value replaced, removed or added
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            without = dict(data)
+            del without[key]
+            yield without
+            for mutated in mutations(value):
+                yield {**data, key: mutated}
+        yield {**data, "unexpected": 1}
+    elif isinstance(data, list):
+        for i, value in enumerate(data):
+            for mutated in mutations(value):
+                yield [*data[:i], mutated, *data[i + 1 :]]
+        yield [*data, None]
+    others: List[Any] = [None, True, 1, 1.5, "", "markdown", [], {}]
+    for other in others:
+        if other != data or type(other) is not type(data):
+            yield other
+
+
+def test_compiled_fixtures(synthetic):
+    """ compiled validators agree with jsonschema on fixtures, and broken fixtures
+    """
+    registry = SchemaRegistry(SYNTHETIC)
+    checked = 0
+    for path, (header, data) in GOOD_LSP.items():
+        assert synthetic.is_valid(data)
+        for name in ["_AnyFeature", header["feature"]]:
+            for mutated in mutations(copy.deepcopy(data)):
+                checked += 1
+                expected = registry.is_valid(mutated, name)
+                assert synthetic.is_valid(mutated, name) == expected, mutated
+    assert checked > 100
+
+
+def test_compiled_errors(synthetic, keywords):
+    """ errors say what and where, and only supported schema can be compiled
+    """
+    _, data = GOOD_LSP["00_good_init.yaml"]
+    data = copy.deepcopy(data)
+    data["request"]["params"]["processId"] = "nope"
+    with pytest.raises(synthetic.ValidationError) as info:
+        synthetic.validate(data, "_InitializeFeature")
+    assert info.value.path == ("request", "params", "processId")
+    assert "nope" in str(info.value)
+    # paths are only made for errors
+    source = compile_schema(SYNTHETIC)
+    assert not re.findall(r"validate_\w+\([^)]*path \+", source)
+
+    with pytest.raises(ValueError):
+        keywords.validate({"a": 1, "fixed": None}, "Map")
+
+    assert synthetic.METHODS == {"initialize": {}}
+    with pytest.raises(UnsupportedSchema):
+        compile_schema({"definitions": {"X": {"$ref": "#/definitions/Y"}}})
+    with pytest.raises(UnsupportedSchema):
+        compile_schema({"definitions": {"X": {"uniqueItems": True}}})
+    with pytest.raises(UnsupportedSchema):
+        compile_schema({"definitions": {"X": {"type": "float"}}})
+
+
+@pytest.mark.parametrize("definition", ["_InitializeFeature", "Hover", "Range"])
+def test_compiled_generated(definition: Text, synthetic):
+    """ generated valid (and arbitrary) instances are judged the same way
+    """
+    registry = SchemaRegistry(SYNTHETIC)
+    json_values = st.recursive(
+        st.none() | st.booleans() | st.integers() | st.floats() | st.text(),
+        lambda children: st.lists(children) | st.dictionaries(st.text(), children),
+        max_leaves=10,
+    )
+
+    @settings(max_examples=30, deadline=None, suppress_health_check=list(HealthCheck))
+    @given(
+        valid=from_schema(slice_schema(SYNTHETIC, definition)), arbitrary=json_values,
+    )
+    def check(valid: Any, arbitrary: Any):
+        assert synthetic.is_valid(valid, definition)
+        expected = registry.is_valid(arbitrary, definition)
+        assert synthetic.is_valid(arbitrary, definition) == expected
+
+    check()
+
+
+def test_compiled_numeric_bulk(tmp_path: Path):
+    """ arrays of numbers are checked without walking them, unless they fail
+    """
+    schema = {"definitions": {"Tokens": KEYWORDS["definitions"]["Tokens"]}}
+    source = compile_schema(schema)
+    assert "if not (_ints(" in source
+    path = tmp_path / "tokens.py"
+    path.write_text(source)
+    module = load_validators(path)
+
+    tokens = [i % 10 for i in range(100_000)]
+    assert module.is_valid(tokens, "Tokens")
+    tokens[500] = 10
+    with pytest.raises(module.ValidationError) as info:
+        module.validate(tokens, "Tokens")
+    assert info.value.path == (500,)
+
+    walked = SchemaCompiler.bulk_numbers({"type": "integer", "multipleOf": 2}, "v")
+    assert walked is None
+
+
+def test_load_validators(tmp_path: Path):
+    path = tmp_path / "lsp.3.14.validators.py"
+    path.write_text(compile_schema({"definitions": {"_AnyFeature": {}}}))
+    module = load_validators(path)
+    assert module.is_valid(None)
+    assert module.DEFINITIONS["_AnyFeature"].__name__ == "validate__AnyFeature"
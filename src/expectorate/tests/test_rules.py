@@ -0,0 +1,97 @@
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Text
+
+import pytest
+
+from ..lsp.conventions import CONVENTIONS
+from ..lsp.features import FeatureRecord, FeatureTable
+from ..lsp.generate import SpecGenerator
+from ..lsp.rules import Rule, RuleSet, compile_rules, dead_rules
+
+RULES = (
+    Rule("quoted", r"'(\w+)'=(\w+)", r"\2:\1"),
+    Rule("digits", r"(\d)(\d)", r"\2\1"),
+    Rule("stop", r";", truncate=True),
+    Rule("never", r"@@@"),
+)
+
+
+def test_rule_set():
+    """ rules are applied in one scan, with their own group numbers
+    """
+    rules = RuleSet(RULES)
+    hits: "Counter[Text]" = Counter()
+    assert rules.rewrite("'a'=b 12 34 5; 'c'=d", hits) == "b:a 21 43 5"
+    assert hits == {"quoted": 1, "digits": 2, "stop": 1}
+    assert dead_rules(RULES, hits) == ["never"]
+
+    assert rules.extract("x 12 'a'=b", hits) == "21"
+    assert rules.extract("nothing", hits) is None
+    assert rules.split("a;b;;c", hits) == ["a", "b", "", "c"]
+    assert hits["stop"] == 4
+
+    assert RuleSet(()).rewrite("as is", hits) == "as is"
+    assert compile_rules(RULES) is compile_rules(RULES)
+
+
+def test_rule_set_batch():
+    """ each distinct text is rewritten once, but every copy is counted
+    """
+    hits: "Counter[Text]" = Counter()
+    results = RuleSet(RULES).batch(["12", None, "12", "34;"], hits, "rewrite")
+    assert results == {"12": "21", "34;": "43"}
+    assert hits == {"digits": 3, "stop": 1}
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        ("`InitializeResult` defined as follows:", "InitializeResult"),
+        ("`Hover` \\| `null`", "Hover | null"),
+        (
+            "[`Location`](#location) \\| [`Location`](#location)[] \\| `null`",
+            "Location[] | null",
+        ),
+        (
+            "the selected `MessageActionItem` \\| `null` if none got selected.",
+            "MessageActionItem | null",
+        ),
+        ("`TextEdit[]` \\| `null` describing the edits.", "TextEdit[] | null"),
+        ("`DocumentColor[]` as defined in the protocol.", "DocumentColor[]"),
+        ("`void`. Nothing", "void"),
+        ("An array of DocumentLink.", "DocumentLink[]"),
+        ("An array of `DocumentLink`.", "DocumentLink[]"),
+    ],
+)
+def test_result_rules(raw: Text, expected: Text):
+    """ the result rules of each convention make the same typescript types
+    """
+    for convention in CONVENTIONS.values():
+        rules = convention.rules("result")
+        assert rules.rewrite(raw, Counter()).strip() == expected
+
+
+def test_other_rules():
+    convention = CONVENTIONS["3.15"]
+    hits: "Counter[Text]" = Counter()
+    assert convention.rules("params").extract("`Foo` or `Bar`", hits) == "Foo"
+    assert convention.rules("union").split("Foo |Bar[]", hits) == ["Foo", "Bar[]"]
+    namespaced = convention.rules("namespace").rewrite("Foo[] | null", hits)
+    assert namespaced == "proto.Foo[] | null"
+
+
+def test_result_schema_unions():
+    """ each alternative of a union result becomes an entry of its `oneOf`
+    """
+    record = FeatureRecord("* method: 'textDocument/definition'")
+    record.result = "Location | Location[] | null"
+    gen = SpecGenerator(workdir=Path(), output=Path(), log=logging.getLogger())
+    gen.features = FeatureTable([record])
+    gen.naive_schema = {"definitions": {"Location": {"type": "object"}}}
+    gen.annotate_result_schema()
+    location = {"$ref": "#/definitions/Location"}
+    assert record.result_schema == {
+        "oneOf": [location, {"type": "array", "items": location}, {"type": "null"}]
+    }
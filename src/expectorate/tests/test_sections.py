@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import List, Text
+
+import pytest
+
+from ..lsp.conventions import CONVENTIONS, SpecConvention
+from ..lsp.sections import SectionIndex
+from .conftest import UPSTREAMS
+
+SPEC = (UPSTREAMS / "specification.md").read_text()
+
+
+def split_features(spec: Text, convention: SpecConvention) -> List[Text]:
+    """ the naive, copy-everything way of finding features
+    """
+    after_preamble = spec.split(convention.preamble_separator)[1]
+    before_epilogue = after_preamble.split(convention.epilogue_separator)[0]
+    return before_epilogue.split(convention.feature_separator)[1:]
+
+
+def write_spec(tmp_path: Path, text: Text) -> Path:
+    path = tmp_path / "specification.md"
+    path.write_text(text)
+    return path
+
+
+def test_section_index(tmp_path: Path):
+    """ the index agrees with splitting the whole text
+    """
+    convention = CONVENTIONS["3.14"]
+    with SectionIndex.open(write_spec(tmp_path, SPEC)) as index:
+        index.scan(convention)
+        expected = split_features(SPEC, convention)
+        assert len(index) == len(expected) == 8
+        assert list(index) == expected
+        assert index[-2:] == expected[-2:]
+    with pytest.raises(ValueError):
+        index.raw(0)
+
+
+def test_section_index_concatenated(tmp_path: Path):
+    """ every preamble/epilogue region of concatenated specs is indexed
+    """
+    convention = CONVENTIONS["3.14"]
+    index = SectionIndex.open(write_spec(tmp_path, SPEC * 3)).scan(convention)
+    assert list(index) == split_features(SPEC, convention) * 3
+
+
+def test_section_index_empty(tmp_path: Path):
+    index = SectionIndex.open(write_spec(tmp_path, "")).scan(CONVENTIONS["3.14"])
+    assert not len(index)
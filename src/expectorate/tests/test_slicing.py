@@ -0,0 +1,63 @@
+from typing import Any, Dict, Text
+
+import pytest
+
+from ..lsp.slicing import iter_refs, reachable_definitions, slice_schema
+
+SCHEMA: Dict[Text, Any] = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "$ref": "#/definitions/_AnyFeature",
+    "definitions": {
+        "Position": {"type": "object"},
+        "Range": {
+            "type": "object",
+            "properties": {
+                "start": {"$ref": "#/definitions/Position"},
+                "end": {"$ref": "#/definitions/Position"},
+            },
+        },
+        "Unused": {"type": "string"},
+        "_HoverRequest": {
+            "properties": {"params": {"$ref": "#/definitions/Range"}},
+            "anyOf": [{"$ref": "#/definitions/_HoverRequest"}, {"type": "null"}],
+        },
+        "_AnyFeature": {
+            "anyOf": [{"$ref": "#/definitions/_HoverRequest"}, {"$ref": "#/x"}]
+        },
+    },
+}
+
+
+def test_iter_refs():
+    """ only local definitions count as references
+    """
+    assert list(iter_refs(SCHEMA["definitions"]["_AnyFeature"])) == ["_HoverRequest"]
+
+
+def test_reachable_definitions():
+    """ references are followed transitively, and cycles are tolerated
+    """
+    definitions = SCHEMA["definitions"]
+    assert reachable_definitions(definitions, ["_HoverRequest"]) == {
+        "_HoverRequest",
+        "Range",
+        "Position",
+    }
+    assert "Unused" not in reachable_definitions(definitions, ["_AnyFeature"])
+    with pytest.raises(KeyError):
+        reachable_definitions(definitions, ["Nope"])
+
+
+def test_slice_schema():
+    """ a slice points at its root, and doesn't change the original
+    """
+    sliced = slice_schema(SCHEMA, "Range")
+    assert sliced == {
+        "$schema": SCHEMA["$schema"],
+        "$ref": "#/definitions/Range",
+        "definitions": {
+            "Position": SCHEMA["definitions"]["Position"],
+            "Range": SCHEMA["definitions"]["Range"],
+        },
+    }
+    assert len(SCHEMA["definitions"]) == 5
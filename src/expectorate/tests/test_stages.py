@@ -0,0 +1,79 @@
+import threading
+from typing import List, Text
+
+import pytest
+
+from ..lsp.generate import SpecGenerator
+from ..stages import Stage, StageScheduler
+
+DIAMOND = [
+    Stage("clone", (), ("repo",)),
+    Stage("left", ("repo",), ("a",)),
+    Stage("right", ("repo",), ("b",)),
+    Stage("join", ("a", "b"), ()),
+]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_scheduler_order(jobs: int):
+    """ every stage runs once, after the stages it depends on
+    """
+    ran: List[Text] = []
+    StageScheduler(DIAMOND, jobs=jobs).run(lambda stage: ran.append(stage.name))
+    assert sorted(ran) == sorted(s.name for s in DIAMOND)
+    assert ran[0] == "clone"
+    assert ran[-1] == "join"
+
+
+def test_scheduler_concurrent():
+    """ independent stages overlap
+    """
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run_stage(stage: Stage):
+        if stage.name in ["left", "right"]:
+            barrier.wait()
+
+    StageScheduler(DIAMOND, jobs=2).run(run_stage)
+
+
+def test_scheduler_error():
+    """ the first failure stops the run
+    """
+    ran: List[Text] = []
+
+    def run_stage(stage: Stage):
+        if stage.name == "left":
+            raise RuntimeError(stage.name)
+        ran.append(stage.name)
+
+    with pytest.raises(RuntimeError):
+        StageScheduler(DIAMOND, jobs=2).run(run_stage)
+    assert "join" not in ran
+
+
+@pytest.mark.parametrize(
+    "stages",
+    [
+        [Stage("a", ("missing",))],
+        [Stage("a", ("x",)), Stage("b", (), ("x",))],
+        [Stage("a", (), ("x",)), Stage("b", (), ("x",))],
+    ],
+)
+def test_scheduler_invalid(stages: List[Stage]):
+    """ missing, out-of-order and conflicting resources are caught early
+    """
+    with pytest.raises(ValueError):
+        StageScheduler(stages)
+
+
+def test_scheduler_downstream():
+    scheduler = StageScheduler(DIAMOND)
+    assert [s.name for s in scheduler.downstream(["left"])] == ["left", "join"]
+
+
+def test_generator_stages():
+    """ the generator's stages form a valid graph of its own methods
+    """
+    scheduler = StageScheduler(SpecGenerator.STAGES)
+    assert all(callable(getattr(SpecGenerator, s.name)) for s in scheduler.stages)
@@ -0,0 +1,72 @@
+""" the CLI is called from many short-lived scripts, so keep its startup cheap
+"""
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, Text
+
+import pytest
+
+from .conftest import HERE
+
+# cumulative import time of `expectorate.cli`, as reported by `-X importtime`
+STARTUP_BUDGET_US = int(os.environ.get("EXPECTORATE_STARTUP_BUDGET_US", 200_000))
+
+# only imported once a subcommand needs them
+HEAVY = ["pandas", "jinja2", "jsonschema", "pyemojify", "hypothesis"]
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$", re.M)
+
+
+def python(*args: Text) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(HERE.parent.parent), env.get("PYTHONPATH", "")]
+    )
+    return subprocess.run(
+        [sys.executable, *args], env=env, capture_output=True, check=True
+    )
+
+
+def import_times(module: Text) -> Dict[Text, int]:
+    """ the cumulative import time, in microseconds, of everything imported
+    """
+    stderr = python("-X", "importtime", "-c", f"import {module}").stderr
+    return {
+        name: int(cumulative)
+        for _, cumulative, _, name in IMPORT_TIME.findall(stderr.decode("utf-8"))
+    }
+
+
+def test_cli_import_budget():
+    times = import_times("expectorate.cli")
+    heavy = sorted(name for name in times if name.split(".")[0] in HEAVY)
+    assert not heavy, f"imported at startup: {heavy}"
+    assert times["expectorate.cli"] < STARTUP_BUDGET_US, times["expectorate.cli"]
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--version"],
+        ["--help"],
+        ["lsp", "--help"],
+        ["validate", "--help"],
+        ["lsp-matrix", "--help"],
+        ["corpus", "--help"],
+        ["proxy", "--help"],
+    ],
+)
+def test_cli_no_heavy_imports(args):
+    """ informational commands don't import any heavy dependencies
+    """
+    script = "; ".join(
+        [
+            "import sys",
+            "from expectorate.cli import cli",
+            f"cli({args!r}, standalone_mode=False)",
+            f"print([m for m in {HEAVY!r} if m in sys.modules])",
+        ]
+    )
+    assert python("-c", script).stdout.decode("utf-8").strip().endswith("[]")
@@ -0,0 +1,43 @@
+import pytest
+
+from ..lsp.synthetic import parse_type
+
+
+@pytest.mark.parametrize(
+    "expr,expected",
+    [
+        ("number", {"type": "number"}),
+        ("void", {"type": "null"}),
+        ("proto.Hover", {"$ref": "#/definitions/Hover"}),
+        ("Foo<any>", {"$ref": "#/definitions/Foo"}),
+        ("'full'", {"type": "string", "enum": ["full"]}),
+        (
+            "proto.Location | proto.Location[] | null",
+            {
+                "anyOf": [
+                    {"$ref": "#/definitions/Location"},
+                    {"type": "array", "items": {"$ref": "#/definitions/Location"}},
+                    {"type": "null"},
+                ]
+            },
+        ),
+        (
+            "(string | number)[][]",
+            {
+                "type": "array",
+                "items": {
+                    "type": "array",
+                    "items": {"anyOf": [{"type": "string"}, {"type": "number"}]},
+                },
+            },
+        ),
+    ],
+)
+def test_parse_type(expr, expected):
+    assert parse_type(expr) == expected
+
+
+@pytest.mark.parametrize("expr", ["", "number |", "number string", "{ a: 1 }"])
+def test_parse_type_bad(expr):
+    with pytest.raises(ValueError):
+        parse_type(expr)
@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import List, Text
+
+from ..utils import ensure_js_packages, ensure_repo, link_tree
+from .conftest import git, git_commit_all
+
+
+def test_ensure_repo_worktrees(tmp_path: Path):
+    """ committishes coexist, and new workdirs don't touch the upstream
+    """
+    upstream = tmp_path / "upstream" / "some-repo"
+    upstream.mkdir(parents=True)
+    (upstream / "README.md").write_text("one")
+    one = git_commit_all(upstream, "one")
+    git(upstream, "tag", "v1")
+    (upstream / "README.md").write_text("two")
+    two = git_commit_all(upstream, "two")
+
+    url = upstream.as_uri()
+    mirrors = tmp_path / "mirrors"
+    work = tmp_path / "work"
+
+    v1 = ensure_repo(work, url, "v1", mirrors)
+    latest = ensure_repo(work, url, two, mirrors)
+
+    assert v1 != latest
+    assert (v1 / "README.md").read_text() == "one"
+    assert (latest / "README.md").read_text() == "two"
+    assert [p.name for p in mirrors.glob("*.git")] == ["some-repo.git"]
+    assert ensure_repo(work, url, "v1", mirrors) == v1
+
+    # new commits upstream are fetched on demand
+    (upstream / "README.md").write_text("three")
+    three = git_commit_all(upstream, "three")
+    latest = ensure_repo(work, url, three, mirrors)
+    assert (latest / "README.md").read_text() == "three"
+
+    # ...but known ones are a local operation
+    shutil.rmtree(upstream)
+    other = ensure_repo(tmp_path / "other-work", url, one, mirrors)
+    assert (other / "README.md").read_text() == "one"
+    assert other.parent == tmp_path / "other-work" / "some-repo"
+
+
+def test_link_tree(tmp_path: Path):
+    """ expanded directories can be written to without touching the original
+    """
+    src = tmp_path / "src"
+    (src / "protocol" / "src").mkdir(parents=True)
+    (src / "node_modules" / "pkg").mkdir(parents=True)
+    (src / "package.json").write_text("{}")
+    (src / "protocol" / "src" / "main.ts").write_text("main")
+    (src / "protocol" / "src" / "generated.ts").write_text("old")
+
+    dest = link_tree(
+        src,
+        tmp_path / "dest",
+        expand=["protocol", "protocol/src"],
+        exclude=["protocol/src/generated.ts"],
+    )
+    assert (dest / "node_modules").is_symlink()
+    assert (dest / "package.json").is_symlink()
+    assert not (dest / "protocol" / "src").is_symlink()
+    assert (dest / "protocol" / "src" / "main.ts").read_text() == "main"
+    assert not (dest / "protocol" / "src" / "generated.ts").exists()
+
+    (dest / "protocol" / "src" / "generated.ts").write_text("new")
+    assert (src / "protocol" / "src" / "generated.ts").read_text() == "old"
+    assert link_tree(src, dest, expand=["protocol", "protocol/src"]) == dest
+
+
+FAKE_NPM = """#!{python}
+import json, os, sys
+from pathlib import Path
+
+with open(os.environ["FAKE_NPM_LOG"], "a") as log:
+    log.write(" ".join(sys.argv[1:]) + "\\n")
+package_json = json.loads(Path("package.json").read_text())
+dev_deps = package_json.setdefault("devDependencies", {{}})
+for spec in sys.argv[3:]:
+    name, version = spec.rsplit("@", 1)
+    dev_deps[name] = version
+Path("package.json").write_text(json.dumps(package_json))
+Path("package-lock.json").write_text(json.dumps(dev_deps))
+for name, version in dev_deps.items():
+    pkg = Path("node_modules", name)
+    pkg.mkdir(parents=True, exist_ok=True)
+    # like npm, replace (rather than rewrite) files, so hardlinks are safe
+    (pkg / "package.tmp").write_text(json.dumps({{"version": version}}))
+    os.replace(pkg / "package.tmp", pkg / "package.json")
+"""
+
+
+def test_ensure_js_packages_cache(tmp_path: Path, monkeypatch):
+    """ packages are installed in one npm run, then reused from the cache
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    npm = bin_dir / "npm"
+    npm.write_text(FAKE_NPM.format(python=sys.executable))
+    npm.chmod(0o755)
+    npm_log = tmp_path / "npm.log"
+    monkeypatch.setenv("PATH", f"""{bin_dir}{os.pathsep}{os.environ["PATH"]}""")
+    monkeypatch.setenv("FAKE_NPM_LOG", str(npm_log))
+
+    def npm_calls() -> List[Text]:
+        return npm_log.read_text().splitlines() if npm_log.exists() else []
+
+    packages = {"a": "1.0.0", "b": "2.0.0"}
+    cache = tmp_path / "cache"
+    roots = [tmp_path / "one", tmp_path / "two"]
+    for root in roots:
+        root.mkdir()
+        (root / "package.json").write_text(json.dumps({"name": "x"}))
+
+    ensure_js_packages(roots[0], packages, cache)
+    assert npm_calls() == ["install --save-dev a@1.0.0 b@2.0.0"]
+    ensure_js_packages(roots[0], packages, cache)
+    assert len(npm_calls()) == 1
+
+    ensure_js_packages(roots[1], packages, cache)
+    assert len(npm_calls()) == 1
+    installed = [root / "node_modules" / "b" / "package.json" for root in roots]
+    assert json.loads(installed[1].read_text()) == {"version": "2.0.0"}
+    assert installed[0].stat().st_ino == installed[1].stat().st_ino
+    # shared with the cache, so nothing can change them in place
+    assert not installed[0].stat().st_mode & 0o222
+    assert json.loads((roots[1] / "package.json").read_text())["devDependencies"]
+
+    # a different request is a different key
+    ensure_js_packages(roots[1], {**packages, "b": "3.0.0"}, cache)
+    assert npm_calls()[-1] == "install --save-dev b@3.0.0"
+    assert len(list(cache.iterdir())) == 2
+    assert json.loads(installed[0].read_text()) == {"version": "2.0.0"}
@@ -0,0 +1,132 @@
+from typing import Any, Dict, Text
+
+import pytest
+from jsonschema import ValidationError
+
+from ..validate import SchemaRegistry
+from ..validate.registry import numbers_valid
+
+SCHEMA: Dict[Text, Any] = {
+    "$ref": "#/definitions/_AnyFeature",
+    "definitions": {
+        "Position": {
+            "type": "object",
+            "properties": {
+                "line": {"type": "number"},
+                "character": {"type": "number"},
+            },
+            "required": ["line", "character"],
+        },
+        "Range": {
+            "type": "object",
+            "properties": {
+                "start": {"$ref": "#/definitions/Position"},
+                "end": {"$ref": "#/definitions/Position"},
+            },
+            "required": ["start", "end"],
+        },
+        "_AnyFeature": {"anyOf": [{"$ref": "#/definitions/Range"}]},
+    },
+}
+
+POSITION = {"line": 0, "character": 1}
+
+
+def test_registry_validators():
+    """ validators are made on demand, cached, and share the original schema
+    """
+    registry = SchemaRegistry(SCHEMA)
+    assert registry.schema is SCHEMA
+    assert registry.validator("Range") is registry.validator("Range")
+
+    registry.validate({"start": POSITION, "end": POSITION}, "Range")
+    registry.validate({"start": POSITION, "end": POSITION})
+    assert registry.is_valid(POSITION, "Position")
+    assert not registry.is_valid(POSITION, "Range")
+
+    with pytest.raises(ValidationError) as info:
+        registry.validate({"start": POSITION, "end": {"line": "0"}}, "Range")
+    assert list(info.value.absolute_path) == ["end", "line"]
+
+    with pytest.raises(KeyError):
+        registry.validator("Nope")
+
+
+def test_registry_many_definitions():
+    """ validators for many definitions are each built once
+    """
+    schema: Dict[Text, Any] = {
+        "definitions": {
+            f"_Method{i}Request": {
+                "type": "object",
+                "properties": {"params": {"$ref": "#/definitions/Range"}},
+            }
+            for i in range(100)
+        }
+    }
+    schema["definitions"].update(SCHEMA["definitions"])
+    registry = SchemaRegistry(schema)
+    validators = [registry.validator(name) for name in registry]
+    assert len(validators) == len(registry) == 103
+    assert registry.validator("_Method0Request") is validators[0]
+
+
+TOKENS: Dict[Text, Any] = {
+    "definitions": {
+        "SemanticTokens": {
+            "type": "object",
+            "properties": {
+                "data": {
+                    "type": "array",
+                    "items": {"type": "integer", "minimum": 0, "maximum": 2 ** 31},
+                }
+            },
+        },
+        "Floats": {"type": "array", "items": {"type": "number"}},
+        "Open": {"type": "array", "items": {"type": "integer", "exclusiveMaximum": 0}},
+    }
+}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        [0, 1, 2 ** 31],
+        [0, 1, 2 ** 31 + 1],
+        [-1, 1],
+        [1.0, 2],
+        [1.5, 2],
+        [True, 2],
+        [1, None],
+        [1, float("nan")],
+        [10 ** 30],
+    ],
+)
+def test_registry_numeric_items(data: Any):
+    """ arrays of numbers checked in bulk are judged like draft 7 does
+    """
+    from jsonschema import Draft7Validator
+
+    registry = SchemaRegistry(TOKENS)
+    for name, schema in TOKENS["definitions"].items():
+        instance = {"data": data} if name == "SemanticTokens" else data
+        expected = Draft7Validator(schema)
+        assert registry.is_valid(instance, name) == expected.is_valid(instance)
+        errors = [err.path for err in registry.iter_errors(instance, name)]
+        assert errors == [err.path for err in expected.iter_errors(instance)]
+
+
+def test_registry_numeric_bulk():
+    """ big arrays of numbers skip the walk, unless they might fail
+    """
+    registry = SchemaRegistry(TOKENS)
+    items = TOKENS["definitions"]["SemanticTokens"]["properties"]["data"]["items"]
+    tokens = {"data": [i % 1000 for i in range(100_000)]}
+    assert numbers_valid(items, tokens["data"])
+    assert registry.is_valid(tokens, "SemanticTokens")
+
+    tokens["data"][500] = -1
+    assert not numbers_valid(items, tokens["data"])
+    errors = [err.path for err in registry.iter_errors(tokens, "SemanticTokens")]
+    assert [list(path) for path in errors] == [["data", 500]]
@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Text
+
+from ..lsp.generate import SpecGenerator
+from ..lsp.watch import SpecWatcher
+from ..lsp.worker import NodeWorker
+from ..stages import Stage
+
+
+def make_generator(fake_upstreams, tmp_path: Path) -> SpecGenerator:
+    return SpecGenerator(
+        workdir=tmp_path / "work",
+        output=tmp_path / "output",
+        log=logging.getLogger(__name__),
+        lsp_repo=fake_upstreams.lsp_repo.as_uri(),
+        lsp_committish=fake_upstreams.lsp_committish,
+        vlspn_repo=fake_upstreams.vlspn_repo.as_uri(),
+        vlspn_committish=fake_upstreams.vlspn_committish,
+        cache_dir=tmp_path / "cache",
+    )
+
+
+def edit(path: Path, old: Text, new: Text) -> None:
+    """ change a file, and make sure its mtime moves on
+    """
+    stat = path.stat()
+    path.write_text(path.read_text().replace(old, new))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def names(stages: List[Stage]) -> List[Text]:
+    return [stage.name for stage in stages]
+
+
+def naive_compiles(fake_upstreams) -> int:
+    return sum(
+        call.startswith("tssg protocol.ts ") for call in fake_upstreams.calls("tssg")
+    )
+
+
+def test_generate_closes_spec(fake_upstreams, tmp_path: Path):
+    """ a one-off build doesn't keep the spec mapped
+    """
+    gen = make_generator(fake_upstreams, tmp_path)
+    gen.generate()
+    assert gen.spec_index is None
+    assert gen.synthetic_schema_path.exists()
+
+
+def test_watch_poll(fake_upstreams, tmp_path: Path):
+    """ only the stages downstream of a changed file are run again
+    """
+    gen = make_generator(fake_upstreams, tmp_path)
+    watcher = SpecWatcher(gen)
+
+    with NodeWorker() as worker:
+        gen.node_worker = worker
+        watcher.build()
+        assert watcher.changed() == []
+        assert watcher.poll() == []
+
+        schema_path = gen.synthetic_schema_path
+
+        def hover_result():
+            definitions = json.loads(schema_path.read_text())["definitions"]
+            return definitions["_TextDocumentHoverResponse"]["properties"]["result"]
+
+        assert "anyOf" in hover_result()
+
+        edit(gen.spec_md_path, "`Hover` \\| `null`", "`Hover`")
+        ran = names(watcher.poll())
+        assert ran[0] == "parse_spec" and "build_naive_schema" not in ran
+        assert "ensure_lsp_repo" not in ran
+        assert hover_result() == {"$ref": "#/definitions/Hover"}
+        assert naive_compiles(fake_upstreams) == 1
+
+        assert gen.vlspn_dir is not None
+        protocol = gen.vlspn_dir / "protocol" / "src" / "protocol.ts"
+        edit(protocol, "range?: Range;", "range?: Range;\n    extra?: string;")
+        ran = names(watcher.poll())
+        assert ran[0] == "build_naive_schema" and "parse_spec" not in ran
+        assert naive_compiles(fake_upstreams) == 2
+        hover = json.loads(gen.naive_schema_path.read_text())["definitions"]["Hover"]
+        assert "extra" in hover["properties"]
+
+        # a broken change is logged, and retried with the next one
+        edit(protocol, "export interface Hover {", "export interface Hover {{")
+        assert watcher.poll() == []
+        assert watcher.pending == {"build_naive_schema"}
+        edit(protocol, "export interface Hover {{", "export interface Hover {")
+        assert names(watcher.poll())[0] == "build_naive_schema"
+        assert watcher.pending == set()
+
+
+def test_watch_run(fake_upstreams, tmp_path: Path):
+    """ the generator is built once, then kept until stopped
+    """
+    gen = make_generator(fake_upstreams, tmp_path)
+    stop = threading.Event()
+    watcher = SpecWatcher(gen, interval=0.01)
+    thread = threading.Thread(target=watcher.run, args=(stop,))
+    thread.start()
+    try:
+        for _ in range(1000):
+            if watcher.snapshots:
+                break
+            time.sleep(0.01)
+        assert gen.node_worker is not None
+        assert gen.synthetic_schema_path.exists()
+    finally:
+        stop.set()
+        thread.join()
+    assert gen.node_worker is None
+    assert gen.spec_index is None
@@ -0,0 +1,89 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from .. import profile
+from ..lsp import constants
+from ..lsp.worker import NodeWorker, NodeWorkerError
+from ..utils import ensure_js_packages, stream_output
+from .conftest import make_vlspn_repo
+
+
+def test_node_worker(tmp_path: Path):
+    """ one node process serves repeated compiles and formats
+    """
+    root = make_vlspn_repo(tmp_path)
+    src = root / "protocol" / "src"
+    formatted = src / "formatted.ts"
+    formatted.write_text("export interface Foo {}   \n\n\n\n")
+
+    with NodeWorker() as worker:
+        naive = worker.tssg(root, src / "protocol.ts")
+        pid = worker.pid
+        assert "Position" in naive["definitions"]
+
+        hover = worker.tssg(root, src / "protocol.ts", type="Hover")
+        assert hover["$ref"] == "#/definitions/Hover"
+        assert "InitializeParams" not in hover["definitions"]
+
+        out = tmp_path / "hover.json"
+        assert worker.tssg(root, src / "protocol.ts", type="Hover", out=out) is None
+        assert json.loads(out.read_text()) == hover
+
+        worker.prettier(root, formatted)
+        assert formatted.read_text() == "export interface Foo {}\n"
+        assert worker.pid == pid
+
+        with pytest.raises(NodeWorkerError):
+            worker.tssg(root, src / "missing.ts")
+        assert worker.pid == pid
+        proc = worker._proc
+
+    assert worker.pid is None
+    # asked to shut down, rather than left to notice its stdin closing
+    assert proc is not None and proc.returncode == 0
+
+
+def test_node_worker_cpu(tmp_path: Path):
+    """ the worker's CPU time is counted while it runs, not only once it exits
+    """
+    root = make_vlspn_repo(tmp_path)
+    profiler = profile.Profiler(trace_memory=False)
+    profile.activate(profiler)
+    try:
+        with NodeWorker() as worker:
+            worker.tssg(root, root / "protocol" / "src" / "protocol.ts")
+            running = profile.child_cpu_time()
+        assert profile.child_cpu_time() >= running
+    finally:
+        profile.activate(None)
+
+    (call,) = [s for s in profiler.spans if s["kind"] == "node"]
+    assert call["child_cpu"] > 0
+
+
+@pytest.mark.node
+def test_node_worker_real_tssg(tmp_path: Path):
+    """ the worker drives the pinned, real TSSG just like its CLI does
+    """
+    root = make_vlspn_repo(tmp_path)
+    shutil.rmtree(root / "node_modules")
+    ensure_js_packages(
+        root,
+        {
+            constants.TSSG: constants.TSSG_VERSION,
+            "prettier": constants.PRETTIER_VERSION,
+        },
+    )
+    src = root / "protocol" / "src" / "protocol.ts"
+    for type in [None, "Hover"]:
+        args = [str(root / "node_modules" / ".bin" / constants.TSSG)]
+        args += ["--path", str(src), "--expose", "all"]
+        if type is not None:
+            args += ["--type", type]
+        out = tmp_path / f"{type}.cli.json"
+        stream_output(args, out, cwd=root / "protocol")
+        with NodeWorker() as worker:
+            assert worker.tssg(root, src, type=type) == json.loads(out.read_text())
@@ -1,25 +1,273 @@
 import json
+import logging
+import os
+import re
+import shutil
+import stat
 import subprocess
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Text
+from typing import Any, Collection, Dict, Iterator, Optional, Sequence, Text
 from urllib.parse import urlparse
 
+from .cache import hash_inputs
+from .profile import profiled
 
-def ensure_repo(workdir: Path, repo_url: Text, committish: Text) -> Path:
-    repo_dir = workdir / Path(urlparse(repo_url).path).stem
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
 
-    if not repo_dir.is_dir():
-        subprocess.check_call(["git", "clone", repo_url, repo_dir])
-        subprocess.check_call(["git", "checkout", "-f", committish], cwd=repo_dir)
+
+def command_name(args: Sequence[Any]) -> Text:
+    """ a short name for a command line, e.g. `git worktree` or `node tssg`
+    """
+    name = Path(str(args[0])).name
+    rest = [str(arg) for arg in args[1:]]
+    if rest[:1] == ["--git-dir"]:
+        rest = rest[2:]
+    sub = next((arg for arg in rest if not arg.startswith("-")), None)
+    return name if sub is None else f"{name} {Path(sub).name}"
+
+
+def check_call(args: Sequence[Any], **kwargs: Any) -> int:
+    """ `subprocess.check_call`, timed by the active profiler
+    """
+    with profiled(command_name(args), "subprocess"):
+        return subprocess.check_call(args, **kwargs)
+
+
+def check_output(args: Sequence[Any], **kwargs: Any) -> bytes:
+    """ `subprocess.check_output`, timed by the active profiler
+    """
+    with profiled(command_name(args), "subprocess"):
+        return subprocess.check_output(args, **kwargs)
+
+
+def stream_output(args: Sequence[Any], dest: Path, **kwargs: Any) -> Path:
+    """ like `check_output`, but with stdout written straight to `dest`
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with dest.open("wb") as fd:
+        check_call(args, stdout=fd, **kwargs)
+    return dest
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """ hold an exclusive lock on a file, so other processes can share a tree
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as fd:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def git_output(git_dir: Path, *args: Text) -> Optional[Text]:
+    """ the stripped stdout of a git command, or None if it failed
+    """
+    try:
+        output = check_output(
+            ["git", "--git-dir", str(git_dir), *args], stderr=subprocess.DEVNULL
+        )
+    except subprocess.CalledProcessError:
+        return None
+    return output.decode("utf-8").strip()
+
+
+def ensure_mirror(mirror_root: Path, repo_url: Text) -> Path:
+    """ a bare mirror of a repo, shared by all its checkouts
+    """
+    mirror = mirror_root / f"{Path(urlparse(repo_url).path).stem}.git"
+
+    if not mirror.is_dir():
+        mirror_root.mkdir(parents=True, exist_ok=True)
+        tmp = mirror.with_name(f"{mirror.name}.{os.getpid()}.tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        check_call(["git", "clone", "--mirror", repo_url, str(tmp)])
+        try:
+            os.replace(tmp, mirror)
+        except OSError:
+            # another process got there first
+            if not mirror.is_dir():
+                raise
+            shutil.rmtree(tmp)
+
+    return mirror
+
+
+def resolve_commit(mirror: Path, committish: Text) -> Text:
+    """ the full sha of a committish, fetching the mirror only if it is unknown
+    """
+    rev = f"{committish}^{{commit}}"
+    sha = git_output(mirror, "rev-parse", "--verify", "--quiet", rev)
+    if sha is None:
+        check_call(["git", "--git-dir", str(mirror), "fetch", "--prune"])
+        sha = git_output(mirror, "rev-parse", "--verify", "--quiet", rev)
+    if sha is None:
+        raise ValueError(f"couldn't find {committish} in {mirror}")
+    return sha
+
+
+def ensure_repo(
+    workdir: Path, repo_url: Text, committish: Text, mirror_root: Optional[Path] = None,
+) -> Path:
+    """ a detached worktree of `committish`, backed by a shared bare mirror
+
+        checkouts live at `<workdir>/<repo name>/<committish>`, so several
+        committishes can coexist. A plain clone at `<workdir>/<repo name>`, as
+        made by earlier versions, is still used as-is.
+    """
+    repo_root = workdir / Path(urlparse(repo_url).path).stem
+
+    if (repo_root / ".git").exists():
+        return repo_root
+
+    repo_dir = repo_root / re.sub(r"[^\w.\-]+", "-", committish)
+
+    # another process may still be populating `repo_dir`, so it is only
+    # trusted once the lock is held
+    mirror_root = mirror_root or workdir / ".mirrors"
+    with locked(mirror_root / f"{repo_root.name}.lock"):
+        if not repo_dir.is_dir():
+            mirror = ensure_mirror(mirror_root, repo_url)
+            sha = resolve_commit(mirror, committish)
+            repo_root.mkdir(parents=True, exist_ok=True)
+            git_dir = ["git", "--git-dir", str(mirror)]
+            check_call([*git_dir, "worktree", "prune"])
+            check_call([*git_dir, "worktree", "add", "--detach", str(repo_dir), sha])
 
     return repo_dir
 
 
-def ensure_js_package(root: Path, package: Text, version: Text) -> None:
+def link_tree(
+    src: Path, dest: Path, expand: Collection[Text], exclude: Collection[Text] = ()
+) -> Path:
+    """ a cheap, private copy of `src`, made of symlinks to its entries
+
+        the (relative, posix) paths in `expand` become real directories, so
+        files can be added to them without touching `src`
+    """
+
+    def link(rel: Path) -> None:
+        (dest / rel).mkdir(parents=True, exist_ok=True)
+        for entry in sorted((src / rel).iterdir()):
+            entry_rel = rel / entry.name
+            target = dest / entry_rel
+            if entry.name == ".git" or entry_rel.as_posix() in exclude:
+                continue
+            if entry_rel.as_posix() in expand:
+                link(entry_rel)
+            elif not (target.exists() or target.is_symlink()):
+                target.symlink_to(entry.resolve())
+
+    link(Path())
+    return dest
+
+
+LOCKFILES = ["package-lock.json", "npm-shrinkwrap.json", "yarn.lock"]
+
+WRITABLE = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+def link_or_copy(src: Text, dest: Text) -> None:
+    """ hardlink a file, or copy it if that isn't possible (e.g. across devices)
+    """
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def make_read_only(root: Path) -> None:
+    """ take write permission from every file under `root`
+    """
+    for path in root.rglob("*"):
+        if path.is_file() and not path.is_symlink():
+            path.chmod(path.stat().st_mode & ~WRITABLE)
+
+
+def ensure_js_packages(
+    root: Path,
+    packages: Dict[Text, Text],
+    cache_dir: Optional[Path] = None,
+    log: Optional[logging.Logger] = None,
+) -> None:
+    """ install some devDependencies (and everything else) with one `npm install`
+
+        the installed `node_modules` is cached under `cache_dir`, keyed by the
+        lockfile, `package.json` and requested versions, and later hardlinked
+        into any checkout with the same key, without running npm at all. As
+        every checkout shares them, the cached files are made read-only: npm
+        replaces, rather than rewrites, installed files, and anything else that
+        tries to write one in place fails, rather than changing the cache.
+    """
     package_json = json.loads((root / "package.json").read_text())
-    in_json = package_json["devDependencies"].get(package)
-    if in_json is None or version not in in_json:
-        subprocess.check_call(
-            ["npm", "install", "--save-dev", f"{package}@{version}"], cwd=root
+    dev_deps = package_json.get("devDependencies", {})
+    missing = {
+        package: version
+        for package, version in sorted(packages.items())
+        if version not in dev_deps.get(package, "")
+    }
+    if not missing and (root / "node_modules").is_dir():
+        return
+
+    cached = None
+    if cache_dir is not None:
+        key = hash_inputs(
+            "node_modules",
+            # older caches may still be writable
+            "read-only",
+            root / "package.json",
+            [root / lockfile for lockfile in LOCKFILES],
+            sorted(packages.items()),
         )
-        subprocess.check_call(["npm", "install"], cwd=root)
+        cached = cache_dir / key
+        if (cached / "node_modules").is_dir():
+            if log:
+                log.debug("[node_modules] materialising %s", cached)
+            shutil.rmtree(root / "node_modules", ignore_errors=True)
+            shutil.copytree(
+                cached / "node_modules",
+                root / "node_modules",
+                symlinks=True,
+                copy_function=link_or_copy,
+            )
+            for name in ["package.json", *LOCKFILES]:
+                if (cached / name).exists():
+                    shutil.copy2(cached / name, root / name)
+            return
+
+    args = ["npm", "install"]
+    if missing:
+        args += ["--save-dev", *[f"{p}@{v}" for p, v in missing.items()]]
+    check_call(args, cwd=root)
+
+    if cached is not None:
+        tmp = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(
+            root / "node_modules",
+            tmp / "node_modules",
+            symlinks=True,
+            copy_function=link_or_copy,
+        )
+        for name in ["package.json", *LOCKFILES]:
+            if (root / name).exists():
+                shutil.copy2(root / name, tmp / name)
+        make_read_only(tmp / "node_modules")
+        try:
+            os.replace(tmp, cached)
+        except OSError:
+            # another process cached the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def ensure_js_package(root: Path, package: Text, version: Text) -> None:
+    ensure_js_packages(root, {package: version})
@@ -0,0 +1,5 @@
+""" validate LSP messages with the schema made by `expectorate lsp`
+"""
+from .registry import SchemaRegistry
+
+__all__ = ["SchemaRegistry"]
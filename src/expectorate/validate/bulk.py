@@ -0,0 +1,154 @@
+""" validating large logs of messages, spread across a process pool
+"""
+import json
+import time
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Text, Tuple
+
+from .dispatch import MessageDispatcher
+from .framing import FramingError
+from .registry import SchemaRegistry
+
+# (index, byte offset, definition, method, decoded message)
+Job = Tuple[int, int, Text, Text, Any]
+
+_REGISTRY: Optional[SchemaRegistry] = None
+
+
+@dataclass
+class BulkReport:
+    messages: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+    definitions: Counter = field(default_factory=Counter)
+    skipped: Counter = field(default_factory=Counter)
+    errors: List[Dict[Text, Any]] = field(default_factory=list)
+
+    @property
+    def valid(self) -> int:
+        return self.messages - self.invalid - sum(self.skipped.values())
+
+    @property
+    def rate(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0.0
+
+    def to_json(self) -> Dict[Text, Any]:
+        return {
+            "messages": self.messages,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "skipped": dict(self.skipped),
+            "seconds": self.seconds,
+            "messages_per_second": self.rate,
+            "definitions": dict(self.definitions),
+            "errors": self.errors,
+        }
+
+
+def _init_worker(schema_path: Text) -> None:
+    global _REGISTRY
+    _REGISTRY = SchemaRegistry.from_path(Path(schema_path))
+
+
+def check_chunk(
+    chunk: List[Job], registry: Optional[SchemaRegistry] = None
+) -> List[Dict[Text, Any]]:
+    """ the best error (if any) for each message of a chunk
+    """
+    from jsonschema import exceptions
+
+    registry = registry or _REGISTRY
+    assert registry is not None, "worker not initialized"
+    errors = []
+    for index, offset, name, method, message in chunk:
+        error = exceptions.best_match(registry.iter_errors(message, name))
+        if error is not None:
+            errors.append(
+                {
+                    "index": index,
+                    "offset": offset,
+                    "method": method,
+                    "definition": name,
+                    "path": "/" + "/".join(str(p) for p in error.absolute_path),
+                    "schema_path": "/".join(str(p) for p in error.absolute_schema_path),
+                    "message": error.message,
+                }
+            )
+    return errors
+
+
+def validate_frames(
+    frames: Iterable[Tuple[int, bytes]],
+    schema_path: Path,
+    jobs: int = 1,
+    chunk_size: int = 500,
+    max_errors: int = 1000,
+) -> BulkReport:
+    """ validate each message against the definition for its method
+    """
+    report = BulkReport()
+    start = time.perf_counter()
+    registry = SchemaRegistry.from_path(schema_path)
+    dispatcher = MessageDispatcher(registry.definitions)
+
+    def collect(errors: List[Dict[Text, Any]]) -> None:
+        report.invalid += len(errors)
+        room = max_errors - len(report.errors)
+        report.errors += errors[: max(room, 0)]
+
+    pool = None
+    if jobs > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(str(schema_path),)
+        )
+    in_flight: Deque[Future] = Deque()
+
+    def submit(chunk: List[Job]) -> None:
+        if pool is None:
+            collect(check_chunk(chunk, registry))
+            return
+        # bound the memory held by queued chunks
+        while len(in_flight) >= 2 * jobs:
+            collect(in_flight.popleft().result())
+        in_flight.append(pool.submit(check_chunk, chunk))
+
+    chunk: List[Job] = []
+    try:
+        try:
+            for index, (offset, body) in enumerate(frames):
+                report.messages += 1
+                try:
+                    message = json.loads(body)
+                except ValueError as err:
+                    collect([{"index": index, "offset": offset, "message": str(err)}])
+                    continue
+                name, method = dispatcher.dispatch(message)
+                if name is None:
+                    report.skipped[method] += 1
+                    continue
+                report.definitions[name] += 1
+                chunk.append((index, offset, name, method or "", message))
+                if len(chunk) >= chunk_size:
+                    submit(chunk)
+                    chunk = []
+        except FramingError as err:
+            # nothing after a broken frame can be found, but what came before
+            # is still checked
+            collect(
+                [{"index": report.messages, "offset": err.offset, "message": str(err)}]
+            )
+            report.messages += 1
+        if chunk:
+            submit(chunk)
+        while in_flight:
+            collect(in_flight.popleft().result())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report.errors.sort(key=lambda error: error["index"])
+    report.seconds = time.perf_counter() - start
+    return report
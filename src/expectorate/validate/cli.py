@@ -0,0 +1,94 @@
+import json
+import sys
+from pathlib import Path
+from typing import Optional, Text, Tuple
+
+import click
+
+from ..context import Context
+from ..lsp import constants
+
+
+@click.command()
+@click.pass_context
+@click.argument("logs", nargs=-1, type=click.Path(allow_dash=True))
+@click.option(
+    "--schema",
+    type=Path,
+    help="a synthetic schema, instead of the one made by `lsp` in --output",
+)
+@click.option("--lsp-spec-version", default=constants.LSP_SPEC_VERSION)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=1),
+    help="number of processes validating messages",
+)
+@click.option(
+    "--chunk-size",
+    default=500,
+    type=click.IntRange(min=1),
+    help="number of messages sent to a process at once",
+)
+@click.option("--report", type=Path, help="write a JSON report here")
+@click.option("--max-errors", default=1000, help="most errors to report")
+def validate(
+    ctx: Context,
+    logs: Tuple[Text, ...],
+    schema: Optional[Path],
+    lsp_spec_version: Text,
+    jobs: int,
+    chunk_size: int,
+    report: Optional[Path],
+    max_errors: int,
+):
+    """ validate logs of LSP messages, as JSON lines or `Content-Length` frames
+
+        requests and notifications are checked against the definition for their
+        method, and responses against the definition for their request's method
+    """
+    from .bulk import BulkReport, validate_frames
+    from .framing import iter_frames
+
+    if schema is None:
+        assert ctx.obj.output, "Need an output directory"
+        schema = ctx.obj.output / f"lsp.{lsp_spec_version}.synthetic.schema.json"
+
+    total = BulkReport()
+    for log in logs or ["-"]:
+        if log == "-":
+            result = validate_frames(
+                iter_frames(sys.stdin.buffer), schema, jobs, chunk_size, max_errors
+            )
+        else:
+            with open(log, "rb") as stream:
+                result = validate_frames(
+                    iter_frames(stream), schema, jobs, chunk_size, max_errors
+                )
+
+        click.echo(
+            f"{log}: {result.messages} messages, {result.valid} valid, "
+            f"{result.invalid} invalid, {sum(result.skipped.values())} skipped "
+            f"in {result.seconds:.2f}s ({result.rate:.0f} messages/s)"
+        )
+        for reason, count in sorted(result.skipped.items()):
+            click.echo(f"  skipped {count}: {reason}")
+        for error in result.errors:
+            where = [f"{log}:{error['offset']}", f"#{error['index']}"]
+            where += [error[key] for key in ["definition", "path"] if key in error]
+            click.echo(f"  {' '.join(where)}: {error['message']}")
+            error["log"] = log
+
+        total.messages += result.messages
+        total.invalid += result.invalid
+        total.seconds += result.seconds
+        total.definitions.update(result.definitions)
+        total.skipped.update(result.skipped)
+        total.errors += result.errors
+
+    if report is not None:
+        report.parent.mkdir(parents=True, exist_ok=True)
+        report.write_text(json.dumps(total.to_json(), indent=2, sort_keys=True))
+
+    sys.exit(1 if total.invalid else 0)
@@ -0,0 +1,67 @@
+""" finding the definition of the synthetic schema that describes a message
+"""
+from typing import Any, Collection, Dict, Optional, Text, Tuple
+
+from ..lsp.conventions import method_title
+
+ERROR_RESPONSE = "_ErrorResponse"
+
+
+class MessageDispatcher:
+    """ maps messages to `_<Title>Request`, `_<Title>Response`, etc. definitions
+
+        responses carry no method, so the method of each request is remembered
+        by id until its response is seen
+    """
+
+    def __init__(self, definitions: Collection[Text]):
+        self.definitions = definitions
+        self.pending: Dict[Any, Text] = {}
+        self._titles: Dict[Text, Text] = {}
+
+    def title(self, method: Text) -> Text:
+        title = self._titles.get(method)
+        if title is None:
+            title = self._titles[method] = method_title(method)
+        return title
+
+    def request(self, method: Text, has_id: bool) -> Optional[Text]:
+        """ the definition of a request (or, without an id, a notification)
+        """
+        title = self.title(method)
+        if has_id:
+            name = f"_{title}Request"
+        else:
+            name = f"_{title}Notification"
+            if name not in self.definitions:
+                name = f"_{title}Request"
+        return name if name in self.definitions else None
+
+    def response(self, method: Text, is_error: bool) -> Optional[Text]:
+        """ the definition of a response to a request for `method`
+        """
+        name = ERROR_RESPONSE if is_error else f"_{self.title(method)}Response"
+        return name if name in self.definitions else None
+
+    def dispatch(self, message: Any) -> Tuple[Optional[Text], Optional[Text]]:
+        """ (definition, method), or (None, reason) if it can't be validated
+        """
+        if not isinstance(message, dict):
+            return None, "not an object"
+
+        method = message.get("method")
+        if isinstance(method, str):
+            if "id" in message:
+                self.pending[message["id"]] = method
+            name = self.request(method, "id" in message)
+            if name is None:
+                return None, f"unknown method {method}"
+            return name, method
+
+        method = self.pending.pop(message.get("id"), None)
+        if method is None:
+            return None, "unmatched response"
+        name = self.response(method, "error" in message)
+        if name is None:
+            return None, f"no response for {method}"
+        return name, method
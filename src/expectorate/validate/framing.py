@@ -0,0 +1,144 @@
+""" reading and writing streams of JSON-RPC messages
+
+    both newline-delimited JSON and the `Content-Length` framing of the
+    Language Server Protocol base protocol are understood
+"""
+import json
+from typing import Any, BinaryIO, Iterator, List, Optional, Text, Tuple
+
+CONTENT_LENGTH = b"content-length:"
+
+
+class FramingError(ValueError):
+    """ a stream couldn't be split into messages, maybe at a known byte offset
+    """
+
+    def __init__(self, message: Text, offset: Optional[int] = None):
+        if offset is not None:
+            message = f"{message} in the message at byte {offset}"
+        super().__init__(message)
+        self.offset = offset
+
+
+class CountingReader:
+    """ a binary stream which knows how many bytes have been read from it
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.offset = 0
+
+    def readline(self) -> bytes:
+        line = self.stream.readline()
+        self.offset += len(line)
+        return line
+
+    def read(self, size: int) -> bytes:
+        data = self.stream.read(size)
+        self.offset += len(data)
+        return data
+
+
+def content_length(line: bytes, offset: Optional[int] = None) -> int:
+    """ the value of a (stripped) `Content-Length` header line
+    """
+    value = line[len(CONTENT_LENGTH) :].strip()
+    if not value.isdigit():
+        raise FramingError(f"invalid header {line.decode('utf-8', 'replace')}", offset)
+    return int(value)
+
+
+class FrameHeaders:
+    """ the header lines of a `Content-Length` framed message, as they are read
+
+        shared by readers of blocking and asyncio streams, which only differ in
+        how they get each line and the body
+    """
+
+    def __init__(self, offset: Optional[int] = None):
+        self.offset = offset
+        self.lines: List[bytes] = []
+        self.length: Optional[int] = None
+
+    def feed(self, line: bytes) -> bool:
+        """ take the next line, returning whether it ended the headers
+        """
+        if not line:
+            raise FramingError("stream ended in headers", self.offset)
+        stripped = line.strip()
+        if not stripped:
+            # tolerate blank lines between messages
+            if self.length is None:
+                return False
+            self.lines.append(line)
+            return True
+        self.lines.append(line)
+        if stripped.lower().startswith(CONTENT_LENGTH):
+            self.length = content_length(stripped, self.offset)
+        return False
+
+    def check(self, body: bytes) -> bytes:
+        """ the body, if it is as long as the headers said
+        """
+        if len(body) != self.length:
+            raise FramingError(
+                f"expected {self.length} bytes, got {len(body)}", self.offset
+            )
+        return body
+
+
+def read_frame(
+    stream: Any, header: Optional[bytes] = None, offset: Optional[int] = None
+) -> Optional[bytes]:
+    """ the body of the next `Content-Length` framed message, or None at EOF
+
+        `header` is the first header line, if it was already read, and
+        `offset` where the message starts, for errors
+    """
+    headers = FrameHeaders(offset)
+    while True:
+        line = stream.readline() if header is None else header
+        header = None
+        if not line and not headers.lines:
+            return None
+        if headers.feed(line):
+            break
+    assert headers.length is not None
+    return headers.check(stream.read(headers.length))
+
+
+def iter_frames(stream: BinaryIO) -> Iterator[Tuple[int, bytes]]:
+    """ (byte offset, body) of each message, guessing the framing from the start
+    """
+    reader = CountingReader(stream)
+    line = reader.readline()
+    while line and not line.strip():
+        line = reader.readline()
+    start = reader.offset - len(line)
+
+    if line.lstrip().lower().startswith(CONTENT_LENGTH):
+        header: Optional[bytes] = line
+        while True:
+            body = read_frame(reader, header, start)
+            if body is None:
+                return
+            yield start, body
+            start, header = reader.offset, None
+    else:
+        while line:
+            body = line.strip()
+            if body:
+                yield start, body
+            start = reader.offset
+            line = reader.readline()
+
+
+def frame(message: Any) -> bytes:
+    """ a message with its `Content-Length` header
+    """
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+
+
+def write_frame(stream: BinaryIO, message: Any) -> None:
+    stream.write(frame(message))
@@ -0,0 +1,142 @@
+""" a loaded schema, with cached validators for each of its definitions
+"""
+import json
+import operator
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, Text
+
+from ..lsp.constants import ANNOTATIONS, DEFINITIONS
+
+# jsonschema is imported on first use, to keep the CLI quick to start
+SCHEMA_URI = "urn:expectorate:schema"
+
+# bounds that numeric `items` can have, as which extreme must pass which test
+BOUNDS = {
+    "minimum": (min, operator.ge),
+    "maximum": (max, operator.le),
+    "exclusiveMinimum": (min, operator.gt),
+    "exclusiveMaximum": (max, operator.lt),
+}
+# keywords that numeric `items` might have
+NUMERIC_KEYWORDS = {"type", *BOUNDS, *ANNOTATIONS}
+
+INTS = frozenset([int])
+NUMBERS = frozenset([int, float])
+
+
+def numbers_valid(items: Any, instance: Any) -> bool:
+    """ whether an array is all (bounded) numbers, checked without a python loop
+
+        `False` only means "not sure": the items still need checking one by one,
+        which also finds the errors. floats are only taken without bounds, as a
+        `NaN` would hide others from `min` and `max`
+    """
+    if type(instance) is not list or not instance or not isinstance(items, dict):
+        return False
+    kind = items.get("type")
+    if kind not in ("integer", "number") or not NUMERIC_KEYWORDS.issuperset(items):
+        return False
+    bounds = [(*BOUNDS[key], items[key]) for key in BOUNDS if key in items]
+    if kind == "number" and not bounds:
+        return NUMBERS.issuperset(map(type, instance))
+    if not INTS.issuperset(map(type, instance)):
+        return False
+    if any(type(limit) not in NUMBERS for _, _, limit in bounds):
+        return False
+    extremes = {extreme: extreme(instance) for extreme, _, _ in bounds}
+    return all(passes(extremes[extreme], limit) for extreme, passes, limit in bounds)
+
+
+class SchemaRegistry:
+    """ validators for any definition of one schema, which is never copied
+
+        all validators share one ref resolver (or `referencing.Registry`, on
+        newer `jsonschema`), and are only built when first asked for
+    """
+
+    def __init__(self, schema: Dict[Text, Any]):
+        self.schema = schema
+        self.definitions: Dict[Text, Any] = schema.get("definitions", {})
+        self._validators: Dict[Text, Any] = {}
+        self._lock = threading.Lock()
+        self._make_validator = self._validator_factory()
+
+    @classmethod
+    def from_path(cls, path: Path) -> "SchemaRegistry":
+        return cls(json.loads(path.read_text()))
+
+    @classmethod
+    def from_output(cls, output: Path, version: Text) -> "SchemaRegistry":
+        """ load the synthetic schema written by `expectorate lsp` to `output`
+        """
+        return cls.from_path(output / f"lsp.{version}.synthetic.schema.json")
+
+    def _validator_factory(self):
+        from jsonschema import Draft7Validator as Draft7, validators
+
+        check_items = Draft7.VALIDATORS["items"]
+
+        def items(validator, items, instance, schema):
+            # big arrays of numbers, like semantic tokens, skip the walk
+            if not numbers_valid(items, instance):
+                yield from check_items(validator, items, instance, schema)
+
+        Draft7Validator = validators.extend(Draft7, {"items": items})
+
+        try:
+            from referencing import Registry
+            from referencing.jsonschema import DRAFT7
+        except ImportError:  # pragma: no cover
+            from jsonschema import RefResolver
+
+            resolver = RefResolver.from_schema(self.schema)
+
+            def make_legacy_validator(name: Text):
+                ref = {"$ref": f"{DEFINITIONS}{name}"}
+                return Draft7Validator(ref, resolver=resolver)
+
+            return make_legacy_validator
+
+        registry = Registry().with_resource(
+            SCHEMA_URI, DRAFT7.create_resource(self.schema)
+        )
+
+        def make_validator(name: Text):
+            ref = {"$ref": f"{SCHEMA_URI}{DEFINITIONS}{name}"}
+            return Draft7Validator(ref, registry=registry)
+
+        return make_validator
+
+    def __contains__(self, name: Text) -> bool:
+        return name in self.definitions
+
+    def __iter__(self) -> Iterator[Text]:
+        return iter(self.definitions)
+
+    def __len__(self) -> int:
+        return len(self.definitions)
+
+    def validator(self, name: Text = "_AnyFeature"):
+        """ a (cached) `Draft7Validator` for one definition, with bulk numeric `items`
+        """
+        validator = self._validators.get(name)
+        if validator is None:
+            if name not in self.definitions:
+                raise KeyError(f"no definition {name}")
+            with self._lock:
+                validator = self._validators.get(name)
+                if validator is None:
+                    validator = self._validators[name] = self._make_validator(name)
+        return validator
+
+    def validate(self, instance: Any, name: Text = "_AnyFeature") -> None:
+        """ raise the best `ValidationError` for an instance, if it is invalid
+        """
+        self.validator(name).validate(instance)
+
+    def iter_errors(self, instance: Any, name: Text = "_AnyFeature") -> Iterator[Any]:
+        return self.validator(name).iter_errors(instance)
+
+    def is_valid(self, instance: Any, name: Text = "_AnyFeature") -> bool:
+        return self.validator(name).is_valid(instance)